@@ -1,17 +1,32 @@
 import streamlit as st
-from predict import predict_page
-from insight import insight_page
-from member import member_page
+import instrumentation
 
 st.set_page_config(page_title="Student Dropout System", page_icon=":student:")
 
 st.title("🎓 Dự đoán Sinh viên Bỏ học và Ra trường - Đại học Công thương :student:")
 
-page = st.sidebar.selectbox("Chọn trang", ["Member", "Insight", "Predict"])
+page = st.sidebar.selectbox("Chọn trang", ["Member", "Insight", "Predict", "Monitor"])
 
-if page == "Member":
-    member_page()
-elif page == "Insight":
-    insight_page()
-else:
-    predict_page()
+# Endpoint scrape / ghi JSON định kỳ (chỉ khi APP_METRICS=1); thêm ?profile=1 vào URL để lấy mẫu stack của lần chạy này
+instrumentation.start_exporters()
+profile = st.query_params.get('profile') == '1'
+
+with instrumentation.profiled(profile) as sampler, instrumentation.timer('page_seconds', page=page):
+    # Chỉ import trang được chọn: Member không phải chờ seaborn/scipy hay unpickle mô hình
+    if page == "Member":
+        from member import member_page
+        member_page()
+    elif page == "Insight":
+        from insight import insight_page
+        insight_page()
+    elif page == "Predict":
+        from predict import predict_page
+        predict_page()
+    else:
+        from monitor import monitor_page
+        monitor_page()
+
+if sampler is not None:
+    with st.expander(f"Profiler: {sampler.samples} mẫu, mỗi {sampler.interval * 1000:.0f} ms"):
+        st.text("\n".join(f"{count:>5}  {stack}" for stack, count in sampler.top()))
+        st.download_button("Tải stack gộp (flamegraph)", sampler.collapsed(), file_name="profile.folded")
@@ -0,0 +1,105 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+
+def synthetic_log(path, base, rows, now, span, seed=0, chunk=1_000_000):
+    # Log giả lập: lấy mẫu có hoàn lại từ data.csv (điểm làm tròn như widget của trang Predict),
+    # thời điểm rải đều trong `span` giây trước `now`, ghi nối tiếp theo thứ tự thời gian
+    rng = np.random.default_rng(seed)
+    times = np.sort(rng.uniform(now - span, now, rows))
+    with open(path, 'a') as f:
+        for start in range(0, rows, chunk):
+            sample = base.iloc[rng.integers(0, len(base), min(chunk, rows - start))].reset_index(drop=True)
+            sample.insert(0, 'time', np.round(times[start:start + len(sample)], 3))
+            sample.to_csv(f, header=False, index=False)
+
+
+def naive_counts(path, windows, now):
+    # Cách làm không có trạng thái: đọc lại toàn bộ log và đếm lại mỗi lần xem trang
+    from drift import LOG_COLUMNS, bin_indices, histogram
+    from scoring import FEATURE_COLUMNS
+
+    log = pd.read_csv(path, header=None, names=LOG_COLUMNS)
+    times = log['time'].to_numpy()
+    bins = bin_indices(log[FEATURE_COLUMNS].to_numpy(), log['prediction'].to_numpy())
+    counts = {'all': histogram(bins)}
+    for name, (width, n) in windows.items():
+        keep = times // width > now // width - n
+        counts[name] = histogram(bins[keep])
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Đo chi phí giám sát độ lệch khi log dự đoán dài ra")
+    parser.add_argument('--rows', type=int, nargs='+', default=[100_000, 1_000_000])
+    parser.add_argument('--append', type=int, default=1000, help="Số dòng ghi thêm giữa hai lần xem trang")
+    parser.add_argument('--span-days', type=float, default=45)
+    args = parser.parse_args()
+
+    from drift import WINDOWS, Monitor, drift_report, load_reference, log_prediction
+    from scoring import FEATURE_COLUMNS, load_model, resolve_columns, to_features
+
+    data = pd.read_csv('data.csv', sep=';')
+    base = to_features(data, resolve_columns(data.columns)).round().astype(int)
+    base['prediction'] = np.asarray(load_model().predict(base)).ravel()
+    reference = load_reference()['counts']
+
+    failures = []
+    for rows in args.rows:
+        with tempfile.TemporaryDirectory() as tmp:
+            log_path, state_path = os.path.join(tmp, 'predictions.log'), os.path.join(tmp, 'state.npz')
+            now = time.time()
+            synthetic_log(log_path, base, rows, now, args.span_days * 86400)
+
+            monitor = Monitor(log_path, state_path)
+            cold_s, _ = timed(monitor.refresh)
+            restart_s, restarted = timed(lambda: Monitor(log_path, state_path))
+            last = base.iloc[-1]
+            for i in range(args.append):
+                log_prediction(tuple(int(v) for v in last[FEATURE_COLUMNS]), int(last['prediction']), log_path,
+                               now=now + i * 1e-3)
+            incremental_s, new_rows = timed(restarted.refresh)
+            report_s, _ = timed(lambda: [drift_report(restarted.counts(w, now + 1), reference)
+                                         for w in ['all'] + list(WINDOWS)])
+            naive_s, expected = timed(lambda: naive_counts(log_path, WINDOWS, now + 1))
+
+            mismatched = [w for w in expected if not np.array_equal(restarted.counts(w, now + 1), expected[w])]
+            failures += [f'{rows}:{w}' for w in mismatched]
+            # Mẫu lấy từ data.csv không được bị báo lệch
+            psi = drift_report(restarted.counts('all'), reference)['psi'].max()
+            if psi >= 0.1:
+                failures.append(f'{rows}:psi={psi:.3f}')
+            print(json.dumps({
+                'log_rows': restarted.rows,
+                'log_mb': os.path.getsize(log_path) / 2 ** 20,
+                'cold_ingest_s': cold_s,
+                'cold_rows_per_sec': rows / cold_s,
+                'restart_load_state_s': restart_s,
+                'incremental_rows': new_rows,
+                'incremental_refresh_s': incremental_s,
+                'drift_report_all_windows_s': report_s,
+                'naive_rescan_s': naive_s,
+                'max_psi_in_distribution': float(psi),
+                'state_kb': os.path.getsize(state_path) / 1024,
+            }))
+
+    if failures:
+        print(f"Đếm theo trạng thái cộng dồn lệch với đọc lại toàn bộ log: {failures}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
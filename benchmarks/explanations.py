@@ -0,0 +1,65 @@
+import argparse
+import json
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Đo thông lượng giải thích SHAP: từng dòng, cả lô, lô có gộp trùng + cache")
+    parser.add_argument('--scale', type=int, nargs='+', default=[1, 10, 100], help="Nhân bản data.csv n lần")
+    parser.add_argument('--integer', action='store_true',
+                        help="Làm tròn điểm về số nguyên như đầu vào của trang Predict (nhiều bộ đặc trưng trùng hơn)")
+    parser.add_argument('--single-rows', type=int, default=200, help="Số dòng dùng để ước lượng cách gọi từng dòng")
+    args = parser.parse_args()
+
+    from explanations import Explainer, native_contributions
+    from scoring import load_model, resolve_columns, to_features
+
+    model = load_model()
+    data = pd.read_csv('data.csv', sep=';')
+    base = to_features(data, resolve_columns(data.columns)).reset_index(drop=True)
+    if args.integer:
+        base = base.round().astype(int)
+
+    # Gọi booster cho từng dòng (cách làm khi giải thích theo yêu cầu, không gộp lô)
+    single_s, _ = timed(lambda: [native_contributions(model, base.iloc[[i]]) for i in range(args.single_rows)])
+    single_rate = args.single_rows / single_s
+
+    report = []
+    mismatch = 0.0
+    for scale in args.scale:
+        X = pd.concat([base] * scale, ignore_index=True)
+        batch_s, expected = timed(lambda: native_contributions(model, X))
+        explainer = Explainer(model)
+        cold_s, cold = timed(lambda: explainer.explain(X))
+        warm_s, _ = timed(lambda: explainer.explain(X))
+        frame_s, _ = timed(lambda: explainer.frame(X))
+        mismatch = max(mismatch, float(np.max(np.abs(cold - expected))))
+        row = {
+            'rows': len(X),
+            'unique_rows': explainer.cache_info()['size'],
+            'single_rows_per_sec': single_rate,
+            'batch_rows_per_sec': len(X) / batch_s,
+            'cached_cold_rows_per_sec': len(X) / cold_s,
+            'cached_warm_rows_per_sec': len(X) / warm_s,
+            'frame_warm_rows_per_sec': len(X) / frame_s,
+        }
+        print(json.dumps(row))
+        report.append(row)
+
+    if mismatch > 1e-9:
+        print(f"Giải thích qua cache lệch với booster: {mismatch}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
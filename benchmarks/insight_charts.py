@@ -0,0 +1,48 @@
+import argparse
+import json
+import time
+
+
+def measure(backend, repeat):
+    # CPU server và dung lượng gửi đi của từng phần khi cache hình trống (lần hiển thị đầu tiên)
+    import charts
+    import insight
+    from figures import get_figure_cache
+    from dataset import data_identity
+
+    charts.CHART_BACKEND = backend
+    data_hash = data_identity(insight.DATA_PATH)
+    insight.load_frames(data_hash)
+    cache = get_figure_cache()
+
+    results = {}
+    for title, show in insight.SECTIONS:
+        cpu, wall = [], []
+        for _ in range(repeat):
+            cache.clear()
+            start_cpu, start_wall = time.process_time(), time.perf_counter()
+            show(data_hash)
+            cpu.append(time.process_time() - start_cpu)
+            wall.append(time.perf_counter() - start_wall)
+        stats = cache.stats()
+        results[title] = {'cpu_s': min(cpu), 'wall_s': min(wall), 'charts': stats['entries'],
+                          'payload_kb': stats['bytes'] / 1024}
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="So sánh CPU server và dung lượng biểu đồ giữa matplotlib và plotly")
+    parser.add_argument('--repeat', type=int, default=2, help="Lấy giá trị nhỏ nhất qua n lần")
+    args = parser.parse_args()
+
+    report = {backend: measure(backend, args.repeat) for backend in ('matplotlib', 'plotly')}
+    print(json.dumps(report, indent=2))
+
+    print(f"{'Phần':<30} {'CPU mpl':>9} {'CPU plotly':>11} {'KB mpl':>9} {'KB plotly':>10}")
+    for title in report['matplotlib']:
+        mpl, ply = report['matplotlib'][title], report['plotly'][title]
+        print(f"{title:<30} {mpl['cpu_s']:>8.2f}s {ply['cpu_s']:>10.2f}s {mpl['payload_kb']:>9.1f} {ply['payload_kb']:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
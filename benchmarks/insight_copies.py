@@ -0,0 +1,89 @@
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+import traceback
+from contextlib import contextmanager
+
+# Tắt cache hình như benchmarks.insight_memory: mỗi lần chạy đều phải vẽ lại, nếu không từ lần thứ hai
+# trang chỉ đọc ảnh đã lưu và số bản sao/bộ nhớ đỉnh đo được gần như bằng 0
+os.environ.setdefault('INSIGHT_FIGURE_CACHE_MB', '0')
+
+PLOT_LIBRARIES = ('seaborn', 'matplotlib')
+
+
+@contextmanager
+def count_copies(min_rows):
+    # Đếm các lần pandas sao chép dữ liệu (copy sâu, lọc/chọn bằng take) trên khung có từ min_rows dòng trở lên,
+    # tách bản sao do pipeline của trang và bản sao nội bộ của thư viện vẽ (seaborn)
+    from pandas.core.internals.managers import BaseBlockManager
+
+    counts = {'pipeline': 0, 'plot': 0}
+    original_copy, original_take = BaseBlockManager.copy, BaseBlockManager.take
+
+    def record(manager):
+        if len(manager.axes[-1]) < min_rows:
+            return
+        stack = traceback.extract_stack(limit=40)
+        in_plot = any(lib in frame.filename for frame in stack for lib in PLOT_LIBRARIES)
+        counts['plot' if in_plot else 'pipeline'] += 1
+
+    def copy(self, deep=True):
+        if deep:
+            record(self)
+        return original_copy(self, deep)
+
+    def take(self, *args, **kwargs):
+        record(self)
+        return original_take(self, *args, **kwargs)
+
+    BaseBlockManager.copy, BaseBlockManager.take = copy, take
+    try:
+        yield counts
+    finally:
+        BaseBlockManager.copy, BaseBlockManager.take = original_copy, original_take
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Đo bộ nhớ đỉnh và số lần sao chép DataFrame mỗi lần hiển thị trang Insight")
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--min-rows', type=int, default=1000,
+                        help="Chỉ đếm bản sao của khung dữ liệu có ít nhất n dòng")
+    args = parser.parse_args()
+
+    import insight
+    from figures import data_fingerprint
+    from dataset import data_identity
+
+    data_hash = data_identity(insight.DATA_PATH)
+    frames = insight.load_frames(data_hash)
+    before = [data_fingerprint(frames.data), data_fingerprint(frames.clean)]
+
+    tracemalloc.start()
+    report = []
+    for i in range(args.runs):
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        with count_copies(args.min_rows) as counts:
+            insight.insight_page(insight.ALL_SECTIONS)
+        report.append({
+            'run': i,
+            'seconds': time.perf_counter() - start,
+            'peak_mb': (tracemalloc.get_traced_memory()[1] - base) / 2**20,
+            'pipeline_copies': counts['pipeline'],
+            'plot_copies': counts['plot'],
+        })
+        print(json.dumps(report[-1]))
+    tracemalloc.stop()
+
+    after = [data_fingerprint(frames.data), data_fingerprint(frames.clean)]
+    if before != after:
+        print("Dữ liệu dùng chung đã bị sửa trong lúc hiển thị", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+import argparse
+import gc
+import json
+import os
+import resource
+import sys
+import time
+
+# Tắt cache hình để mỗi lần chạy đều phải vẽ lại toàn bộ biểu đồ
+os.environ.setdefault('INSIGHT_FIGURE_CACHE_MB', '0')
+
+
+def rss_mb():
+    # RSS hiện tại (Linux); nơi khác dùng RSS đỉnh
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2**20
+    except OSError:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2**20 if sys.platform == 'darwin' else peak / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Đo RSS qua nhiều lần chạy insight_page()")
+    parser.add_argument('--runs', type=int, default=8)
+    parser.add_argument('--warmup', type=int, default=2)
+    parser.add_argument('--max-growth-mb', type=float, default=30.0,
+                        help="Mức tăng RSS tối đa cho phép sau giai đoạn khởi động")
+    args = parser.parse_args()
+
+    import matplotlib.pyplot as plt
+    from insight import ALL_SECTIONS, insight_page
+
+    samples = []
+    for i in range(args.warmup + args.runs):
+        start = time.perf_counter()
+        insight_page(ALL_SECTIONS)
+        gc.collect()
+        samples.append({
+            'run': i,
+            'seconds': time.perf_counter() - start,
+            'rss_mb': rss_mb(),
+            'open_figures': len(plt.get_fignums()),
+        })
+        print(json.dumps(samples[-1]))
+
+    measured = samples[args.warmup:]
+    growth = measured[-1]['rss_mb'] - measured[0]['rss_mb']
+    report = {
+        'runs': args.runs,
+        'rss_start_mb': measured[0]['rss_mb'],
+        'rss_end_mb': measured[-1]['rss_mb'],
+        'rss_growth_mb': growth,
+        'open_figures': measured[-1]['open_figures'],
+    }
+    print(json.dumps(report, indent=2))
+
+    if growth > args.max_growth_mb or report['open_figures'] > 0:
+        print("RSS không ổn định hoặc còn figure chưa đóng", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
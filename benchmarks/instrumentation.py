@@ -0,0 +1,50 @@
+import argparse
+import json
+import time
+
+
+def per_call_ns(fn, calls):
+    start = time.perf_counter()
+    for _ in range(calls):
+        fn()
+    return (time.perf_counter() - start) / calls * 1e9
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Đo chi phí của lớp đo đạc khi tắt và khi bật")
+    parser.add_argument('--calls', type=int, default=1_000_000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    import instrumentation
+    from instrumentation import inc, timed, timer
+
+    def bare():
+        pass
+
+    decorated = timed('bench_seconds')(bare)
+
+    def with_timer():
+        with timer('bench_seconds'):
+            pass
+
+    def counter():
+        inc('bench_total')
+
+    cases = {'bare': bare, 'timed': decorated, 'timer': with_timer, 'inc': counter}
+    report = {}
+    for enabled in (False, True):
+        instrumentation.ENABLED = enabled
+        for name, fn in cases.items():
+            ns = min(per_call_ns(fn, args.calls) for _ in range(args.repeat))
+            report[f"{name}_{'on' if enabled else 'off'}_ns"] = ns
+    instrumentation.ENABLED = False
+
+    base = report['bare_off_ns']
+    for name in ('timed', 'timer', 'inc'):
+        report[f'{name}_off_overhead_ns'] = report[f'{name}_off_ns'] - base
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
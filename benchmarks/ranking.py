@@ -0,0 +1,43 @@
+import argparse
+import json
+import sys
+import time
+
+import numpy as np
+
+
+def best_of(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="So sánh chọn top-k nguy cơ bằng argpartition với sắp xếp toàn bộ")
+    parser.add_argument('--rows', type=int, nargs='+', default=[100_000, 1_000_000, 10_000_000])
+    parser.add_argument('--k', type=int, default=50)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    from scoring import top_k
+
+    rng = np.random.default_rng(0)
+    mismatch = False
+    for rows in args.rows:
+        risk = rng.random(rows)
+        sort_s, expected = best_of(lambda: np.argsort(risk, kind='stable')[::-1][:args.k], args.repeat)
+        part_s, idx = best_of(lambda: top_k(risk, args.k), args.repeat)
+        mismatch |= not np.array_equal(risk[idx], risk[expected])
+        print(json.dumps({'rows': rows, 'k': args.k, 'sort_s': sort_s, 'argpartition_s': part_s,
+                          'speedup': sort_s / part_s}))
+
+    if mismatch:
+        print("top_k khác với sắp xếp toàn bộ", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+import argparse
+import json
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+
+def synthetic_scored(rows, seed):
+    # Khung giống đầu ra của scoring.predict_chunk (chỉ các cột bảng luật dùng tới)
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'Prediction': rng.integers(0, 3, rows),
+        'Tuition fees up to date': rng.integers(0, 2, rows),
+        'Grade semester 1': rng.uniform(0, 20, rows).round(1),
+        'Grade semester 2': rng.uniform(0, 20, rows).round(1),
+    })
+
+
+def loop_codes(scored):
+    # Cách cũ: gọi chuỗi if cho từng dòng
+    from recommendation import recommend_code
+
+    return [recommend_code(*row) for row in scored[['Prediction', 'Tuition fees up to date', 'Grade semester 1',
+                                                    'Grade semester 2']].itertuples(index=False)]
+
+
+def best_of(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Đo thông lượng bảng luật khuyến nghị vector hóa so với vòng lặp từng dòng")
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    from recommendation import recommend_codes
+
+    scored = synthetic_scored(args.rows, args.seed)
+    loop_s, expected = best_of(lambda: loop_codes(scored), 1)
+    table_s, codes = best_of(lambda: recommend_codes(scored), args.repeat)
+
+    report = {
+        'rows': args.rows,
+        'loop_s': loop_s,
+        'table_s': table_s,
+        'loop_rows_per_sec': args.rows / loop_s,
+        'table_rows_per_sec': args.rows / table_s,
+        'speedup': loop_s / table_s,
+        'codes': pd.Series(codes).value_counts(sort=False).to_dict(),
+    }
+    print(json.dumps(report, indent=2))
+
+    if list(codes) != expected:
+        print("Bảng luật vector hóa cho mã khác với recommend_code", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
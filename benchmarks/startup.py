@@ -0,0 +1,86 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+PAGES = {'Member': 'member', 'Insight': 'insight', 'Predict': 'predict'}
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), 'startup_baseline.json')
+
+# Mỗi phép đo chạy trong một tiến trình mới để đo đúng thời gian khởi động lạnh
+IMPORT_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+print(json.dumps({{'seconds': time.perf_counter() - start, 'modules': len(sys.modules)}}))
+"""
+
+FIRST_PAINT_SCRIPT = """
+import json, time
+from streamlit.testing.v1 import AppTest
+start = time.perf_counter()
+at = AppTest.from_file({app!r}, default_timeout=600)
+if {page!r} != 'Member':
+    at.run()
+    at.sidebar.selectbox[0].select({page!r})
+at.run()
+print(json.dumps({{'seconds': time.perf_counter() - start, 'exceptions': len(at.exception)}}))
+"""
+
+
+def run_script(script):
+    out = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def measure(repeat):
+    app = os.path.abspath('app.py')
+    results = {}
+    for page, module in PAGES.items():
+        imports = [run_script(IMPORT_SCRIPT.format(module=module)) for _ in range(repeat)]
+        paints = [run_script(FIRST_PAINT_SCRIPT.format(app=app, page=page)) for _ in range(repeat)]
+        results[page] = {
+            'import_s': min(r['seconds'] for r in imports),
+            'import_modules': imports[0]['modules'],
+            'first_paint_s': min(r['seconds'] for r in paints),
+            'exceptions': max(r['exceptions'] for r in paints),
+        }
+    return results
+
+
+def compare(results, baseline, threshold):
+    regressions = []
+    for page, metrics in results.items():
+        for name in ('import_s', 'first_paint_s'):
+            old = baseline.get(page, {}).get(name)
+            if old and metrics[name] > old * (1 + threshold):
+                regressions.append(f"{page}.{name}: {old:.3f}s -> {metrics[name]:.3f}s")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Đo thời gian import và hiển thị lần đầu của từng trang")
+    parser.add_argument('--repeat', type=int, default=3, help="Lấy thời gian nhỏ nhất qua n lần chạy")
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--threshold', type=float, default=0.25, help="Tỷ lệ chậm hơn baseline được coi là hồi quy")
+    parser.add_argument('--update-baseline', action='store_true')
+    args = parser.parse_args()
+
+    results = measure(args.repeat)
+    print(json.dumps(results, indent=2))
+
+    if args.update_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2)
+        return
+
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        if regressions:
+            print("Hồi quy hiệu năng khởi động:\n" + "\n".join(regressions), file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+import argparse
+import json
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+
+def loop_anova(data, codes, columns):
+    # Cách cũ của section_4: lọc dữ liệu theo từng nhóm và gọi f_oneway cho từng cột
+    from scipy.stats import f_oneway
+
+    return {col: float(f_oneway(*(data[col][codes == k] for k in np.unique(codes)))[1]) for col in columns}
+
+
+def loop_chi2(data, target_binary, columns):
+    # Cách cũ của section_5/6: pd.crosstab + chi2_contingency cho từng cột
+    from scipy.stats import chi2_contingency
+
+    p_values = {}
+    for col in columns:
+        table = pd.crosstab(data[col], target_binary)
+        table = table[table.sum(axis=1) > 0]
+        p_values[col] = float(chi2_contingency(table)[1])
+    return p_values
+
+
+def missing_mismatches(data, target_binary, columns, fraction=0.05, seed=0):
+    # Thêm giá trị thiếu vào các cột rời rạc và target: bảng chéo của engine phải khớp pd.crosstab (bỏ dòng NaN)
+    from stat_tests import contingency_tables
+
+    rng = np.random.default_rng(seed)
+    holed = data[columns].copy()
+    for col in columns:
+        holed.loc[rng.random(len(holed)) < fraction, col] = np.nan
+    target = pd.Series(target_binary, index=holed.index, dtype=float)
+    target[rng.random(len(target)) < fraction] = np.nan
+
+    tables, levels, target_levels = contingency_tables(holed, target, columns)
+    mismatched = []
+    for i, col in enumerate(columns):
+        expected = pd.crosstab(holed[col], target).reindex(index=levels[i], columns=target_levels, fill_value=0)
+        if not np.array_equal(tables[col], expected.to_numpy()):
+            mismatched.append(col)
+    return mismatched
+
+
+def best_of(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+
+def max_rel_diff(a, b):
+    a, b = np.array(list(a.values())), np.array([b[k] for k in a])
+    return float(np.max(np.abs(a - b) / np.maximum(np.abs(b), 1e-300)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="So sánh engine kiểm định vector hóa với các vòng lặp f_oneway/chi2_contingency")
+    parser.add_argument('--scale', type=int, nargs='+', default=[1, 10, 100], help="Nhân bản data.csv n lần")
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    from insight_stats import encode_target, iqr_filter, read_data
+    from stat_tests import anova_all, chi2_all, discrete_columns, numeric_columns
+
+    data = read_data()
+    keep, _ = iqr_filter(data)
+    data = data[keep]
+
+    codes = encode_target(data['Target'])
+    missing = missing_mismatches(data, (codes == 0).astype(int), discrete_columns(data))
+    print(json.dumps({'missing_values_crosstab_mismatches': missing}))
+
+    report = []
+    for scale in args.scale:
+        scaled = pd.concat([data] * scale, ignore_index=True)
+        codes = encode_target(scaled['Target'])
+        binary = pd.Series((codes == 0).astype(int))
+        num_cols, cat_cols = numeric_columns(scaled), discrete_columns(scaled)
+
+        loop_s, (loop_a, loop_c) = best_of(
+            lambda: (loop_anova(scaled, codes, num_cols), loop_chi2(scaled, binary, cat_cols)), args.repeat)
+        engine_s, (eng_a, eng_c) = best_of(
+            lambda: (anova_all(scaled, codes, num_cols), chi2_all(scaled, binary, cat_cols)), args.repeat)
+
+        row = {
+            'rows': len(scaled),
+            'anova_columns': len(num_cols),
+            'chi2_columns': len(cat_cols),
+            'loop_s': loop_s,
+            'engine_s': engine_s,
+            'speedup': loop_s / engine_s,
+            'anova_p_rel': max_rel_diff(eng_a['p_value'].to_dict(), loop_a),
+            'chi2_p_rel': max_rel_diff(eng_c['p_value'].to_dict(), loop_c),
+        }
+        print(json.dumps(row))
+        report.append(row)
+
+    if missing:
+        print(f"Bảng chéo khi có giá trị thiếu lệch với pd.crosstab: {missing}", file=sys.stderr)
+        sys.exit(1)
+    if any(r['anova_p_rel'] > 1e-6 or r['chi2_p_rel'] > 1e-6 for r in report):
+        print("Engine vector hóa lệch với cách tính từng cột", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,223 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.startup import FIRST_PAINT_SCRIPT, run_script
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), 'suite_baseline.json')
+DATA_DIR = 'bench_data'
+SCALES = [10, 100, 1000]
+CASES = ['model', 'load_data', 'insight', 'app']
+PAGES = ['Member', 'Insight', 'Predict']
+SECTIONS = [1, 2, 3, 4, 5, 6]
+
+# Cột điểm được cộng nhiễu nhỏ khi nhân bản để dữ liệu lớn không toàn là dòng trùng lặp
+JITTER = {'Admission grade': (95.0, 190.0), 'Previous qualification (grade)': (95.0, 190.0)}
+WRITE_ROWS = 200_000
+
+
+def best_of(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def synthetic_dataset(scale, directory=DATA_DIR, seed=0):
+    # data.csv nhân lên scale lần bằng lấy mẫu có hoàn lại (giữ nguyên header gốc, sep=';'); tạo một lần rồi dùng lại
+    from dataset import DATA_PATH
+
+    path = os.path.join(directory, f'data.x{scale}.csv')
+    if os.path.exists(path):
+        return path
+    os.makedirs(directory, exist_ok=True)
+    source = pd.read_csv(DATA_PATH, sep=';')
+    rng = np.random.default_rng(seed)
+    total = len(source) * scale
+    tmp = f'{path}.tmp'
+    with open(tmp, 'w', newline='') as f:
+        for start in range(0, total, WRITE_ROWS):
+            part = source.iloc[rng.integers(0, len(source), min(WRITE_ROWS, total - start))].copy()
+            for col, (lo, hi) in JITTER.items():
+                part[col] = np.clip(part[col] + rng.normal(0, 0.5, len(part)), lo, hi).round(1)
+            part.to_csv(f, sep=';', index=False, header=start == 0)
+    os.replace(tmp, path)
+    return path
+
+
+def bench_model(results, scales, data_paths, repeat):
+    from scoring import MODEL_PATH, load_model, resolve_columns, to_features
+    from train import measure_load
+
+    # Nạp mô hình trong tiến trình mới (như một worker vừa khởi động)
+    results['model_load_s'] = min(measure_load(MODEL_PATH)['load_s'] for _ in range(repeat))
+    model = load_model(MODEL_PATH)
+
+    for scale in scales:
+        mapping = resolve_columns(pd.read_csv(data_paths[scale], sep=';', nrows=0).columns)
+        X = to_features(pd.read_csv(data_paths[scale], sep=';', usecols=list(mapping)), mapping)
+        row = X.iloc[[0]]
+        model.predict(row)
+        latencies = []
+        for i in range(200):
+            row = X.iloc[[i % len(X)]]
+            start = time.perf_counter()
+            model.predict(row)
+            latencies.append(time.perf_counter() - start)
+        results[f'predict_single_s@{scale}x'] = float(np.median(latencies))
+        results[f'predict_batch_s@{scale}x'] = best_of(lambda: model.predict(X), repeat)
+
+
+def bench_load_data(results, scales, data_paths, repeat):
+    from dataset import load_dataset
+    from lookup import file_sha256
+
+    for scale in scales:
+        path = data_paths[scale]
+        data_hash = file_sha256(path)
+        cold = []
+        for _ in range(repeat):
+            # Thư mục cache trống: parse CSV, áp schema và ghi Parquet
+            with tempfile.TemporaryDirectory() as cache_dir:
+                start = time.perf_counter()
+                load_dataset(path, cache_dir, data_hash)
+                cold.append(time.perf_counter() - start)
+        results[f'load_data_cold_s@{scale}x'] = min(cold)
+        with tempfile.TemporaryDirectory() as cache_dir:
+            load_dataset(path, cache_dir, data_hash)
+            results[f'load_data_cached_s@{scale}x'] = best_of(lambda: load_dataset(path, cache_dir, data_hash), repeat)
+
+
+def bench_insight(results, scales, data_paths, repeat):
+    import insight
+    import insight_stats
+    from dataset import load_dataset
+    from figures import get_figure_cache
+    from lookup import file_sha256
+
+    cache = get_figure_cache()
+    stub = lambda *args, **kwargs: None
+    for scale in scales:
+        # Artifact và cache Parquet riêng, không đụng tới insight_artifact/ và data_cache/ của ứng dụng
+        with tempfile.TemporaryDirectory() as directory:
+            data_hash = file_sha256(data_paths[scale])
+            data = load_dataset(data_paths[scale], directory, data_hash)
+            insight_stats.save(insight_stats.compute(data), data_hash, directory)
+            stats = insight_stats.load(directory)
+        frames = insight.prepare_frames(data, stats)
+
+        for n in SECTIONS:
+            section = getattr(insight, f'section_{n}')
+            args = (frames,) if n == 3 else (frames, stats)
+            # Không stub: cache hình được xóa trước mỗi lần để mọi biểu đồ đều được vẽ lại
+            results[f'insight_section_{n}_s@{scale}x'] = best_of(lambda: (cache.clear(), section(*args)), repeat)
+
+            # Stub: bỏ phần vẽ/mã hóa ảnh, chỉ còn chuẩn bị số liệu và các lệnh Streamlit khác
+            render, plotly_render = insight.render, insight.charts.render
+            insight.render, insight.charts.render = stub, stub
+            try:
+                results[f'insight_section_{n}_stubbed_s@{scale}x'] = best_of(lambda: section(*args), repeat)
+            finally:
+                insight.render, insight.charts.render = render, plotly_render
+
+
+def run_page(page):
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(os.path.abspath('app.py'), default_timeout=600)
+    at.run()
+    if page != 'Member':
+        at.sidebar.selectbox[0].select(page).run()
+    if page == 'Predict':
+        next(b for b in at.sidebar.button if b.label == "Dự đoán").click().run()
+    if at.exception:
+        raise RuntimeError(f"{page}: {at.exception[0].value}")
+
+
+def bench_app(results, repeat):
+    # Toàn bộ app.py qua AppTest trên data.csv thật: lần đầu trong tiến trình mới, sau đó khi cache đã nóng
+    app = os.path.abspath('app.py')
+    for page in PAGES:
+        results[f'app_{page}_cold_s'] = min(run_script(FIRST_PAINT_SCRIPT.format(app=app, page=page))['seconds']
+                                            for _ in range(repeat))
+        run_page(page)
+        results[f'app_{page}_warm_s'] = best_of(lambda: run_page(page), repeat)
+
+
+def run_suite(cases, scales, repeat, data_dir=DATA_DIR):
+    data_paths = {scale: synthetic_dataset(scale, data_dir) for scale in scales
+                  if set(cases) & {'model', 'load_data', 'insight'}}
+    results = {}
+    for case in cases:
+        start = time.perf_counter()
+        if case == 'model':
+            bench_model(results, scales, data_paths, repeat)
+        elif case == 'load_data':
+            bench_load_data(results, scales, data_paths, repeat)
+        elif case == 'insight':
+            bench_insight(results, scales, data_paths, repeat)
+        else:
+            bench_app(results, repeat)
+        print(f"{case}: {time.perf_counter() - start:.1f}s", file=sys.stderr)
+    return results
+
+
+def compare(results, baseline, threshold, min_seconds):
+    # Chỉ so các phép đo có trong cả hai lần chạy; bỏ qua phép đo quá nhỏ (nhiễu)
+    regressions = []
+    for name, seconds in results.items():
+        old = baseline.get(name)
+        if old and max(old, seconds) >= min_seconds and seconds > old * (1 + threshold):
+            regressions.append(f"{name}: {old:.4f}s -> {seconds:.4f}s (+{seconds / old - 1:.0%})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bộ benchmark các đường nóng của ứng dụng, so với baseline JSON")
+    parser.add_argument('--cases', nargs='+', default=CASES, choices=CASES)
+    parser.add_argument('--scales', type=int, nargs='+', default=SCALES, help="Nhân bản data.csv n lần")
+    parser.add_argument('--repeat', type=int, default=3, help="Lấy thời gian nhỏ nhất qua n lần")
+    parser.add_argument('--data-dir', default=DATA_DIR)
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--threshold', type=float, default=0.25, help="Tỷ lệ chậm hơn baseline được coi là hồi quy")
+    parser.add_argument('--min-seconds', type=float, default=0.01,
+                        help="Không báo hồi quy cho phép đo nhỏ hơn ngưỡng này")
+    parser.add_argument('--out', default=None, help="Ghi kết quả JSON vào file")
+    parser.add_argument('--update-baseline', action='store_true', help="Gộp kết quả vào baseline")
+    args = parser.parse_args()
+
+    results = run_suite(args.cases, args.scales, args.repeat, args.data_dir)
+    report = {'machine': platform.node(), 'python': platform.python_version(), 'cpus': os.cpu_count(),
+              'results': results}
+    print(json.dumps(report, indent=2))
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)['results']
+
+    if args.update_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump({**report, 'results': {**baseline, **results}}, f, indent=2)
+        return
+
+    regressions = compare(results, baseline, args.threshold, args.min_seconds)
+    if regressions:
+        print("Hồi quy hiệu năng so với baseline:\n" + "\n".join(regressions), file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
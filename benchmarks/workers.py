@@ -0,0 +1,105 @@
+import argparse
+import json
+import subprocess
+import sys
+
+MODES = ['joblib', 'mmap', 'table']
+
+# Một "worker" nạp mô hình theo một chế độ, chấm một lô để chạm vào dữ liệu của mô hình, báo sẵn sàng
+# rồi chờ tới khi mọi worker đều đã nạp xong mới đo RSS/PSS (PSS chia trang dùng chung cho số tiến trình)
+WORKER_SCRIPT = """
+import json, sys, time
+import numpy as np
+mode, model_path = sys.argv[1], sys.argv[2]
+
+def memory():
+    fields = {}
+    with open('/proc/self/smaps_rollup') as f:
+        for line in f:
+            parts = line.split()
+            if parts[0] in ('Rss:', 'Pss:', 'Shared_Clean:', 'Private_Clean:', 'Private_Dirty:'):
+                fields[parts[0][:-1].lower() + '_mb'] = int(parts[1]) / 1024
+    return fields
+
+rng = np.random.default_rng(0)
+start = time.perf_counter()
+if mode == 'table':
+    from lookup import GRID_SHAPE, load_table, lookup_many
+    table, _ = load_table(model_path=model_path)
+    load_s = time.perf_counter() - start
+    # Chạm vào toàn bộ bảng như khi phục vụ lâu ngày trên toàn miền đầu vào
+    int(table['cls'].sum())
+    X = np.stack(np.unravel_index(rng.integers(0, table.size, 20_000), GRID_SHAPE), axis=1)
+    from lookup import GRID_MIN
+    lookup_many(table, X + GRID_MIN)
+else:
+    import pandas as pd
+    from scoring import FEATURE_COLUMNS, load_model
+    model = load_model(model_path, mmap_mode='r' if mode == 'mmap' else None)
+    load_s = time.perf_counter() - start
+    from lookup import GRID_MIN, GRID_SHAPE
+    X = np.stack(np.unravel_index(rng.integers(0, int(np.prod(GRID_SHAPE)), 20_000), GRID_SHAPE), axis=1)
+    model.predict_proba(pd.DataFrame(X + GRID_MIN, columns=FEATURE_COLUMNS))
+
+print('ready', flush=True)
+sys.stdin.readline()
+print(json.dumps({'load_s': load_s, **memory()}), flush=True)
+"""
+
+
+def run_workers(mode, n, model_path):
+    procs = [subprocess.Popen([sys.executable, '-c', WORKER_SCRIPT, mode, model_path], stdin=subprocess.PIPE,
+                              stdout=subprocess.PIPE, text=True) for _ in range(n)]
+    for proc in procs:
+        if proc.stdout.readline().strip() != 'ready':
+            raise RuntimeError(f"Worker {mode} không khởi động được")
+    results = []
+    for proc in procs:
+        proc.stdin.write('\n')
+        proc.stdin.flush()
+        results.append(json.loads(proc.stdout.readline()))
+        proc.wait()
+
+    def avg(key):
+        return sum(r[key] for r in results) / len(results)
+
+    return {
+        'mode': mode,
+        'workers': n,
+        'load_s': avg('load_s'),
+        'rss_mb_per_worker': avg('rss_mb'),
+        'pss_mb_per_worker': avg('pss_mb'),
+        'shared_mb_per_worker': avg('shared_clean_mb'),
+        'total_pss_mb': sum(r['pss_mb'] for r in results),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Đo RSS/PSS mỗi worker và thời gian nạp mô hình khi chạy nhiều tiến trình")
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 4, 16])
+    parser.add_argument('--modes', nargs='+', default=MODES, choices=MODES,
+                        help="joblib: unpickle bình thường; mmap: joblib mmap_mode='r'; table: bảng tra cứu mmap")
+    parser.add_argument('--model', default=None)
+    args = parser.parse_args()
+
+    from lookup import load_table
+    from scoring import MODEL_PATH
+
+    model_path = args.model or MODEL_PATH
+    modes = args.modes
+    if 'table' in modes and load_table(model_path=model_path) is None:
+        print("Chưa có bảng tra cứu khớp với mô hình (python lookup.py), bỏ qua chế độ table", file=sys.stderr)
+        modes = [m for m in modes if m != 'table']
+
+    report = [run_workers(mode, n, model_path) for mode in modes for n in args.workers]
+    for row in report:
+        print(json.dumps(row))
+
+    print(f"{'Chế độ':<8} {'Worker':>6} {'Nạp (s)':>8} {'RSS/worker':>11} {'PSS/worker':>11} {'Tổng PSS':>9}")
+    for r in report:
+        print(f"{r['mode']:<8} {r['workers']:>6} {r['load_s']:>8.3f} {r['rss_mb_per_worker']:>10.1f}M "
+              f"{r['pss_mb_per_worker']:>10.1f}M {r['total_pss_mb']:>8.0f}M")
+
+
+if __name__ == '__main__':
+    main()
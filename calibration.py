@@ -0,0 +1,133 @@
+import argparse
+import json
+import os
+
+import numpy as np
+
+# Hiệu chỉnh xác suất của mô hình trên phần dữ liệu giữ lại (test split của train.py), lưu dạng JSON
+# để lúc phục vụ chỉ cần numpy. Không có file (hoặc file cũ so với mô hình) thì dùng xác suất gốc.
+CALIBRATION_PATH = os.environ.get('CALIBRATION_PATH', 'calibration.json')
+METHODS = ['temperature', 'isotonic']
+ECE_BINS = 15
+EPS = 1e-12
+
+
+def temperature_scale(proba, temperature):
+    logits = np.log(np.clip(proba, EPS, 1.0)) / temperature
+    logits -= logits.max(axis=1, keepdims=True)
+    scaled = np.exp(logits)
+    return scaled / scaled.sum(axis=1, keepdims=True)
+
+
+def fit_temperature(proba, y):
+    from scipy.optimize import minimize_scalar
+
+    def nll(log_t):
+        scaled = temperature_scale(proba, np.exp(log_t))
+        return -np.mean(np.log(np.clip(scaled[np.arange(len(y)), y], EPS, 1.0)))
+
+    return {'temperature': float(np.exp(minimize_scalar(nll, bounds=(-3, 3), method='bounded').x))}
+
+
+def fit_isotonic(proba, y):
+    # Một hàm isotonic một-chọi-phần-còn-lại cho mỗi lớp, lưu bằng các điểm gãy để nội suy
+    from sklearn.isotonic import IsotonicRegression
+
+    curves = []
+    for k in range(proba.shape[1]):
+        iso = IsotonicRegression(out_of_bounds='clip', y_min=0.0, y_max=1.0).fit(proba[:, k], y == k)
+        curves.append({'x': iso.X_thresholds_.tolist(), 'y': iso.y_thresholds_.tolist()})
+    return {'curves': curves}
+
+
+def calibrate(calibration, proba):
+    proba = np.asarray(proba, dtype=np.float64)
+    if calibration is None:
+        return proba
+    params = calibration['params']
+    if calibration['method'] == 'temperature':
+        return temperature_scale(proba, params['temperature'])
+    scaled = np.column_stack([np.interp(proba[:, k], c['x'], c['y']) for k, c in enumerate(params['curves'])])
+    total = scaled.sum(axis=1, keepdims=True)
+    # Dòng mà mọi lớp đều về 0 thì giữ xác suất gốc
+    return np.where(total > 0, scaled / np.where(total > 0, total, 1.0), proba)
+
+
+def calibration_report(proba, y, bins=ECE_BINS):
+    n, k = proba.shape
+    onehot = np.eye(k)[y]
+    confidence = proba.max(axis=1)
+    correct = proba.argmax(axis=1) == y
+    edges = np.minimum((confidence * bins).astype(int), bins - 1)
+    counts = np.bincount(edges, minlength=bins)
+    gap = np.abs(np.bincount(edges, correct, bins) - np.bincount(edges, confidence, bins))
+    return {
+        'log_loss': float(-np.mean(np.log(np.clip(proba[np.arange(n), y], EPS, 1.0)))),
+        'brier': float(np.mean(np.sum((proba - onehot) ** 2, axis=1))),
+        'ece': float(gap[counts > 0].sum() / n),
+        'accuracy': float(correct.mean()),
+    }
+
+
+def build_calibration(method='temperature', model_path=None, path=CALIBRATION_PATH, data_path=None):
+    # Chia đôi test split: một nửa để khớp tham số, nửa còn lại để báo cáo trước/sau khi hiệu chỉnh
+    from lookup import file_sha256
+    from scoring import MODEL_PATH, load_model
+    from train import DATA_PATH, RANDOM_STATE, prepare
+
+    model_path = model_path or MODEL_PATH
+    model = load_model(model_path)
+    _, X_test, _, y_test = prepare(data_path or DATA_PATH)
+    classes = [int(c) for c in model.classes_]
+    proba = np.asarray(model.predict_proba(X_test), dtype=np.float64)
+    y = np.searchsorted(classes, np.asarray(y_test))
+
+    order = np.random.default_rng(RANDOM_STATE).permutation(len(y))
+    fit_idx, eval_idx = order[:len(y) // 2], order[len(y) // 2:]
+    fit = fit_temperature if method == 'temperature' else fit_isotonic
+    calibration = {'method': method, 'params': fit(proba[fit_idx], y[fit_idx])}
+
+    calibration.update({
+        'classes': classes,
+        'model_sha256': file_sha256(model_path),
+        'report': {
+            'fit_rows': len(fit_idx),
+            'eval_rows': len(eval_idx),
+            'before': calibration_report(proba[eval_idx], y[eval_idx]),
+            'after': calibration_report(calibrate(calibration, proba[eval_idx]), y[eval_idx]),
+        },
+    })
+    tmp = f'{path}.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(calibration, f, indent=2)
+    os.replace(tmp, path)
+    return calibration
+
+
+def load_calibration(path=CALIBRATION_PATH, model_path=None):
+    # Trả về None nếu chưa hiệu chỉnh hoặc file hiệu chỉnh thuộc về mô hình khác
+    from lookup import file_sha256
+
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        calibration = json.load(f)
+    if model_path is not None and os.path.exists(model_path) and file_sha256(model_path) != calibration['model_sha256']:
+        return None
+    return calibration
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Hiệu chỉnh xác suất dự đoán của model.joblib trên dữ liệu giữ lại")
+    parser.add_argument('--method', default='temperature', choices=METHODS)
+    parser.add_argument('--model', default=None)
+    parser.add_argument('--data', default=None)
+    parser.add_argument('--out', default=CALIBRATION_PATH)
+    args = parser.parse_args()
+
+    calibration = build_calibration(args.method, args.model, args.out, args.data)
+    print(json.dumps({'method': calibration['method'], **calibration['report']}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,192 @@
+import os
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+import instrumentation
+from figures import get_figure_cache
+
+# 'matplotlib': ảnh raster vẽ trên server; 'plotly': gửi số liệu đã gộp (bin, số đếm, ma trận) để trình duyệt tự vẽ
+CHART_BACKEND = os.environ.get('INSIGHT_CHART_BACKEND', 'matplotlib')
+BACKENDS = ['matplotlib', 'plotly']
+
+PALETTE = ['#66c2a5', '#fc8d62', '#8da0cb', '#e78ac3', '#a6d854', '#ffd92f']
+MAX_BINS = 60
+MAX_OUTLIERS = 200
+
+
+def histogram(values, edges=None):
+    values = np.asarray(values, dtype=float)
+    values = values[~np.isnan(values)]
+    if edges is None:
+        edges = np.histogram_bin_edges(values, bins='auto')
+        if len(edges) > MAX_BINS + 1:
+            edges = np.linspace(edges[0], edges[-1], MAX_BINS + 1)
+    counts, edges = np.histogram(values, bins=edges)
+    return counts, edges
+
+
+def binned_kde(counts, edges, std):
+    # KDE xấp xỉ trên lưới bin (làm trơn histogram bằng nhân Gauss, băng thông Scott), cùng thang với số đếm
+    n = counts.sum()
+    width = edges[1] - edges[0]
+    if n < 2 or std == 0 or width == 0:
+        return counts.astype(float)
+    sigma = 1.06 * std * n ** (-1 / 5) / width
+    offsets = np.arange(-int(np.ceil(4 * sigma)), int(np.ceil(4 * sigma)) + 1)
+    kernel = np.exp(-0.5 * (offsets / sigma) ** 2)
+    padded = np.convolve(counts, kernel / kernel.sum(), mode='full')
+    return padded[len(offsets) // 2:len(offsets) // 2 + len(counts)]
+
+
+def box_stats(values):
+    values = np.asarray(values, dtype=float)
+    values = values[~np.isnan(values)]
+    q1, median, q3 = np.percentile(values, [25, 50, 75])
+    iqr = q3 - q1
+    inside = values[(values >= q1 - 1.5 * iqr) & (values <= q3 + 1.5 * iqr)]
+    outliers = np.unique(values[(values < q1 - 1.5 * iqr) | (values > q3 + 1.5 * iqr)])
+    if len(outliers) > MAX_OUTLIERS:
+        outliers = outliers[np.linspace(0, len(outliers) - 1, MAX_OUTLIERS).astype(int)]
+    return {'q1': q1, 'median': median, 'q3': q3,
+            'lowerfence': inside.min(), 'upperfence': inside.max(), 'outliers': outliers}
+
+
+def count_table(x, hue, order=None):
+    table = pd.crosstab(np.asarray(x), np.asarray(hue))
+    if order is not None:
+        table = table.reindex(order, fill_value=0)
+    return table
+
+
+def hist_trace(counts, edges, name=None, opacity=1.0):
+    import plotly.graph_objects as go
+
+    centers = (edges[:-1] + edges[1:]) / 2
+    return go.Bar(x=centers, y=counts, width=edges[1] - edges[0], name=name, opacity=opacity)
+
+
+def kde_trace(counts, edges, std, name=None, color=None):
+    import plotly.graph_objects as go
+
+    centers = (edges[:-1] + edges[1:]) / 2
+    return go.Scatter(x=centers, y=binned_kde(counts, edges, std), mode='lines', name=name,
+                      line={'color': color}, showlegend=False)
+
+
+def box_trace(values, name):
+    import plotly.graph_objects as go
+
+    stats = box_stats(values)
+    outliers = stats.pop('outliers')
+    box = go.Box(y=[name], orientation='h', name=name, boxpoints=False,
+                 **{key: [value] for key, value in stats.items()})
+    points = go.Scatter(x=outliers, y=[name] * len(outliers), mode='markers', name=name, showlegend=False)
+    return box, points
+
+
+def outlier_figure(values, col):
+    from plotly.subplots import make_subplots
+
+    fig = make_subplots(1, 2, subplot_titles=[f'Phân phối {col}', f'Boxplot {col}'])
+    counts, edges = histogram(values)
+    fig.add_trace(hist_trace(counts, edges, col), 1, 1)
+    fig.add_trace(kde_trace(counts, edges, np.nanstd(values), color='red'), 1, 1)
+    for trace in box_trace(values, col):
+        fig.add_trace(trace, 1, 2)
+    fig.update_layout(showlegend=False, height=350)
+    return fig
+
+
+def boxes_figure(columns, titles):
+    from plotly.subplots import make_subplots
+
+    fig = make_subplots(len(columns), 1, subplot_titles=titles)
+    for i, (name, values) in enumerate(columns.items(), start=1):
+        for trace in box_trace(values, name):
+            fig.add_trace(trace, i, 1)
+    fig.update_layout(showlegend=False, height=250 * len(columns))
+    return fig
+
+
+def grouped_histogram_figure(values, groups, title, legend_title='Target'):
+    import plotly.graph_objects as go
+
+    values = np.asarray(values, dtype=float)
+    groups = np.asarray(groups)
+    _, edges = histogram(values)
+    fig = go.Figure()
+    for level in np.unique(groups):
+        part = values[groups == level]
+        counts, _ = histogram(part, edges)
+        fig.add_trace(hist_trace(counts, edges, str(level), opacity=0.5))
+        fig.add_trace(kde_trace(counts, edges, part.std()))
+    fig.update_layout(title=title, barmode='overlay', legend_title_text=legend_title)
+    return fig
+
+
+def count_traces(table):
+    import plotly.graph_objects as go
+
+    x = [str(level) for level in table.index]
+    return [go.Bar(x=x, y=table[level].to_numpy(), name=str(level)) for level in table.columns]
+
+
+def count_figure(x, hue, title, order=None, legend_title='Target'):
+    import plotly.graph_objects as go
+
+    fig = go.Figure(count_traces(count_table(x, hue, order)))
+    fig.update_layout(title=title, barmode='group', legend_title_text=legend_title, xaxis_type='category')
+    return fig
+
+
+def count_grid_figure(data, columns, hue, ncols=3):
+    from plotly.subplots import make_subplots
+
+    nrows = -(-len(columns) // ncols)
+    fig = make_subplots(nrows, ncols, subplot_titles=columns)
+    for i, col in enumerate(columns):
+        for j, trace in enumerate(count_traces(count_table(data[col], data[hue]))):
+            trace.update(legendgroup=trace.name, showlegend=(i == 0), marker_color=PALETTE[j % len(PALETTE)])
+            fig.add_trace(trace, i // ncols + 1, i % ncols + 1)
+    fig.update_xaxes(type='category')
+    fig.update_layout(barmode='group', legend_title_text=hue, height=400 * nrows)
+    return fig
+
+
+def heatmap_figure(matrix, title, zmin=None, zmax=None, fmt='.2f', colorscale='YlOrRd', x_title=None, y_title=None):
+    import plotly.graph_objects as go
+
+    fig = go.Figure(go.Heatmap(z=matrix.to_numpy(), x=[str(c) for c in matrix.columns],
+                               y=[str(i) for i in matrix.index], zmin=zmin, zmax=zmax, colorscale=colorscale,
+                               texttemplate=f'%{{z:{fmt}}}'))
+    fig.update_layout(title=title, xaxis_title=x_title, yaxis_title=y_title, xaxis_type='category',
+                      yaxis_type='category')
+    return fig
+
+
+def pie_figure(labels, values, title, pull=None):
+    import plotly.graph_objects as go
+
+    fig = go.Figure(go.Pie(labels=labels, values=values, pull=pull, sort=False))
+    fig.update_layout(title=title)
+    return fig
+
+
+def render(key, build):
+    # Lưu JSON của figure (chỉ chứa số liệu đã gộp) trong cùng cache với ảnh matplotlib
+    import plotly.io as pio
+
+    cache = get_figure_cache()
+    key = ('plotly',) + tuple(key)
+    payload = cache.get(key)
+    instrumentation.inc('figure_cache_total', backend='plotly', result='miss' if payload is None else 'hit')
+    if payload is None:
+        with instrumentation.timer('figure_render_seconds', backend='plotly'):
+            fig = build()
+            payload = fig.to_json().encode('utf-8')
+        cache.put(key, payload)
+    else:
+        fig = pio.from_json(payload.decode('utf-8'), skip_invalid=True)
+    st.plotly_chart(fig, width='stretch')
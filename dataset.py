@@ -0,0 +1,267 @@
+import argparse
+import glob
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+import instrumentation
+from lookup import file_sha256
+
+DATA_PATH = 'data.csv'
+CACHE_DIR = 'data_cache'
+IDENTITY_FILE = 'identity.json'
+
+# Tăng khi đổi SCHEMA để bỏ các bản cache cũ
+SCHEMA_VERSION = 1
+
+TARGET_CATEGORIES = ['Dropout', 'Enrolled', 'Graduate']
+
+# Kiểu của từng cột sau khi nạp (tên cột đã chuẩn hóa: khoảng trắng -> '_', bỏ tab thừa)
+SCHEMA = {
+    'Marital_status': 'category',
+    'Application_mode': 'category',
+    'Application_order': 'uint8',
+    'Course': 'category',
+    'Daytime/evening_attendance': 'uint8',
+    'Previous_qualification': 'category',
+    'Previous_qualification_(grade)': 'float64',
+    'Nacionality': 'category',
+    "Mother's_qualification": 'category',
+    "Father's_qualification": 'category',
+    "Mother's_occupation": 'category',
+    "Father's_occupation": 'category',
+    'Admission_grade': 'float64',
+    'Displaced': 'uint8',
+    'Educational_special_needs': 'uint8',
+    'Debtor': 'uint8',
+    'Tuition_fees_up_to_date': 'uint8',
+    'Gender': 'uint8',
+    'Scholarship_holder': 'uint8',
+    'Age_at_enrollment': 'uint8',
+    'International': 'uint8',
+    'Curricular_units_1st_sem_(credited)': 'uint8',
+    'Curricular_units_1st_sem_(enrolled)': 'uint8',
+    'Curricular_units_1st_sem_(evaluations)': 'uint8',
+    'Curricular_units_1st_sem_(approved)': 'uint8',
+    'Curricular_units_1st_sem_(grade)': 'float64',
+    'Curricular_units_1st_sem_(without_evaluations)': 'uint8',
+    'Curricular_units_2nd_sem_(credited)': 'uint8',
+    'Curricular_units_2nd_sem_(enrolled)': 'uint8',
+    'Curricular_units_2nd_sem_(evaluations)': 'uint8',
+    'Curricular_units_2nd_sem_(approved)': 'uint8',
+    'Curricular_units_2nd_sem_(grade)': 'float64',
+    'Curricular_units_2nd_sem_(without_evaluations)': 'uint8',
+    'Unemployment_rate': 'float64',
+    'Inflation_rate': 'float64',
+    'GDP': 'float64',
+    'Target': 'category',
+}
+
+CONTINUOUS_COLS = [col for col, dtype in SCHEMA.items() if dtype == 'float64']
+
+
+def clean_column(name):
+    return name.strip().replace(' ', '_')
+
+
+def read_csv(path=DATA_PATH):
+    data = pd.read_csv(path, sep=';')
+    data.columns = [clean_column(x) for x in data.columns]
+    return data
+
+
+def apply_schema(data, columns=None):
+    columns = list(SCHEMA) if columns is None else columns
+    missing = [col for col in columns if col not in data.columns]
+    if missing:
+        raise ValueError(f"Thiếu cột theo schema: {missing}")
+
+    typed = {}
+    for col in columns:
+        dtype = SCHEMA[col]
+        values = data[col]
+        if dtype == 'category':
+            categories = TARGET_CATEGORIES if col == 'Target' else None
+            typed[col] = pd.Categorical(values, categories=categories)
+        elif dtype.startswith(('int', 'uint')):
+            # astype không báo lỗi khi tràn số nên phải kiểm tra miền giá trị trước
+            info = np.iinfo(dtype)
+            if len(values) and (values.min() < info.min or values.max() > info.max):
+                raise ValueError(f"Cột {col} nằm ngoài miền của {dtype}")
+            typed[col] = values.astype(dtype)
+        else:
+            typed[col] = values.astype(dtype)
+    return pd.DataFrame(typed, index=data.index)
+
+
+def iter_chunks(path=DATA_PATH, chunksize=100_000, columns=None):
+    # Đọc CSV theo từng khối đã áp schema; `columns` dùng tên đã chuẩn hóa và chỉ parse các cột đó
+    usecols = None
+    if columns is not None:
+        raw = {clean_column(x): x for x in pd.read_csv(path, sep=';', nrows=0).columns}
+        usecols = [raw[col] for col in columns]
+    for chunk in pd.read_csv(path, sep=';', chunksize=chunksize, usecols=usecols):
+        chunk.columns = [clean_column(x) for x in chunk.columns]
+        yield apply_schema(chunk, columns)
+
+
+def stat_signature(path):
+    info = os.stat(path)
+    return [info.st_ino, info.st_mtime_ns, info.st_size]
+
+
+def read_identities(cache_dir=CACHE_DIR):
+    path = os.path.join(cache_dir, IDENTITY_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def record_identity(path, data_hash, cache_dir=CACHE_DIR, signature=None):
+    identities = read_identities(cache_dir)
+    identities[os.path.abspath(path)] = {'signature': signature or stat_signature(path), 'sha256': data_hash}
+    os.makedirs(cache_dir, exist_ok=True)
+    target = os.path.join(cache_dir, IDENTITY_FILE)
+    tmp = f'{target}.tmp-{os.getpid()}'
+    with open(tmp, 'w') as f:
+        json.dump(identities, f, indent=2)
+    os.replace(tmp, target)
+
+
+def data_identity(path=DATA_PATH, cache_dir=CACHE_DIR):
+    # Định danh của file dữ liệu dùng làm khóa cho cache, artifact Insight và hồ sơ tham chiếu của drift:
+    # sha256 của nội dung, hoặc hash nối chuỗi do ingest.py ghi sau mỗi lần bổ sung (chain_hash).
+    # Chỉ đọc và hash lại toàn bộ file khi (inode, mtime_ns, size) khác lần ghi nhận trước
+    signature = stat_signature(path)
+    entry = read_identities(cache_dir).get(os.path.abspath(path))
+    if entry is not None and entry['signature'] == signature:
+        return entry['sha256']
+    data_hash = file_sha256(path)
+    record_identity(path, data_hash, cache_dir, signature)
+    return data_hash
+
+
+def chain_hash(old_hash, delta_hash):
+    # Định danh sau khi ghi thêm: chỉ phụ thuộc định danh cũ và hash của phần bổ sung, không đọc lại file
+    return hashlib.sha256(f'{old_hash}+{delta_hash}'.encode('ascii')).hexdigest()
+
+
+def cache_path(data_hash, cache_dir=CACHE_DIR):
+    # Mỗi bản cache là một thư mục các phần Parquet: bản đầy đủ là part-00000, mỗi lần ingest thêm một phần
+    return os.path.join(cache_dir, f'data.v{SCHEMA_VERSION}.{data_hash[:16]}')
+
+
+def cache_parts(cached):
+    return sorted(glob.glob(os.path.join(cached, 'part-*.parquet')))
+
+
+@instrumentation.timed('load_data_seconds')
+def load_dataset(path=DATA_PATH, cache_dir=CACHE_DIR, data_hash=None):
+    # Đọc từ cache Parquet nếu định danh của file CSV không đổi, nếu không thì parse CSV và ghi cache mới
+    data_hash = data_hash or data_identity(path, cache_dir)
+    cached = cache_path(data_hash, cache_dir)
+    hit = os.path.isdir(cached)
+    instrumentation.inc('data_cache_total', result='hit' if hit else 'miss')
+    if hit:
+        # Parquet không giữ được category có giá trị số nên áp lại schema (rẻ vì cột đã đúng kiểu)
+        parts = [pd.read_parquet(part) for part in cache_parts(cached)]
+        return apply_schema(parts[0] if len(parts) == 1 else pd.concat(parts, ignore_index=True))
+
+    data = apply_schema(read_csv(path))
+    write_cache(data, cached, cache_dir)
+    return data
+
+
+def write_cache(data, cached, cache_dir=CACHE_DIR):
+    os.makedirs(cache_dir, exist_ok=True)
+    for old in glob.glob(os.path.join(cache_dir, 'data.v*')):
+        if '.tmp-' in old:
+            continue
+        if os.path.isdir(old):
+            shutil.rmtree(old)
+        else:
+            os.remove(old)
+    tmp = f'{cached}.tmp-{os.getpid()}'
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    data.to_parquet(os.path.join(tmp, 'part-00000.parquet'))
+    os.replace(tmp, cached)
+
+
+def append_rows(delta, path=DATA_PATH):
+    # Ghi thêm các dòng mới vào cuối file CSV, giữ nguyên thứ tự và tên cột gốc
+    header = list(pd.read_csv(path, sep=';', nrows=0).columns)
+    delta = delta[[clean_column(x) for x in header]]
+    with open(path, 'rb+') as f:
+        f.seek(0, os.SEEK_END)
+        if f.tell() > 0:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b'\n':
+                f.write(b'\n')
+    delta.to_csv(path, sep=';', mode='a', header=False, index=False)
+
+
+def extend_cache(old_hash, new_hash, delta, cache_dir=CACHE_DIR):
+    # Cache cho file sau khi ghi thêm = các phần cũ (đổi tên thư mục) + một phần mới chỉ chứa dòng bổ sung.
+    # Gọi trước khi ghi nhận định danh mới để không ai đọc thư mục mới khi phần bổ sung chưa có.
+    old = cache_path(old_hash, cache_dir)
+    if not os.path.isdir(old):
+        return False
+    cached = cache_path(new_hash, cache_dir)
+    os.replace(old, cached)
+    part = os.path.join(cached, f'part-{len(cache_parts(cached)):05d}.parquet')
+    tmp = f'{part}.tmp-{os.getpid()}'
+    apply_schema(delta).to_parquet(tmp)
+    os.replace(tmp, part)
+    return True
+
+
+def memory_report(path=DATA_PATH):
+    start = time.perf_counter()
+    raw = read_csv(path)
+    csv_s = time.perf_counter() - start
+
+    # Cache tạm riêng: lần nạp đầu luôn là miss thật, không dùng lại (hay ghi đè) cache của ứng dụng
+    with tempfile.TemporaryDirectory() as cache_dir:
+        start = time.perf_counter()
+        typed = load_dataset(path, cache_dir)
+        first_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        load_dataset(path, cache_dir)
+        cached_s = time.perf_counter() - start
+
+    raw_bytes = int(raw.memory_usage(deep=True).sum())
+    typed_bytes = int(typed.memory_usage(deep=True).sum())
+    return {
+        'rows': len(typed),
+        'raw_bytes': raw_bytes,
+        'typed_bytes': typed_bytes,
+        'reduction': raw_bytes / typed_bytes,
+        'csv_parse_s': csv_s,
+        'first_load_s': first_s,
+        'cached_load_s': cached_s,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Nạp data.csv theo schema và báo cáo bộ nhớ trước/sau")
+    parser.add_argument('--data', default=DATA_PATH)
+    args = parser.parse_args()
+
+    report = memory_report(args.data)
+    print(f"{report['rows']} dòng: {report['raw_bytes'] / 2**20:.2f} MB -> {report['typed_bytes'] / 2**20:.2f} MB "
+          f"(giảm {report['reduction']:.1f}x)")
+    print(f"Parse CSV: {report['csv_parse_s']:.3f}s, nạp lần đầu: {report['first_load_s']:.3f}s, "
+          f"nạp từ cache: {report['cached_load_s']:.3f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,341 @@
+import argparse
+import io
+import json
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from dataset import DATA_PATH, data_identity
+from lookup import FEATURE_RANGES, file_sha256
+from scoring import CLASS_NAMES, FEATURE_COLUMNS, MODEL_PATH
+
+# Log dự đoán của trang Predict: mỗi dòng "time,8 đặc trưng,lớp dự đoán". PREDICTION_LOG= (rỗng) để tắt ghi log.
+MONITOR_DIR = os.environ.get('MONITOR_DIR', 'monitoring')
+LOG_PATH = os.environ.get('PREDICTION_LOG', os.path.join(MONITOR_DIR, 'predictions.log'))
+STATE_PATH = os.path.join(MONITOR_DIR, 'state.npz')
+REFERENCE_PATH = os.path.join(MONITOR_DIR, 'reference.json')
+REFERENCE_VERSION = 1
+
+LOG_COLUMNS = ['time'] + FEATURE_COLUMNS + ['prediction']
+CLASSES = sorted(CLASS_NAMES)
+READ_BLOCK = 64 << 20
+
+# Mọi đầu vào là số nguyên trong miền của FEATURE_RANGES nên histogram một ô cho mỗi giá trị là chính xác
+# mà bộ nhớ vẫn cố định; lớp dự đoán là nhóm cuối. Tất cả ghép thành một vector N_BINS ô.
+BIN_SIZES = [hi - lo + 1 for lo, hi in FEATURE_RANGES] + [len(CLASSES)]
+OFFSETS = np.cumsum([0] + BIN_SIZES)
+N_BINS = int(OFFSETS[-1])
+GROUPS = FEATURE_COLUMNS + ['Prediction']
+ORDINAL = ['Age at enrollment', 'Grade semester 1', 'Grade semester 2']
+
+# Cửa sổ trượt: (độ rộng một ô thời gian tính bằng giây, số ô)
+WINDOWS = {'1h': (60, 60), '24h': (900, 96), '30d': (86400, 30)}
+# Ngưỡng PSI thường dùng: dưới 0.1 ổn định, 0.1–0.25 lệch vừa, trên 0.25 lệch lớn
+PSI_THRESHOLDS = (0.1, 0.25)
+PSI_EPSILON = 1e-4
+
+
+def log_prediction(features, prediction, path=LOG_PATH, now=None):
+    # Một lệnh write với O_APPEND cho mỗi dòng: nhiều worker cùng ghi một file mà không chen lẫn dòng
+    if not path:
+        return
+    line = ','.join([f'{time.time() if now is None else now:.3f}', *map(str, features), str(prediction)]) + '\n'
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        os.write(fd, line.encode('ascii'))
+    finally:
+        os.close(fd)
+
+
+def bin_indices(features, prediction):
+    # Vị trí ô của từng đặc trưng và của lớp dự đoán trong vector N_BINS, dạng (n, 9);
+    # giá trị ngoài miền (vd. điểm lẻ của data.csv) được làm tròn và kẹp vào ô biên
+    lo = np.array([lo for lo, _ in FEATURE_RANGES])
+    size = np.array(BIN_SIZES[:-1])
+    idx = np.clip(np.rint(np.asarray(features, dtype=float)).astype(np.int64) - lo, 0, size - 1) + OFFSETS[:-2]
+    cls = np.searchsorted(CLASSES, np.asarray(prediction).astype(np.int64)) + OFFSETS[-2]
+    return np.column_stack([idx, cls])
+
+
+def histogram(bins):
+    return np.bincount(bins.ravel(), minlength=N_BINS)
+
+
+def reference_key(data_path, model_path, calibration_path, data_hash=None):
+    return {
+        'version': REFERENCE_VERSION,
+        'data_sha256': data_hash or data_identity(data_path),
+        'model_sha256': file_sha256(model_path),
+        'calibration_sha256': file_sha256(calibration_path) if os.path.exists(calibration_path) else None,
+    }
+
+
+def score_counts(data, model_path):
+    # Histogram 8 đặc trưng và lớp mà mô hình (đã hiệu chỉnh nếu có) dự đoán, cùng cách chia ô với log
+    from calibration import CALIBRATION_PATH, load_calibration
+    from scoring import load_model, score_frame
+
+    scored = score_frame(load_model(model_path), data,
+                         calibration=load_calibration(CALIBRATION_PATH, model_path=model_path))
+    return histogram(bin_indices(scored[FEATURE_COLUMNS].to_numpy(), scored['Prediction'].to_numpy())), len(scored)
+
+
+def write_reference(reference, path):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp = f'{path}.tmp-{os.getpid()}'
+    with open(tmp, 'w') as f:
+        json.dump(reference, f)
+    os.replace(tmp, path)
+
+
+def read_reference(path=REFERENCE_PATH):
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def build_reference(data_path=DATA_PATH, model_path=MODEL_PATH, path=REFERENCE_PATH):
+    # Hồ sơ tham chiếu: histogram của data.csv và phân bố lớp mà mô hình dự đoán trên chính data.csv
+    from calibration import CALIBRATION_PATH
+
+    counts, rows = score_counts(pd.read_csv(data_path, sep=';'), model_path)
+    reference = {**reference_key(data_path, model_path, CALIBRATION_PATH), 'rows': rows,
+                 'built_at': time.time(), 'counts': counts.tolist()}
+    write_reference(reference, path)
+    return reference
+
+
+def reference_matches(reference, key):
+    return (reference is not None and all(reference.get(k) == v for k, v in key.items())
+            and len(reference['counts']) == N_BINS)
+
+
+def load_reference(data_path=DATA_PATH, model_path=MODEL_PATH, path=REFERENCE_PATH):
+    # Chỉ build lại khi data.csv, mô hình hoặc file hiệu chỉnh đổi
+    from calibration import CALIBRATION_PATH
+
+    reference = read_reference(path)
+    if reference_matches(reference, reference_key(data_path, model_path, CALIBRATION_PATH)):
+        return reference
+    return build_reference(data_path, model_path, path)
+
+
+def extend_reference(delta, old_hash, new_hash, data_path=DATA_PATH, model_path=MODEL_PATH, path=REFERENCE_PATH):
+    # Sau ingest.py: cộng histogram của riêng phần bổ sung vào hồ sơ tham chiếu thay vì chấm điểm lại data.csv.
+    # Hồ sơ không khớp dữ liệu trước khi ghi thêm (hoặc chưa có) thì để load_reference build lại khi cần.
+    from calibration import CALIBRATION_PATH
+
+    reference = read_reference(path)
+    if reference is None:
+        return False
+    if not reference_matches(reference, reference_key(data_path, model_path, CALIBRATION_PATH, old_hash)):
+        return False
+    counts, rows = score_counts(delta, model_path)
+    reference.update(data_sha256=new_hash, rows=reference['rows'] + rows,
+                     counts=(np.asarray(reference['counts']) + counts).tolist())
+    write_reference(reference, path)
+    return True
+
+
+class SlidingWindow:
+    # Vòng n ô thời gian, mỗi ô giữ histogram N_BINS của các dòng rơi vào khoảng `width` giây của nó.
+    # Ô hết hạn được xóa khi tới lượt dùng lại: bộ nhớ cố định n × N_BINS bất kể log dài bao nhiêu.
+    def __init__(self, width, n_buckets):
+        self.width = width
+        self.n = n_buckets
+        self.ids = np.full(n_buckets, -1, dtype=np.int64)
+        self.counts = np.zeros((n_buckets, N_BINS), dtype=np.int64)
+
+    def update(self, times, bins):
+        if len(times) == 0:
+            return
+        buckets = (np.asarray(times) // self.width).astype(np.int64)
+        newest = max(int(buckets.max()), int(self.ids.max()))
+        # Ô s giữ khoảng thời gian duy nhất có id ≡ s (mod n) trong (newest - n, newest]
+        expected = newest - (newest - np.arange(self.n)) % self.n
+        stale = self.ids != expected
+        self.counts[stale] = 0
+        self.ids[stale] = expected[stale]
+
+        keep = buckets > newest - self.n
+        slots = buckets[keep] % self.n
+        flat = (slots[:, None] * N_BINS + bins[keep]).ravel()
+        self.counts += np.bincount(flat, minlength=self.n * N_BINS).reshape(self.n, N_BINS)
+
+    def totals(self, now=None):
+        current = int((time.time() if now is None else now) // self.width)
+        return self.counts[(self.ids > current - self.n) & (self.ids <= current)].sum(axis=0)
+
+
+def parse_log(data):
+    log = pd.read_csv(io.BytesIO(data), header=None, names=LOG_COLUMNS, on_bad_lines='skip')
+    return log.dropna()
+
+
+class Monitor:
+    # Tóm tắt cộng dồn của log dự đoán: tổng toàn bộ log và các cửa sổ trượt. refresh() chỉ đọc phần log
+    # ghi thêm kể từ offset đã xử lý, nên chi phí tỉ lệ với số dòng mới chứ không với độ dài log.
+    # Trạng thái được lưu lại (state.npz) để worker mới khởi động không phải đọc lại log từ đầu.
+    def __init__(self, log_path=LOG_PATH, state_path=STATE_PATH, windows=WINDOWS):
+        self.log_path = log_path
+        self.state_path = state_path
+        self.specs = dict(windows)
+        self.lock = threading.Lock()
+        self.reset()
+        self.load_state()
+
+    def reset(self, inode=None):
+        self.windows = {name: SlidingWindow(*spec) for name, spec in self.specs.items()}
+        self.total = np.zeros(N_BINS, dtype=np.int64)
+        self.offset = 0
+        self.inode = inode
+        self.rows = 0
+        self.last_time = None
+
+    def layout(self):
+        return json.dumps({'bins': BIN_SIZES, 'windows': self.specs})
+
+    def load_state(self):
+        if not os.path.exists(self.state_path):
+            return
+        with np.load(self.state_path) as state:
+            if str(state['layout']) != self.layout():
+                return
+            self.offset, self.inode, self.rows = int(state['offset']), int(state['inode']), int(state['rows'])
+            self.last_time = float(state['last_time']) if self.rows else None
+            self.total = state['total']
+            for name, window in self.windows.items():
+                window.ids, window.counts = state[f'{name}_ids'], state[f'{name}_counts']
+
+    def save_state(self):
+        arrays = {'layout': self.layout(), 'offset': self.offset, 'inode': self.inode or 0, 'rows': self.rows,
+                  'last_time': self.last_time or 0.0, 'total': self.total}
+        for name, window in self.windows.items():
+            arrays[f'{name}_ids'], arrays[f'{name}_counts'] = window.ids, window.counts
+        os.makedirs(os.path.dirname(self.state_path) or '.', exist_ok=True)
+        tmp = f'{self.state_path}.tmp-{os.getpid()}.npz'
+        np.savez(tmp, **arrays)
+        os.replace(tmp, self.state_path)
+
+    def ingest(self, log):
+        if log.empty:
+            return 0
+        times = log['time'].to_numpy()
+        bins = bin_indices(log[FEATURE_COLUMNS].to_numpy(), log['prediction'].to_numpy())
+        self.total += histogram(bins)
+        for window in self.windows.values():
+            window.update(times, bins)
+        self.rows += len(log)
+        self.last_time = max(self.last_time or 0.0, float(times.max()))
+        return len(log)
+
+    def refresh(self, block_size=READ_BLOCK, save=True):
+        with self.lock:
+            try:
+                stat = os.stat(self.log_path)
+            except FileNotFoundError:
+                return 0
+            if stat.st_ino != self.inode or stat.st_size < self.offset:
+                # Log bị xoay vòng/thay mới: tính lại từ đầu file mới
+                self.reset(stat.st_ino)
+            rows = 0
+            with open(self.log_path, 'rb') as f:
+                f.seek(self.offset)
+                while True:
+                    block = f.read(block_size)
+                    # Dòng cuối có thể đang được ghi dở: chỉ nhận tới ký tự xuống dòng cuối cùng
+                    end = block.rfind(b'\n') + 1
+                    if end == 0:
+                        break
+                    rows += self.ingest(parse_log(block[:end]))
+                    self.offset += end
+                    if len(block) < block_size:
+                        break
+                    f.seek(self.offset)
+            if rows and save:
+                self.save_state()
+            return rows
+
+    def counts(self, window='all', now=None):
+        with self.lock:
+            if window == 'all':
+                return self.total.copy()
+            return self.windows[window].totals(now)
+
+
+def severity(psi):
+    if psi >= PSI_THRESHOLDS[1]:
+        return 'lệch lớn'
+    if psi >= PSI_THRESHOLDS[0]:
+        return 'lệch vừa'
+    return 'ổn định'
+
+
+def drift_report(counts, reference):
+    # PSI và chi-square (đồng nhất hai phân bố) cho mọi nhóm, KS cho các đặc trưng có thứ tự (tuổi, điểm).
+    # Chỉ dùng hai vector N_BINS ô: chi phí không phụ thuộc số dòng trong log.
+    from scipy.stats import kstwo
+
+    from stat_tests import chi2_tables
+
+    counts, reference = np.asarray(counts, dtype=float), np.asarray(reference, dtype=float)
+    rows, tables = [], {}
+    for i, name in enumerate(GROUPS):
+        cur, ref = counts[OFFSETS[i]:OFFSETS[i + 1]], reference[OFFSETS[i]:OFFSETS[i + 1]]
+        n, m = cur.sum(), ref.sum()
+        row = {'feature': name, 'n': int(n), 'psi': np.nan, 'ks': np.nan, 'ks_p': np.nan}
+        if n > 0:
+            p, q = np.maximum(cur / n, PSI_EPSILON), np.maximum(ref / m, PSI_EPSILON)
+            row['psi'] = float(np.sum((p - q) * np.log(p / q)))
+            if name in ORDINAL:
+                d = float(np.max(np.abs(np.cumsum(cur) / n - np.cumsum(ref) / m)))
+                row['ks'], row['ks_p'] = d, float(kstwo.sf(d, max(1, round(n * m / (n + m)))))
+            tables[name] = np.column_stack([cur, ref])
+        rows.append(row)
+
+    report = pd.DataFrame(rows).set_index('feature')
+    report['chi2_p'] = np.nan
+    if tables:
+        report.loc[list(tables), 'chi2_p'] = chi2_tables(tables)['p_value']
+    report['status'] = [severity(psi) if n else '' for psi, n in zip(report['psi'], report['n'])]
+    return report
+
+
+def distribution(counts, reference, group):
+    # Tỷ lệ từng giá trị của một nhóm trong log so với tham chiếu, để vẽ hai histogram cạnh nhau
+    i = GROUPS.index(group)
+    cur = np.asarray(counts[OFFSETS[i]:OFFSETS[i + 1]], dtype=float)
+    ref = np.asarray(reference[OFFSETS[i]:OFFSETS[i + 1]], dtype=float)
+    if group == 'Prediction':
+        index = [CLASS_NAMES[c] for c in CLASSES]
+    else:
+        lo, hi = FEATURE_RANGES[i]
+        index = list(range(lo, hi + 1))
+    return pd.DataFrame({'Log dự đoán': cur / max(cur.sum(), 1), 'data.csv': ref / max(ref.sum(), 1)},
+                        index=pd.Index(index, name=group))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Đo độ lệch giữa đầu vào của trang Predict và data.csv")
+    parser.add_argument('--log', default=LOG_PATH)
+    parser.add_argument('--state', default=STATE_PATH)
+    parser.add_argument('--window', default='all', choices=['all'] + list(WINDOWS))
+    parser.add_argument('--rebuild-reference', action='store_true')
+    args = parser.parse_args()
+
+    reference = build_reference() if args.rebuild_reference else load_reference()
+    monitor = Monitor(args.log, args.state)
+    start = time.perf_counter()
+    new_rows = monitor.refresh()
+    print(f"{monitor.rows} dòng trong log ({new_rows} dòng mới, {time.perf_counter() - start:.2f}s)")
+    with pd.option_context('display.width', 120):
+        print(drift_report(monitor.counts(args.window), reference['counts']))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+import argparse
+import json
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from scoring import CLASS_NAMES, DROPOUT_CLASS, FEATURE_COLUMNS, MODEL_PATH, load_model
+
+# Bộ 8 đặc trưng là số nguyên nhỏ và lặp lại nhiều: cache đóng góp SHAP theo bộ đặc trưng
+EXPLANATION_CACHE_SIZE = 100_000
+TOP_FACTORS = 3
+
+
+def native_contributions(model, X):
+    # Đóng góp SHAP (TreeSHAP) do booster tự tính, dạng (n, số lớp, số đặc trưng + 1), đơn vị log-odds;
+    # phần tử cuối là giá trị kỳ vọng (base value)
+    name = type(model).__name__
+    if name == 'CatBoostClassifier':
+        from catboost import Pool
+        values = model.get_feature_importance(Pool(X), type='ShapValues')
+    elif name == 'XGBClassifier':
+        from xgboost import DMatrix
+        values = model.get_booster().predict(DMatrix(X), pred_contribs=True)
+    elif name == 'LGBMClassifier':
+        values = model.predict(X, pred_contrib=True)
+    else:
+        raise ValueError(f"Mô hình {name} không có đầu ra đóng góp đặc trưng gốc (cần CatBoost/XGBoost/LightGBM)")
+    return np.asarray(values, dtype=np.float64).reshape(len(X), -1, len(FEATURE_COLUMNS) + 1)
+
+
+class Explainer:
+    def __init__(self, model, maxsize=EXPLANATION_CACHE_SIZE):
+        self.model = model
+        self.maxsize = maxsize
+        self.cache = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        classes = [int(c) for c in model.classes_]
+        self.class_index = classes.index(DROPOUT_CLASS) if len(classes) > 2 else 0
+
+    def explain(self, X):
+        # Gộp các dòng trùng trong lô, chỉ gọi booster cho các bộ đặc trưng chưa có trong cache
+        X = X[FEATURE_COLUMNS]
+        if X.empty:
+            return np.empty((0, len(self.model.classes_), len(FEATURE_COLUMNS) + 1))
+        unique, inverse = np.unique(X.to_numpy(), axis=0, return_inverse=True)
+        keys = [tuple(row) for row in unique.tolist()]
+
+        found, missing = {}, []
+        with self.lock:
+            for i, key in enumerate(keys):
+                value = self.cache.get(key)
+                if value is None:
+                    missing.append(i)
+                else:
+                    self.cache.move_to_end(key)
+                    found[i] = value
+            self.hits += len(found)
+            self.misses += len(missing)
+
+        computed = None
+        if missing:
+            rows = pd.DataFrame(unique[missing], columns=FEATURE_COLUMNS).astype(X.dtypes.to_dict())
+            computed = native_contributions(self.model, rows)
+            with self.lock:
+                for i, value in zip(missing, computed):
+                    self.cache[keys[i]] = value
+                while len(self.cache) > self.maxsize:
+                    self.cache.popitem(last=False)
+
+        shape = computed.shape[1:] if computed is not None else next(iter(found.values())).shape
+        values = np.empty((len(unique),) + shape)
+        if computed is not None:
+            values[missing] = computed
+        for i, value in found.items():
+            values[i] = value
+        return values[inverse.ravel()]
+
+    def explain_one(self, features):
+        # Đóng góp của từng đặc trưng vào khả năng bỏ học của một sinh viên, sắp theo độ lớn
+        X = pd.DataFrame([features], columns=FEATURE_COLUMNS)
+        values = self.explain(X)[0, self.class_index]
+        contributions = pd.Series(values[:-1], index=FEATURE_COLUMNS)
+        return contributions.reindex(contributions.abs().sort_values(ascending=False).index), float(values[-1])
+
+    def frame(self, X):
+        # Cột ghi kèm kết quả chấm theo lô: SHAP của lớp Dropout cho từng đặc trưng, base value
+        # và các đặc trưng đẩy nguy cơ bỏ học lên nhiều nhất
+        values = self.explain(X)[:, self.class_index]
+        contrib = values[:, :-1]
+        columns = {f'SHAP_{col}': contrib[:, j] for j, col in enumerate(FEATURE_COLUMNS)}
+        columns['SHAP_base'] = values[:, -1]
+        top = np.argsort(-contrib, axis=1)[:, :TOP_FACTORS]
+        columns['Top_factors'] = ['; '.join(f'{FEATURE_COLUMNS[j]} ({row[j]:+.2f})' for j in idx if row[j] > 0)
+                                  for row, idx in zip(contrib, top)]
+        return pd.DataFrame(columns, index=X.index)
+
+    def cache_info(self):
+        with self.lock:
+            return {'hits': self.hits, 'misses': self.misses, 'size': len(self.cache), 'maxsize': self.maxsize}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Chấm điểm cả khóa kèm giải thích SHAP cho từng sinh viên")
+    parser.add_argument('source', help="File CSV/Parquet cùng cột với data.csv hoặc 8 cột đặc trưng")
+    parser.add_argument('--out', default='predictions.csv')
+    parser.add_argument('--model', default=MODEL_PATH)
+    parser.add_argument('--sep', default=None)
+    args = parser.parse_args()
+
+    from scoring import score_file
+
+    explainer = Explainer(load_model(args.model))
+    with open(args.out, 'wb') as out:
+        _, stats = score_file(explainer.model, args.source, out=out, sep=args.sep, explainer=explainer)
+    stats.pop('top_risk')
+    stats['explain_cache'] = explainer.cache_info()
+    print(json.dumps({'out': args.out, 'explained_class': CLASS_NAMES[DROPOUT_CLASS], **stats}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
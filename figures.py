@@ -0,0 +1,151 @@
+import hashlib
+import io
+import os
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+import streamlit as st
+from matplotlib.figure import Figure
+
+import instrumentation
+
+# Định dạng ảnh lưu trong cache: 'png' hoặc 'svg'
+FIGURE_FORMAT = os.environ.get('INSIGHT_FIGURE_FORMAT', 'png')
+# Giới hạn tổng dung lượng ảnh trong cache (MB), vượt quá thì loại ảnh ít dùng nhất
+FIGURE_CACHE_MB = float(os.environ.get('INSIGHT_FIGURE_CACHE_MB', 64))
+
+# Giống mặc định của st.pyplot để ảnh hiển thị không đổi
+SAVEFIG_OPTIONS = {'bbox_inches': 'tight', 'dpi': 200}
+# Giới hạn số điểm ảnh khi raster hóa (hạ dpi cho hình lớn như lưới 40x30 inch ở section_3)
+MAX_RENDER_PIXELS = int(os.environ.get('INSIGHT_MAX_RENDER_PIXELS', 8_000_000))
+# Số hình được vẽ đồng thời trong tiến trình, giới hạn bộ nhớ đỉnh khi nhiều phiên cùng mở trang
+MAX_CONCURRENT_RENDERS = int(os.environ.get('INSIGHT_MAX_CONCURRENT_RENDERS', 2))
+# Streamlit thu nhỏ mọi ảnh rộng hơn mức này ở mỗi lần hiển thị; thu nhỏ sẵn một lần trước khi lưu cache
+MAX_IMAGE_WIDTH = 1460
+
+
+_render_slots = threading.BoundedSemaphore(MAX_CONCURRENT_RENDERS)
+
+
+def subplots(nrows=1, ncols=1, figsize=None, **kwargs):
+    # Thay cho plt.subplots: Figure không đăng ký vào pyplot nên được giải phóng ngay khi hết tham chiếu
+    fig = Figure(figsize=figsize)
+    axes = fig.subplots(nrows, ncols, squeeze=True, **kwargs)
+    return fig, axes
+
+
+def render_dpi(fig, dpi=SAVEFIG_OPTIONS['dpi']):
+    width, height = fig.get_size_inches()
+    max_dpi = (MAX_RENDER_PIXELS / (width * height)) ** 0.5
+    return min(dpi, max_dpi)
+
+
+class FigureCache:
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.items = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            payload = self.items.get(key)
+            if payload is None:
+                self.misses += 1
+                return None
+            self.items.move_to_end(key)
+            self.hits += 1
+            return payload
+
+    def put(self, key, payload):
+        with self.lock:
+            if len(payload) > self.max_bytes:
+                return
+            old = self.items.pop(key, None)
+            if old is not None:
+                self.size -= len(old)
+            self.items[key] = payload
+            self.size += len(payload)
+            while self.size > self.max_bytes:
+                _, evicted = self.items.popitem(last=False)
+                self.size -= len(evicted)
+                self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.items.clear()
+            self.size = 0
+
+    def stats(self):
+        with self.lock:
+            return {
+                'entries': len(self.items),
+                'bytes': self.size,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+
+
+@st.cache_resource
+def get_figure_cache():
+    # Dùng chung cho mọi phiên trong tiến trình
+    return FigureCache(int(FIGURE_CACHE_MB * 1024 * 1024))
+
+
+def data_fingerprint(data):
+    h = hashlib.sha1(pd.util.hash_pandas_object(data, index=True).values.tobytes())
+    h.update('|'.join(map(str, data.columns)).encode('utf-8'))
+    h.update('|'.join(map(str, data.dtypes)).encode('utf-8'))
+    return h.hexdigest()
+
+
+def figure_bytes(fig, fmt=FIGURE_FORMAT):
+    buf = io.BytesIO()
+    fig.savefig(buf, format=fmt, **{**SAVEFIG_OPTIONS, 'dpi': render_dpi(fig)})
+    if fmt != 'png':
+        return buf.getvalue()
+
+    from PIL import Image
+
+    buf.seek(0)
+    image = Image.open(buf)
+    if image.width <= MAX_IMAGE_WIDTH:
+        return buf.getvalue()
+    height = int(image.height * MAX_IMAGE_WIDTH / image.width)
+    out = io.BytesIO()
+    image.resize((MAX_IMAGE_WIDTH, height), resample=Image.BILINEAR).save(out, format='PNG')
+    return out.getvalue()
+
+
+@instrumentation.timed('figure_render_seconds', backend='matplotlib')
+def draw_bytes(draw, fmt=FIGURE_FORMAT):
+    with _render_slots:
+        fig = draw()
+        try:
+            return figure_bytes(fig, fmt)
+        finally:
+            # Giải phóng artist và bộ đệm raster ngay, không chờ GC
+            fig.clear()
+            del fig
+
+
+def render(key, draw, fmt=FIGURE_FORMAT):
+    # key = (dấu vân tay dữ liệu, section, tên hình); draw() chỉ được gọi khi cache chưa có
+    cache = get_figure_cache()
+    key = (fmt,) + tuple(key)
+    payload = cache.get(key)
+    instrumentation.inc('figure_cache_total', backend='matplotlib', result='miss' if payload is None else 'hit')
+    if payload is None:
+        payload = draw_bytes(draw, fmt)
+        cache.put(key, payload)
+
+    if fmt == 'svg':
+        st.image(payload.decode('utf-8'), width='stretch')
+    else:
+        st.image(payload, width='stretch', output_format='PNG')
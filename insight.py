@@ -1,34 +1,84 @@
+import os
+import time
+from collections import namedtuple
 import streamlit as st
 import pandas as pd
-import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
-from sklearn.preprocessing import LabelEncoder
-from sklearn.feature_selection import chi2
-from scipy.stats import chi2_contingency, f_oneway
-from sklearn.metrics import accuracy_score, f1_score, confusion_matrix, classification_report
-from imblearn.over_sampling import SMOTE
+import charts
+import instrumentation
+from figures import data_fingerprint, get_figure_cache, render, subplots
+import insight_stats
+from insight_stats import DATA_PATH, FINANCIAL_VARS, SCORE_COLS, SOCIAL_VARS, encode_target
+from dataset import data_identity
 import warnings
 warnings.filterwarnings('ignore')
 
-@st.cache_data
-def load_data():
-    data = pd.read_csv("data.csv", sep=';')
-    data.columns = [x.replace(' ', '_') for x in data.columns]
-    return data
+Frames = namedtuple('Frames', ['data', 'clean', 'codes', 'fp', 'clean_fp'])
+
+@st.cache_resource(max_entries=2)
+def hash_data(signature):
+    return data_identity(DATA_PATH)
+
+def current_data_hash():
+    # Chỉ tra lại định danh của data.csv (dataset.data_identity) khi (inode, mtime_ns, size) đổi,
+    # như scoring.Reloadable: mỗi lần chạy lại trang chỉ tốn một lượt stat
+    info = os.stat(DATA_PATH)
+    return hash_data((info.st_ino, info.st_mtime_ns, info.st_size))
+
+@st.cache_resource(max_entries=2)
+def load_stats(data_hash):
+    # Thống kê tính sẵn (python insight_stats.py), tự build lại khi data.csv đổi
+    return insight_stats.ensure(DATA_PATH, data_hash=data_hash)
+
+@st.cache_resource(max_entries=2)
+def load_frames(data_hash):
+    # Giai đoạn chuẩn bị dùng chung giữa các lần hiển thị (cache_resource: không sao chép khi đọc lại).
+    # Lọc ngoại lai bằng một mặt nạ IQR gộp và mã hóa Target một lần; các phần chỉ đọc, không được sửa.
+    return prepare_frames(insight_stats.read_data(DATA_PATH, data_hash), load_stats(data_hash))
+
+def prepare_frames(data, stats):
+    clean = data[stats['keep']]
+    codes = encode_target(clean['Target'])
+    codes.flags.writeable = False
+    return Frames(data, clean, codes, data_fingerprint(data), data_fingerprint(clean))
+
+CATEGORICAL_COLS = ['Daytime/evening_attendance', 'Tuition_fees_up_to_date', 'Gender',
+                    'Displaced', 'Debtor', 'Scholarship_holder']
+
+def chart(key, draw, build):
+    # draw(): hình matplotlib vẽ trên server; build(): figure plotly từ số liệu đã gộp, trình duyệt tự vẽ
+    if st.session_state.get('insight_chart_backend', charts.CHART_BACKEND) == 'plotly':
+        charts.render(key, build)
+    else:
+        render(key, draw)
+
+def count_chart(data, col):
+    return charts.count_figure(data[col], data['Target'], col, order=sorted(data[col].unique()))
+
+def draw_outliers(data, col):
+    fig, axs = subplots(1, 2, figsize=(12, 4))
+    sns.histplot(data[col], kde=True, ax=axs[0], color='red')
+    axs[0].set_title(f'Phân phối {col}')
+    sns.boxplot(x=data[col], ax=axs[1], color='green')
+    axs[1].set_title(f'Boxplot {col}')
+    return fig
 
-def section_1(data):
+def section_1(frames, stats):
     st.subheader("1. Xử lý dữ liệu thiếu và bất thường trong tập dữ liệu sinh viên")
+    data, fp = frames.data, frames.fp
+    tables = stats['tables']
 
     st.markdown("### Làm sạch dữ liệu")
-    st.write(f"Tập dữ liệu có {data.shape[0]} dòng và {data.shape[1]} cột.")
+    rows, cols = stats['stats']['shape']
+    st.write(f"Tập dữ liệu có {rows} dòng và {cols} cột.")
 
     st.write("**Kiểm tra giá trị thiếu:**")
-    st.dataframe(data.isnull().sum())
+    st.dataframe(tables['nulls'])
     st.markdown("*Không có giá trị NULL nào trong tập dữ liệu.*")
 
     st.write("**Kiểm tra các giá trị trùng lặp:**")
-    duplicate = data[data.duplicated()]
+    duplicate = tables['duplicates']
     st.write(f"Số dòng trùng lặp: {len(duplicate)}")
     if not duplicate.empty:
         st.dataframe(duplicate)
@@ -36,72 +86,74 @@ def section_1(data):
 
     st.markdown("### Thăm dò dữ liệu")
     st.write("**Thông tin cột dữ liệu:**")
-    st.dataframe(data.dtypes)
-    st.markdown("*Có thể thấy được có 7 kiểu dữ liệu số thực, 29 số nguyên và 1 kiểu dữ liệu object.*")
+    st.dataframe(tables['dtypes'])
+    st.markdown("*Tệp gốc có 7 cột số thực, 29 cột số nguyên và 1 cột object. Khi nạp, các cột mã (nghề nghiệp, trình độ, khóa học, quốc tịch...) và Target được đổi sang category, các cột nhị phân/đếm sang uint8.*")
 
     st.write("**Phân phối biến Target:**")
-    labels = ['Graduate', 'Dropout', 'Enrolled']
-    sizes = [data.Target[data['Target'] == 'Graduate'].count(),
-            data.Target[data['Target'] == 'Dropout'].count(),
-            data.Target[data['Target'] == 'Enrolled'].count()]
+    labels = list(stats['stats']['target_counts'])
+    sizes = list(stats['stats']['target_counts'].values())
     explode = (0, 0.1, 0.1)
-    fig1, ax1 = plt.subplots(figsize=(10, 6))
-    ax1.pie(sizes, explode=explode, labels=labels, autopct='%1.1f%%', shadow=True, startangle=90)
-    ax1.axis('equal')
-    plt.title("Tỷ lệ của biến Target", size=12)
-    st.pyplot(fig1)
+
+    def draw_target_pie():
+        fig1, ax1 = subplots(figsize=(10, 6))
+        ax1.pie(sizes, explode=explode, labels=labels, autopct='%1.1f%%', shadow=True, startangle=90)
+        ax1.axis('equal')
+        ax1.set_title("Tỷ lệ của biến Target", size=12)
+        return fig1
+
+    chart((fp, 'section_1', 'target_pie'), draw_target_pie,
+          lambda: charts.pie_figure(labels, sizes, "Tỷ lệ của biến Target", pull=list(explode)))
     st.markdown("*Khoảng 49,9% sinh viên đã tốt nghiệp, 32,1% bỏ học và 17,1% đang theo học một khóa học khác.*")
 
     st.markdown("### Xác định ngoại lai")
-    data_num = data.select_dtypes(include=['float64'])
-    for col in data_num.columns:
-        fig, axs = plt.subplots(1, 2, figsize=(12, 4))
-        sns.histplot(data[col], kde=True, ax=axs[0], color='red')
-        axs[0].set_title(f'Phân phối {col}')
-        sns.boxplot(x=data[col], ax=axs[1], color='green')
-        axs[1].set_title(f'Boxplot {col}')
-        st.pyplot(fig)
+    float_cols = [col for col, dtype in data.dtypes.items() if dtype == 'float64']
+    for col in float_cols:
+        chart((fp, 'section_1', f'outliers_{col}'), lambda col=col: draw_outliers(data, col),
+              lambda col=col: charts.outlier_figure(data[col].to_numpy(), col))
     st.markdown("*Hầu hết các đặc trưng đều chứa các giá trị ngoại lai, ngoại trừ tỷ lệ thất nghiệp, lạm phát và GDP.*")
 
     st.markdown("### Xử lý ngoại lai bằng IQR")
-    cols_iqr = ['Previous_qualification_(grade)', 'Admission_grade',
-                'Curricular_units_1st_sem_(grade)', 'Curricular_units_2nd_sem_(grade)']
-    for col in cols_iqr:
-        Q1 = data[col].quantile(0.25)
-        Q3 = data[col].quantile(0.75)
-        IQR = Q3 - Q1
-        old_len = len(data)
-        data = data[(data[col] >= Q1 - 3*IQR) & (data[col] <= Q3 + 3*IQR)]
-        st.write(f"Loại bỏ ngoại lai trong {col}: {old_len} -> {len(data)} dòng")
+    for step in stats['stats']['iqr_steps']:
+        st.write(f"Loại bỏ ngoại lai trong {step['column']}: {step['before']} -> {step['after']} dòng")
+    data = frames.clean
 
     st.write("**Thống kê sau khi xử lý ngoại lệ:**")
-    st.dataframe(data[cols_iqr].describe())
-
-    fig, axs = plt.subplots(4, 1, figsize=(18, 20))
-    sns.boxplot(x=data['Previous_qualification_(grade)'], ax=axs[0], palette='BuGn')
-    axs[0].set_title('Previous Qualification Grade', fontsize=14, pad=10)
-    sns.boxplot(x=data['Admission_grade'], ax=axs[1], palette='BuGn')
-    axs[1].set_title('Admission Grade', fontsize=14, pad=10)
-    sns.boxplot(x=data['Curricular_units_1st_sem_(grade)'], ax=axs[2], palette='BuGn')
-    axs[2].set_title('1st Semester Grade', fontsize=14, pad=10)
-    sns.boxplot(x=data['Curricular_units_2nd_sem_(grade)'], ax=axs[3], palette='BuGn')
-    axs[3].set_title('2nd Semester Grade', fontsize=14, pad=10)
-    plt.tight_layout()
-    st.pyplot(fig)
+    st.dataframe(tables['iqr_describe'])
+
+    def draw_iqr_boxplots():
+        fig, axs = subplots(4, 1, figsize=(18, 20))
+        sns.boxplot(x=data['Previous_qualification_(grade)'], ax=axs[0], palette='BuGn')
+        axs[0].set_title('Previous Qualification Grade', fontsize=14, pad=10)
+        sns.boxplot(x=data['Admission_grade'], ax=axs[1], palette='BuGn')
+        axs[1].set_title('Admission Grade', fontsize=14, pad=10)
+        sns.boxplot(x=data['Curricular_units_1st_sem_(grade)'], ax=axs[2], palette='BuGn')
+        axs[2].set_title('1st Semester Grade', fontsize=14, pad=10)
+        sns.boxplot(x=data['Curricular_units_2nd_sem_(grade)'], ax=axs[3], palette='BuGn')
+        axs[3].set_title('2nd Semester Grade', fontsize=14, pad=10)
+        fig.tight_layout()
+        return fig
+
+    chart((frames.clean_fp, 'section_1', 'iqr_boxplots'), draw_iqr_boxplots,
+          lambda: charts.boxes_figure({col: data[col].to_numpy() for col in SCORE_COLS},
+                                      ['Previous Qualification Grade', 'Admission Grade',
+                                       '1st Semester Grade', '2nd Semester Grade']))
 
     st.markdown("*Đã xử lý ngoại lệ bằng phương pháp IQR và trực quan hóa lại bằng biểu đồ hộp.*")
-    return data
 
-def section_2(data):
+def section_2(frames, stats):
     st.subheader("2. Tìm mối quan hệ giữa các yếu tố")
 
     st.markdown("### Mối tương quan giữa các biến số liên tục")
-    data_num = data.select_dtypes(include=['float64'])
-    cor = data_num.corr()
-    fig, ax = plt.subplots(figsize=(12, 7))
-    sns.heatmap(cor, annot=True, cmap=plt.cm.CMRmap_r, ax=ax)
-    ax.set_title('Mối quan hệ giữa các biến ngẫu nhiên liên tục')
-    st.pyplot(fig)
+    cor = stats['tables']['correlation']
+
+    def draw_correlation():
+        fig, ax = subplots(figsize=(12, 7))
+        sns.heatmap(cor, annot=True, cmap=plt.cm.CMRmap_r, ax=ax)
+        ax.set_title('Mối quan hệ giữa các biến ngẫu nhiên liên tục')
+        return fig
+
+    chart((frames.clean_fp, 'section_2', 'correlation'), draw_correlation,
+          lambda: charts.heatmap_figure(cor, 'Mối quan hệ giữa các biến ngẫu nhiên liên tục', colorscale='Magma_r'))
 
     st.markdown("""
     Từ biểu đồ trên, có thể quan sát thấy:
@@ -110,8 +162,9 @@ def section_2(data):
     - GDP, tỷ lệ lạm phát và tỷ lệ thất nghiệp có mối quan hệ tiêu cực với các yếu tố khác.
     """)
 
-def section_3(data):
+def section_3(frames):
     st.subheader("3. Phân tích tác động của từng biến phân loại lên biến Target")
+    data = frames.clean
 
     st.markdown("""
     Phân tích sự phân phối của biến mục tiêu `Target` theo các yếu tố phân loại như:
@@ -123,14 +176,14 @@ def section_3(data):
     - Tình trạng nhận học bổng
     """)
 
-    fig, ax = plt.subplots(2, 3, figsize=(40, 30))
-    sns.countplot(x='Daytime/evening_attendance\t', hue='Target', data=data, palette='Set2', ax=ax[0][0])
-    sns.countplot(x='Tuition_fees_up_to_date', hue='Target', data=data, palette='Set2', ax=ax[0][1])
-    sns.countplot(x='Gender', hue='Target', data=data, palette='Set2', ax=ax[0][2])
-    sns.countplot(x='Displaced', hue='Target', data=data, palette='Set2', ax=ax[1][0])
-    sns.countplot(x='Debtor', hue='Target', data=data, palette='Set2', ax=ax[1][1])
-    sns.countplot(x='Scholarship_holder', hue='Target', data=data, palette='Set2', ax=ax[1][2])
-    st.pyplot(fig)
+    def draw_categorical_grid():
+        fig, ax = subplots(2, 3, figsize=(40, 30))
+        for axis, col in zip(ax.flat, CATEGORICAL_COLS):
+            sns.countplot(x=col, hue='Target', data=data, palette='Set2', ax=axis)
+        return fig
+
+    chart((frames.clean_fp, 'section_3', 'categorical_grid'), draw_categorical_grid,
+          lambda: charts.count_grid_figure(data, CATEGORICAL_COLS, 'Target'))
 
     st.markdown("""
     **Nhận xét:**
@@ -143,12 +196,19 @@ def section_3(data):
     """)
 
 
-def section_4(data):
+def draw_score_distribution(data, codes, col):
+    fig, ax = subplots(figsize=(10, 5))
+    # Target đã mã hóa được truyền riêng, không ghi đè cột Target của dữ liệu dùng chung
+    target = pd.Series(codes, index=data.index, name='Target')
+    sns.histplot(data=data, x=col, hue=target, kde=True, element="step", ax=ax)
+    ax.set_title(f'Phân phối {col} theo Target')
+    return fig
+
+def section_4(frames, stats):
     st.subheader("4. Phân tích mối quan hệ giữa điểm số và tỷ lệ bỏ học")
 
     st.markdown("### Xác định các biến điểm số")
-    score_cols = ['Previous_qualification_(grade)', 'Admission_grade',
-                'Curricular_units_1st_sem_(grade)', 'Curricular_units_2nd_sem_(grade)']
+    score_cols = SCORE_COLS
     st.markdown("""
     Trong dataset, các biến liên quan đến điểm số gồm:
 
@@ -158,10 +218,7 @@ def section_4(data):
     - `Curricular_units_2nd_sem_(grade)` (0-20)
     """)
 
-    le = LabelEncoder()
-    data['Target'] = le.fit_transform(data['Target'])
-    data_num = data.select_dtypes(include=['float64', 'int64'])
-    data_num['Target'] = data['Target']
+    fp = frames.clean_fp
 
     st.markdown("### Kiểm định ANOVA")
     st.markdown("""
@@ -171,15 +228,7 @@ def section_4(data):
     *Nếu p-value < 0.05 → Bác bỏ H₀ → Điểm số ảnh hưởng đến khả năng bỏ học.*
     """)
 
-    p_values = {}
-    for col in score_cols:
-        group0 = data_num[data_num['Target'] == 0][col]
-        group1 = data_num[data_num['Target'] == 1][col]
-        group2 = data_num[data_num['Target'] == 2][col]
-        _, p_val = f_oneway(group0, group1, group2)
-        p_values[col] = p_val
-
-    p_series = pd.Series(p_values).sort_values()
+    p_series = pd.Series(stats['stats']['anova_p']).sort_values()
     st.write("**📋 Bảng p-value cho từng biến điểm số:**")
     for feature, p in p_series.items():
         st.write(f"{feature:<45}: {p:.10f}")
@@ -188,12 +237,14 @@ def section_4(data):
     *Tất cả các biến đều có p-value < 0.05 → Điểm số có ảnh hưởng rõ rệt đến khả năng bỏ học.*
     """)
 
+    with st.expander("ANOVA theo Target trên tất cả các cột số"):
+        st.dataframe(stats['tables']['anova_all'].sort_values('p_value'))
+
     st.markdown("### Phân tích phân phối điểm số theo Target")
     for col in score_cols:
-        fig, ax = plt.subplots(figsize=(10, 5))
-        sns.histplot(data=data_num, x=col, hue='Target', kde=True, element="step", ax=ax)
-        ax.set_title(f'Phân phối {col} theo Target')
-        st.pyplot(fig)
+        chart((fp, 'section_4', f'score_{col}'), lambda col=col: draw_score_distribution(frames.clean, frames.codes, col),
+              lambda col=col: charts.grouped_histogram_figure(frames.clean[col].to_numpy(), frames.codes,
+                                                              f'Phân phối {col} theo Target'))
 
         if col == 'Previous_qualification_(grade)':
             st.markdown("""
@@ -224,14 +275,22 @@ def section_4(data):
             """)
 
     st.markdown("### Phân tích chi tiết trung bình theo nhóm")
-    means = data_num.groupby('Target')[score_cols].mean()
-    st.dataframe(means)
+    st.dataframe(stats['tables']['score_means'])
     st.markdown("""
     **Nhận xét:**
     - Trung bình điểm của nhóm sinh viên tốt nghiệp cao hơn rõ rệt so với nhóm sinh viên bỏ học.
     """)
 
-def section_5(data):
+def draw_countplot(data, col, figsize, rotate=False):
+    fig, ax = subplots(figsize=figsize)
+    # Cột category vẫn giữ các mã đã bị lọc hết, chỉ vẽ các giá trị còn xuất hiện
+    sns.countplot(x=col, hue='Target', data=data, order=sorted(data[col].unique()), ax=ax)
+    if rotate:
+        ax.tick_params(axis='x', labelrotation=45)
+    ax.set_title(f'Tỷ lệ bỏ học theo {col}')
+    return fig
+
+def section_5(frames, stats):
     st.subheader("5. Phân tích mối quan hệ giữa hỗ trợ tài chính và tỷ lệ bỏ học")
 
     st.markdown("""
@@ -247,16 +306,9 @@ def section_5(data):
     *Nếu p-value < 0.05 → bác bỏ H₀ → biến tài chính có ảnh hưởng đến bỏ học.*
     """)
 
-    financial_vars = ['Tuition_fees_up_to_date', 'Scholarship_holder', 'Debtor']
-    target_binary = (data['Target'] == 0).astype(int)
-
-    p_values = {}
-    for feature in financial_vars:
-        table = pd.crosstab(data[feature], target_binary)
-        _, p, _, _ = chi2_contingency(table)
-        p_values[feature] = p
-
-    p_series = pd.Series(p_values).sort_values()
+    data, fp = frames.clean, frames.clean_fp
+    financial_vars = FINANCIAL_VARS
+    p_series = pd.Series(stats['stats']['financial_p']).sort_values()
     st.write("**📋 Bảng p-value cho từng biến tài chính:**")
     for feature, p in p_series.items():
         st.write(f"{feature:<30}: {p:.10f}")
@@ -267,10 +319,8 @@ def section_5(data):
 
     st.markdown("### Phân tích đơn biến")
     for col in financial_vars:
-        fig, ax = plt.subplots(figsize=(8, 5))
-        sns.countplot(x=col, hue='Target', data=data, ax=ax)
-        ax.set_title(f'Tỷ lệ bỏ học theo {col}')
-        st.pyplot(fig)
+        chart((fp, 'section_5', f'count_{col}'), lambda col=col: draw_countplot(data, col, (8, 5)),
+              lambda col=col: count_chart(data, col))
 
         if col == 'Tuition_fees_up_to_date':
             st.markdown("""
@@ -293,15 +343,7 @@ def section_5(data):
 
     st.markdown("### Phân tích đa biến (kết hợp các yếu tố)")
     st.write("Tỷ lệ bỏ học khi kết hợp 3 yếu tố tài chính:")
-    crosstab = pd.crosstab(
-        index=[data['Tuition_fees_up_to_date'], data['Scholarship_holder'], data['Debtor']],
-        columns=data['Target'],
-        normalize='index'
-    )
-    dropout_rates = crosstab.iloc[:, 0].sort_values(ascending=False) * 100
-    dropout_df = pd.DataFrame(dropout_rates).reset_index()
-    dropout_df.columns = ['Đóng học phí', 'Học bổng', 'Nợ', 'Tỷ lệ bỏ học']
-    st.dataframe(dropout_df)
+    st.dataframe(stats['tables']['dropout_rates'])
 
     st.markdown("""
     **Nhận xét:**
@@ -309,15 +351,20 @@ def section_5(data):
     """)
 
     st.markdown("### Trực quan hóa với Heatmap")
-    heatmap_data = data.groupby(['Tuition_fees_up_to_date', 'Scholarship_holder'])['Target'].apply(lambda x: (x == 0).mean()).reset_index()
-    heatmap_pivot = heatmap_data.pivot(index="Tuition_fees_up_to_date", columns="Scholarship_holder", values="Target")
+    heatmap_pivot = stats['tables']['dropout_heatmap']
 
-    fig, ax = plt.subplots(figsize=(8, 6))
-    sns.heatmap(heatmap_pivot, annot=True, fmt=".2f", cmap="YlOrRd", vmin=0, vmax=0.5, ax=ax)
-    ax.set_title('Tỷ lệ bỏ học theo Học phí và Học bổng')
-    ax.set_xlabel('Học bổng (1: Có, 0: Không)')
-    ax.set_ylabel('Đóng học phí đúng hạn (1: Có, 0: Không)')
-    st.pyplot(fig)
+    def draw_dropout_heatmap():
+        fig, ax = subplots(figsize=(8, 6))
+        sns.heatmap(heatmap_pivot, annot=True, fmt=".2f", cmap="YlOrRd", vmin=0, vmax=0.5, ax=ax)
+        ax.set_title('Tỷ lệ bỏ học theo Học phí và Học bổng')
+        ax.set_xlabel('Học bổng (1: Có, 0: Không)')
+        ax.set_ylabel('Đóng học phí đúng hạn (1: Có, 0: Không)')
+        return fig
+
+    chart((fp, 'section_5', 'dropout_heatmap'), draw_dropout_heatmap,
+          lambda: charts.heatmap_figure(heatmap_pivot, 'Tỷ lệ bỏ học theo Học phí và Học bổng', zmin=0, zmax=0.5,
+                                        x_title='Học bổng (1: Có, 0: Không)',
+                                        y_title='Đóng học phí đúng hạn (1: Có, 0: Không)'))
 
     st.markdown("""
     **Nhận xét:**
@@ -325,7 +372,7 @@ def section_5(data):
     2. Đóng học phí + có học bổng → Tỷ lệ bỏ học thấp nhất.
     """)
 
-def section_6(data):
+def section_6(frames, stats):
     st.subheader("6. Tìm hiểu sự ảnh hưởng của môi trường xã hội đến kết quả học tập của sinh viên")
 
     st.markdown("""
@@ -343,20 +390,9 @@ def section_6(data):
     *Nếu p-value < 0.05 → bác bỏ H₀ → Biến xã hội có ảnh hưởng đến khả năng bỏ học.*
     """)
 
-    social_vars = [
-        "Mother's_occupation", "Father's_occupation",
-        "Mother's_qualification", "Father's_qualification",
-        'Nacionality', 'Displaced'
-    ]
-    target_binary = (data['Target'] == 0).astype(int)
-
-    p_values_social = {}
-    for feature in social_vars:
-        table = pd.crosstab(data[feature], target_binary)
-        _, p, _, _ = chi2_contingency(table)
-        p_values_social[feature] = p
-
-    p_series = pd.Series(p_values_social).sort_values()
+    social_vars = SOCIAL_VARS
+    data, fp = frames.clean, frames.clean_fp
+    p_series = pd.Series(stats['stats']['social_p']).sort_values()
     st.write("**📋 Bảng p-value cho từng biến xã hội:**")
     for feature, p in p_series.items():
         st.write(f"{feature:<30}: {p:.10f}")
@@ -376,15 +412,16 @@ def section_6(data):
         st.write(irrelevant_cols)
     else:
         st.write("Tất cả các biến xã hội đều có ảnh hưởng đến khả năng bỏ học.")
+
+    with st.expander("Chi-Square (bỏ học / không) trên tất cả các cột rời rạc"):
+        st.dataframe(stats['tables']['chi2_all'].sort_values('p_value'))
     
     st.markdown("### Biểu đồ trực quan từng biến xã hội")
     for feature in social_vars:
         if feature != 'Nacionality':
-            fig, ax = plt.subplots(figsize=(10, 4))
-            sns.countplot(x=feature, hue='Target', data=data, ax=ax)
-            plt.xticks(rotation=45)
-            ax.set_title(f'Tỷ lệ bỏ học theo {feature}')
-            st.pyplot(fig)  
+            chart((fp, 'section_6', f'count_{feature}'),
+                  lambda feature=feature: draw_countplot(data, feature, (10, 4), rotate=True),
+                  lambda feature=feature: count_chart(data, feature))
 
     st.markdown("""
     **Nhận xét tổng quan:**
@@ -422,17 +459,43 @@ def section_7():
     Việc giảm tỷ lệ bỏ học cần kết hợp nhiều yếu tố: tài chính, học tập, tâm lý và chính sách. Phân tích dữ liệu đóng vai trò then chốt giúp xác định nhóm sinh viên có nguy cơ cao và đưa ra biện pháp hỗ trợ kịp thời.
     """)
 
-def insight_page():
+ALL_SECTIONS = "Tất cả"
+
+# Mỗi phần tự lấy dữ liệu đầu vào (đã cache) nên chỉ phần được chọn mới phải tính và vẽ
+SECTIONS = [
+    ("1. Dữ liệu thiếu & ngoại lai", lambda h: section_1(load_frames(h), load_stats(h))),
+    ("2. Tương quan", lambda h: section_2(load_frames(h), load_stats(h))),
+    ("3. Biến phân loại", lambda h: section_3(load_frames(h))),
+    ("4. Điểm số", lambda h: section_4(load_frames(h), load_stats(h))),
+    ("5. Tài chính", lambda h: section_5(load_frames(h), load_stats(h))),
+    ("6. Môi trường xã hội", lambda h: section_6(load_frames(h), load_stats(h))),
+    ("7. Đề xuất", lambda h: section_7()),
+]
+
+def insight_page(section=None):
     st.title("Khám Phá Dữ Liệu Sinh Viên")
     st.markdown("**Trang này giúp bạn hiểu rõ hơn về dữ liệu sinh viên và các yếu tố ảnh hưởng đến việc bỏ học.**")
 
-    data = load_data()
-    data = section_1(data)
-    section_2(data)
-    section_3(data)
-    section_4(data)
-    section_5(data)
-    section_6(data)
-    section_7()
-
-    
\ No newline at end of file
+    st.sidebar.radio("Biểu đồ", charts.BACKENDS, index=charts.BACKENDS.index(charts.CHART_BACKEND),
+                     format_func={'matplotlib': "Ảnh tĩnh (matplotlib)", 'plotly': "Tương tác (plotly)"}.get,
+                     key='insight_chart_backend')
+
+    titles = [title for title, _ in SECTIONS]
+    if section is None:
+        section = st.radio("Phần phân tích", titles + [ALL_SECTIONS], horizontal=True, key='insight_section')
+    chosen = SECTIONS if section == ALL_SECTIONS else [SECTIONS[titles.index(section)]]
+
+    # Khóa cache theo hash để trang thấy ngay dữ liệu mới ghi thêm bằng ingest.py
+    data_hash = current_data_hash()
+    timings = st.session_state.setdefault('insight_timings', {})
+    for title, show in chosen:
+        start = time.perf_counter()
+        show(data_hash)
+        timings[title] = time.perf_counter() - start
+        instrumentation.observe('insight_section_seconds', timings[title], section=title)
+
+    st.sidebar.caption("Thời gian hiển thị lần gần nhất:\n" +
+                       "\n".join(f"- {title}: {timings[title]:.2f}s" for title in titles if title in timings))
+    stats = get_figure_cache().stats()
+    st.sidebar.caption(f"Cache hình: {stats['entries']} ảnh, {stats['bytes'] / 1e6:.1f}/{stats['max_bytes'] / 1e6:.0f} MB, "
+                       f"{stats['hits']} hit / {stats['misses']} miss")
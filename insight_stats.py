@@ -0,0 +1,257 @@
+import argparse
+import json
+import os
+import pickle
+import shutil
+import time
+
+import numpy as np
+import pandas as pd
+
+from dataset import DATA_PATH, data_identity, load_dataset
+from stat_tests import anova_all, chi2_all
+
+# Tăng khi thay đổi nội dung/định dạng artifact để buộc build lại
+ARTIFACT_VERSION = 5
+ARTIFACT_DIR = 'insight_artifact'
+STATE_FILE = 'state.pkl'
+PARTS_DIR = 'parts'
+
+TARGET_LABELS = ['Graduate', 'Dropout', 'Enrolled']
+SCORE_COLS = ['Previous_qualification_(grade)', 'Admission_grade',
+              'Curricular_units_1st_sem_(grade)', 'Curricular_units_2nd_sem_(grade)']
+IQR_COLS = SCORE_COLS
+FINANCIAL_VARS = ['Tuition_fees_up_to_date', 'Scholarship_holder', 'Debtor']
+SOCIAL_VARS = [
+    "Mother's_occupation", "Father's_occupation",
+    "Mother's_qualification", "Father's_qualification",
+    'Nacionality', 'Displaced'
+]
+
+
+def read_data(path=DATA_PATH, data_hash=None):
+    return load_dataset(path, data_hash=data_hash)
+
+
+def encode_target(target):
+    # Giống LabelEncoder: mã theo thứ tự chữ cái (Dropout=0, Enrolled=1, Graduate=2)
+    _, codes = np.unique(target.to_numpy(), return_inverse=True)
+    return codes
+
+
+def iqr_filter(data, cols=IQR_COLS, k=3):
+    # Lọc tuần tự như notebook: tứ phân vị của cột sau tính trên dữ liệu đã lọc ở cột trước
+    keep = np.ones(len(data), dtype=bool)
+    steps = []
+    for col in cols:
+        values = data[col].to_numpy()
+        current = pd.Series(values[keep])
+        q1, q3 = current.quantile(0.25), current.quantile(0.75)
+        iqr = q3 - q1
+        before = int(keep.sum())
+        keep &= (values >= q1 - k * iqr) & (values <= q3 + k * iqr)
+        steps.append({'column': col, 'lower': float(q1 - k * iqr), 'upper': float(q3 + k * iqr),
+                      'before': before, 'after': int(keep.sum())})
+    return keep, steps
+
+
+def compute(data):
+    stats = {'shape': list(data.shape)}
+    tables = {}
+
+    tables['nulls'] = data.isnull().sum().rename('count').to_frame()
+    tables['duplicates'] = data[data.duplicated()]
+    tables['dtypes'] = data.dtypes.astype(str).rename('dtype').to_frame()
+    stats['target_counts'] = {label: int((data['Target'] == label).sum()) for label in TARGET_LABELS}
+
+    keep, stats['iqr_steps'] = iqr_filter(data)
+    clean = data[keep]
+    tables['iqr_describe'] = clean[IQR_COLS].describe()
+    tables['correlation'] = clean.select_dtypes(include=['float64']).corr()
+
+    # Kiểm định trên mọi cột: ANOVA cho cột số theo Target, chi-square cho cột rời rạc theo bỏ học/không
+    codes = encode_target(clean['Target'])
+    target_binary = pd.Series((codes == 0).astype(int), index=clean.index)
+    tables['anova_all'] = anova_all(clean, codes)
+    tables['chi2_all'] = chi2_all(clean, target_binary)
+    stats['anova_p'] = tables['anova_all']['p_value'][SCORE_COLS].astype(float).to_dict()
+    tables['score_means'] = clean[SCORE_COLS].groupby(pd.Series(codes, index=clean.index, name='Target')).mean()
+
+    stats['financial_p'] = tables['chi2_all']['p_value'][FINANCIAL_VARS].astype(float).to_dict()
+    stats['social_p'] = tables['chi2_all']['p_value'][SOCIAL_VARS].astype(float).to_dict()
+
+    crosstab = pd.crosstab(
+        index=[clean['Tuition_fees_up_to_date'], clean['Scholarship_holder'], clean['Debtor']],
+        columns=pd.Series(codes, index=clean.index, name='Target'),
+        normalize='index'
+    )
+    dropout_rates = crosstab.iloc[:, 0].sort_values(ascending=False) * 100
+    dropout_df = pd.DataFrame(dropout_rates).reset_index()
+    dropout_df.columns = ['Đóng học phí', 'Học bổng', 'Nợ', 'Tỷ lệ bỏ học']
+    tables['dropout_rates'] = dropout_df
+
+    heatmap_data = target_binary.groupby([clean['Tuition_fees_up_to_date'], clean['Scholarship_holder']]).mean()
+    tables['dropout_heatmap'] = heatmap_data.unstack('Scholarship_holder')
+
+    return {'stats': stats, 'tables': tables, 'keep': keep}
+
+
+def write_tables(tables, directory, generation):
+    tables_dir = os.path.join(directory, f'tables.{generation}')
+    os.makedirs(tables_dir)
+    for name, table in tables.items():
+        table = table.copy()
+        table.columns = table.columns.map(str)
+        table.to_parquet(os.path.join(tables_dir, f'{name}.parquet'))
+
+
+def write_part(directory, index, keep, seen=None):
+    # Mỗi khối dữ liệu một file: mặt nạ IQR và (khi có trạng thái cộng dồn) hash dòng mới gặp của khối
+    arrays = {'keep': keep} if seen is None else {'keep': keep, 'seen': seen}
+    path = os.path.join(directory, PARTS_DIR, f'part-{index:05d}.npz')
+    tmp = f'{path}.tmp-{os.getpid()}.npz'
+    np.savez_compressed(tmp, **arrays)
+    os.replace(tmp, path)
+
+
+def write_state(state, directory):
+    # Trạng thái cộng dồn (streaming_stats.InsightAggregates) để ingest.py cập nhật theo phần dữ liệu mới
+    path = os.path.join(directory, STATE_FILE)
+    tmp = f'{path}.tmp-{os.getpid()}'
+    with open(tmp, 'wb') as f:
+        pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, path)
+
+
+def write_manifest(result, data_hash, directory, generation, parts, built_at):
+    manifest = {
+        'version': ARTIFACT_VERSION,
+        'data_sha256': data_hash,
+        'built_at': built_at,
+        'updated_at': time.time(),
+        'generation': generation,
+        'parts': parts,
+        'tables': sorted(result['tables']),
+        'stats': result['stats'],
+    }
+    path = os.path.join(directory, 'manifest.json')
+    tmp = f'{path}.tmp-{os.getpid()}'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
+
+
+def save(result, data_hash, directory=ARTIFACT_DIR, state=None):
+    # Ghi vào thư mục tạm rồi đổi tên, để trang Insight không bao giờ đọc artifact dở dang
+    tmp = f"{directory}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(os.path.join(tmp, PARTS_DIR))
+
+    write_tables(result['tables'], tmp, 0)
+    parts = state.parts if state is not None else [(result['keep'], None)]
+    for index, (keep, seen) in enumerate(parts):
+        write_part(tmp, index, keep, seen)
+    if state is not None:
+        write_state(state, tmp)
+    write_manifest(result, data_hash, tmp, 0, len(parts), time.time())
+
+    old = f"{directory}.old-{os.getpid()}"
+    if os.path.exists(directory):
+        os.replace(directory, old)
+    os.replace(tmp, directory)
+    shutil.rmtree(old, ignore_errors=True)
+
+
+def append(result, data_hash, directory=ARTIFACT_DIR, state=None):
+    # Cập nhật tại chỗ sau ingest.py: chỉ ghi các phần mới, bảng thống kê (kích thước cố định) và state.pkl;
+    # manifest.json được thay sau cùng nên người đọc luôn thấy một thế hệ bảng và số phần nhất quán
+    manifest = read_manifest(directory)
+    generation = manifest['generation'] + 1
+    parts = state.parts
+    for index in range(manifest['parts'], len(parts)):
+        write_part(directory, index, *parts[index])
+    write_tables(result['tables'], directory, generation)
+    write_state(state, directory)
+    write_manifest(result, data_hash, directory, generation, len(parts), manifest['built_at'])
+    # Giữ lại thế hệ ngay trước cho người đọc còn đang dùng manifest cũ
+    shutil.rmtree(os.path.join(directory, f"tables.{manifest['generation'] - 1}"), ignore_errors=True)
+
+
+def read_manifest(directory=ARTIFACT_DIR):
+    path = os.path.join(directory, 'manifest.json')
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def read_parts(directory, n_parts):
+    parts = []
+    for index in range(n_parts):
+        with np.load(os.path.join(directory, PARTS_DIR, f'part-{index:05d}.npz')) as arrays:
+            parts.append((arrays['keep'], arrays['seen'] if 'seen' in arrays else None))
+    return parts
+
+
+def load(directory=ARTIFACT_DIR):
+    manifest = read_manifest(directory)
+    tables_dir = os.path.join(directory, f"tables.{manifest['generation']}")
+    tables = {name: pd.read_parquet(os.path.join(tables_dir, f'{name}.parquet')) for name in manifest['tables']}
+    keep = np.concatenate([keep for keep, _ in read_parts(directory, manifest['parts'])])
+    return {'stats': manifest['stats'], 'tables': tables, 'keep': keep, 'data_sha256': manifest['data_sha256']}
+
+
+def load_state(directory=ARTIFACT_DIR):
+    path = os.path.join(directory, STATE_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, 'rb') as f:
+        state = pickle.load(f)
+    parts = read_parts(directory, read_manifest(directory)['parts'])
+    state.keep_parts = [keep for keep, _ in parts]
+    state.duplicates.seen_parts = [seen for _, seen in parts]
+    return state
+
+
+def build(data_path=DATA_PATH, directory=ARTIFACT_DIR, chunksize=None):
+    # chunksize: tính theo từng khối (streaming_stats) cho dữ liệu không vừa RAM, kèm trạng thái cộng dồn
+    data_hash = data_identity(data_path)
+    if chunksize:
+        from streaming_stats import aggregate
+        state = aggregate(data_path, chunksize)
+        save(state.result(), data_hash, directory, state)
+    else:
+        save(compute(read_data(data_path, data_hash)), data_hash, directory)
+    return data_hash
+
+
+def ensure(data_path=DATA_PATH, directory=ARTIFACT_DIR, data_hash=None):
+    # Chỉ build lại khi định danh của file dữ liệu hoặc phiên bản artifact thay đổi
+    data_hash = data_hash or data_identity(data_path)
+    manifest = read_manifest(directory)
+    if manifest is None or manifest['version'] != ARTIFACT_VERSION or manifest['data_sha256'] != data_hash:
+        build(data_path, directory)
+    return load(directory)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tính trước toàn bộ thống kê cho trang Insight")
+    parser.add_argument('--data', default=DATA_PATH)
+    parser.add_argument('--out', default=ARTIFACT_DIR)
+    parser.add_argument('--force', action='store_true', help="Build lại kể cả khi dữ liệu không đổi")
+    parser.add_argument('--chunksize', type=int, default=None,
+                        help="Đọc dữ liệu theo khối n dòng thay vì nạp toàn bộ vào bộ nhớ")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    if args.force or args.chunksize:
+        build(args.data, args.out, args.chunksize)
+    else:
+        ensure(args.data, args.out)
+    manifest = read_manifest(args.out)
+    print(f"Artifact {args.out} (v{manifest['version']}, data {manifest['data_sha256'][:12]}) "
+          f"sẵn sàng sau {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,306 @@
+import bisect
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from functools import wraps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Đo thời gian/đếm trên các đường nóng. Tắt mặc định: khi tắt, mỗi điểm đo chỉ tốn một lần đọc biến ENABLED.
+# APP_METRICS=1 để bật; APP_METRICS_PORT: mở endpoint scrape (GET /metrics dạng Prometheus, /metrics.json);
+# APP_METRICS_DUMP: ghi snapshot JSON định kỳ mỗi APP_METRICS_DUMP_INTERVAL giây.
+ENABLED = os.environ.get('APP_METRICS', '0') not in ('', '0', 'false')
+METRICS_PORT = int(os.environ.get('APP_METRICS_PORT', 0))
+DUMP_PATH = os.environ.get('APP_METRICS_DUMP', '')
+DUMP_INTERVAL = float(os.environ.get('APP_METRICS_DUMP_INTERVAL', 60))
+
+# Biên trên của các bucket độ trễ (giây)
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, float('inf'))
+
+SAMPLE_INTERVAL = 0.005
+MAX_STACK_DEPTH = 64
+
+
+class Histogram:
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q):
+        # Xấp xỉ bằng biên trên của bucket chứa phân vị q
+        if not self.count:
+            return 0.0
+        rank, seen = q * self.count, 0
+        for bound, n in zip(self.buckets, self.counts):
+            seen += n
+            if seen >= rank:
+                return bound
+        return self.buckets[-1]
+
+    def snapshot(self):
+        return {'count': self.count, 'sum': self.sum, 'p50': self.quantile(0.5), 'p99': self.quantile(0.99),
+                'buckets': dict(zip(map(str, self.buckets), self.counts))}
+
+
+class Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+
+    def inc(self, key, value=1):
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, key, value):
+        with self.lock:
+            hist = self.histograms.get(key)
+            if hist is None:
+                hist = self.histograms[key] = Histogram()
+            hist.observe(value)
+
+    def clear(self):
+        with self.lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'time': time.time(),
+                'counters': {format_key(key): value for key, value in self.counters.items()},
+                'histograms': {format_key(key): hist.snapshot() for key, hist in self.histograms.items()},
+            }
+
+    def prometheus(self):
+        lines = []
+        typed = set()
+        with self.lock:
+            for (name, labels), value in sorted(self.counters.items()):
+                if name not in typed:
+                    typed.add(name)
+                    lines.append(f'# TYPE {name} counter')
+                lines.append(f'{name}{format_labels(labels)} {value}')
+            for (name, labels), hist in sorted(self.histograms.items()):
+                if name not in typed:
+                    typed.add(name)
+                    lines.append(f'# TYPE {name} histogram')
+                seen = 0
+                for bound, n in zip(hist.buckets, hist.counts):
+                    seen += n
+                    le = '+Inf' if bound == float('inf') else repr(bound)
+                    lines.append(f'{name}_bucket{format_labels(labels + (("le", le),))} {seen}')
+                lines.append(f'{name}_sum{format_labels(labels)} {hist.sum}')
+                lines.append(f'{name}_count{format_labels(labels)} {hist.count}')
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+
+def escape_label(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{k}="{escape_label(v)}"' for k, v in labels) + '}'
+
+
+def format_key(key):
+    name, labels = key
+    return name + format_labels(labels)
+
+
+def metric_key(name, labels):
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def inc(name, value=1, **labels):
+    if ENABLED:
+        REGISTRY.inc(metric_key(name, labels), value)
+
+
+def observe(name, value, **labels):
+    if ENABLED:
+        REGISTRY.observe(metric_key(name, labels), value)
+
+
+class Timer:
+    __slots__ = ('key', 'start')
+
+    def __init__(self, key):
+        self.key = key
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        REGISTRY.observe(self.key, time.perf_counter() - self.start)
+        return False
+
+
+class NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NULL_TIMER = NullTimer()
+
+
+def timer(name, **labels):
+    # with timer('predict_seconds'): ... ; khi tắt trả về một context manager rỗng dùng chung
+    if not ENABLED:
+        return NULL_TIMER
+    return Timer(metric_key(name, labels))
+
+
+def timed(name, **labels):
+    key = metric_key(name, labels)
+
+    def decorate(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not ENABLED:
+                return fn(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                REGISTRY.observe(key, time.perf_counter() - start)
+        return wrapper
+    return decorate
+
+
+class Sampler:
+    # Profiler lấy mẫu: một luồng phụ đọc stack của luồng đích mỗi `interval` giây và đếm theo stack gộp
+    def __init__(self, thread_id=None, interval=SAMPLE_INTERVAL):
+        self.thread_id = thread_id or threading.get_ident()
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None and len(stack) < MAX_STACK_DEPTH:
+                code = frame.f_code
+                stack.append(f'{os.path.basename(code.co_filename)}:{code.co_name}')
+                frame = frame.f_back
+            self.stacks[';'.join(reversed(stack))] += 1
+            self.samples += 1
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+        return self
+
+    def top(self, n=20):
+        return self.stacks.most_common(n)
+
+    def collapsed(self):
+        # Định dạng "stack gộp" của flamegraph.pl / speedscope
+        return '\n'.join(f'{stack} {count}' for stack, count in self.stacks.most_common())
+
+
+@contextmanager
+def profiled(enabled=True, interval=SAMPLE_INTERVAL):
+    # Bật profiler cho riêng một lần chạy (vd. một request có ?profile=1); trả về None khi không bật
+    if not enabled:
+        yield None
+        return
+    sampler = Sampler(interval=interval).start()
+    try:
+        yield sampler
+    finally:
+        sampler.stop()
+
+
+def write_snapshot(path):
+    tmp = f'{path}.tmp-{os.getpid()}'
+    with open(tmp, 'w') as f:
+        json.dump(REGISTRY.snapshot(), f, indent=2)
+    os.replace(tmp, path)
+
+
+def dump_periodically(path, interval):
+    def run():
+        while True:
+            time.sleep(interval)
+            write_snapshot(path)
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path == '/metrics':
+            body, content_type = REGISTRY.prometheus().encode('utf-8'), 'text/plain; version=0.0.4'
+        elif self.path == '/metrics.json':
+            body, content_type = json.dumps(REGISTRY.snapshot()).encode('utf-8'), 'application/json'
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve_metrics(port, host='127.0.0.1'):
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+_exporters_lock = threading.Lock()
+_exporters_started = False
+
+
+def start_exporters(port=METRICS_PORT, dump_path=DUMP_PATH, dump_interval=DUMP_INTERVAL):
+    # Gọi được nhiều lần (mỗi lần Streamlit chạy lại script), chỉ khởi động một lần cho cả tiến trình
+    global _exporters_started
+    if not ENABLED:
+        return
+    with _exporters_lock:
+        if _exporters_started:
+            return
+        if port:
+            try:
+                serve_metrics(port)
+            except OSError as e:
+                # Nhiều worker dùng chung APP_METRICS_PORT: chỉ tiến trình đầu tiên giữ được cổng,
+                # các tiến trình khác bỏ qua endpoint và vẫn ghi snapshot (nếu có APP_METRICS_DUMP)
+                print(f"Không mở được cổng metrics {port} (pid {os.getpid()}): {e}", file=sys.stderr)
+        if dump_path:
+            dump_periodically(dump_path, dump_interval)
+        _exporters_started = True
@@ -0,0 +1,80 @@
+import argparse
+import json
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from scoring import resolve_columns, to_features
+
+
+def sample_payloads(path, n, batch_size, seed=0):
+    data = pd.read_csv(path, sep=';')
+    X = to_features(data, resolve_columns(data.columns))
+    rng = np.random.default_rng(seed)
+    payloads = []
+    for _ in range(n):
+        rows = X.iloc[rng.integers(0, len(X), batch_size)]
+        payloads.append(json.dumps({'students': rows.to_dict('records')}).encode('utf-8'))
+    return payloads
+
+
+def post(url, body):
+    req = urllib.request.Request(url, data=body, headers={'Content-Type': 'application/json'})
+    start = time.perf_counter()
+    with urllib.request.urlopen(req) as resp:
+        resp.read()
+    return time.perf_counter() - start
+
+
+def run(url, payloads, concurrency):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = np.array(list(pool.map(lambda body: post(url + '/predict', body), payloads)))
+    elapsed = time.perf_counter() - start
+
+    with urllib.request.urlopen(url + '/metrics') as resp:
+        server_metrics = json.loads(resp.read())
+
+    return {
+        'requests': len(payloads),
+        'concurrency': concurrency,
+        'seconds': elapsed,
+        'requests_per_sec': len(payloads) / elapsed,
+        'client_p50_ms': float(np.percentile(latencies, 50) * 1000),
+        'client_p99_ms': float(np.percentile(latencies, 99) * 1000),
+        'server': server_metrics,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Kiểm thử tải cho server.py")
+    parser.add_argument('--url', default=None, help="Địa chỉ server đang chạy; bỏ trống để tự khởi động server cục bộ")
+    parser.add_argument('--data', default='data.csv')
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--batch-size', type=int, default=1, help="Số sinh viên trong mỗi yêu cầu")
+    args = parser.parse_args()
+
+    server = None
+    url = args.url
+    if url is None:
+        from server import create_server
+
+        server = create_server(port=0)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    payloads = sample_payloads(args.data, args.requests, args.batch_size)
+    try:
+        print(json.dumps(run(url.rstrip('/'), payloads, args.concurrency), indent=2))
+    finally:
+        if server is not None:
+            server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,183 @@
+import argparse
+import glob
+import hashlib
+import json
+import os
+import time
+
+import numpy as np
+
+# Chỉ phụ thuộc numpy khi tra cứu: không cần import sklearn/CatBoost lúc phục vụ
+
+TABLE_PATH = 'model_table.npy'
+META_PATH = 'model_table.json'
+
+# Miền giá trị (min, max) của từng đặc trưng, theo đúng thứ tự FEATURE_COLUMNS và các widget của predict_page
+FEATURE_RANGES = [
+    (0, 1),   # Attendance
+    (0, 1),   # Displaced
+    (0, 1),   # Tuition fees up to date
+    (0, 1),   # Gender
+    (0, 1),   # Scholarship holder
+    (0, 70),  # Age at enrollment
+    (0, 20),  # Grade semester 1
+    (0, 20),  # Grade semester 2
+]
+
+GRID_SHAPE = tuple(hi - lo + 1 for lo, hi in FEATURE_RANGES)
+GRID_MIN = np.array([lo for lo, _ in FEATURE_RANGES])
+
+BATCH_SIZE = 65_536
+
+
+def file_sha256(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+def table_dtype(n_classes):
+    return np.dtype([('cls', np.uint8), ('proba', np.float16, (n_classes,))])
+
+
+def grid_points(start, stop):
+    idx = np.unravel_index(np.arange(start, stop), GRID_SHAPE)
+    return np.stack(idx, axis=1) + GRID_MIN
+
+
+def build_table(model_path=None, table_path=TABLE_PATH, meta_path=META_PATH, batch_size=BATCH_SIZE, verify_samples=20_000):
+    import pandas as pd
+    from scoring import FEATURE_COLUMNS, MODEL_PATH, load_model
+
+    model_path = model_path or MODEL_PATH
+    model = load_model(model_path)
+    model_sha = file_sha256(model_path)
+    classes = [int(c) for c in model.classes_]
+    size = int(np.prod(GRID_SHAPE))
+
+    # Mỗi phiên bản bảng là một file riêng (theo hash mô hình): các worker đang mmap bảng cũ không bị ghi đè,
+    # phiên bản mới chỉ có hiệu lực khi file meta được thay bằng os.replace
+    root, ext = os.path.splitext(table_path)
+    versioned = f'{root}.{model_sha[:12]}{ext}'
+    tmp = f'{versioned}.tmp-{os.getpid()}'
+
+    start = time.perf_counter()
+    table = np.lib.format.open_memmap(tmp, mode='w+', dtype=table_dtype(len(classes)), shape=(size,))
+    for lo in range(0, size, batch_size):
+        hi = min(lo + batch_size, size)
+        X = pd.DataFrame(grid_points(lo, hi), columns=FEATURE_COLUMNS)
+        table['cls'][lo:hi] = np.asarray(model.predict(X)).ravel()
+        table['proba'][lo:hi] = model.predict_proba(X)
+    table.flush()
+    build_seconds = time.perf_counter() - start
+
+    # So khớp bảng với mô hình thật trên một mẫu ngẫu nhiên của lưới
+    rng = np.random.default_rng(0)
+    sample = np.sort(rng.choice(size, min(verify_samples, size), replace=False))
+    X = pd.DataFrame(np.stack(np.unravel_index(sample, GRID_SHAPE), axis=1) + GRID_MIN, columns=FEATURE_COLUMNS)
+    live_cls = np.asarray(model.predict(X)).ravel()
+    live_proba = model.predict_proba(X)
+    stored = table[sample]
+    report = {
+        'points': size,
+        'build_seconds': build_seconds,
+        'points_per_sec': size / build_seconds,
+        'verify_samples': len(sample),
+        'class_match': float(np.mean(stored['cls'] == live_cls)),
+        'argmax_match': float(np.mean(np.argmax(stored['proba'], axis=1) == np.searchsorted(classes, live_cls))),
+        'max_proba_error': float(np.max(np.abs(stored['proba'].astype(np.float64) - live_proba))),
+        'table_bytes': os.path.getsize(tmp),
+    }
+    del table
+    os.replace(tmp, versioned)
+
+    meta = {
+        'feature_ranges': FEATURE_RANGES,
+        'classes': classes,
+        'model_sha256': model_sha,
+        'table': os.path.relpath(versioned, os.path.dirname(os.path.abspath(meta_path))),
+        'report': report,
+    }
+    previous = read_meta(meta_path)
+    tmp = f'{meta_path}.tmp-{os.getpid()}'
+    with open(tmp, 'w') as f:
+        json.dump(meta, f, indent=2)
+    os.replace(tmp, meta_path)
+
+    # Giữ bảng hiện tại và bảng liền trước (worker có thể vừa đọc meta cũ); mmap đang mở vẫn hợp lệ khi file bị xóa
+    keep = {os.path.abspath(versioned)}
+    if previous is not None:
+        keep.add(os.path.abspath(table_file(previous, meta_path)))
+    for old in glob.glob(f'{root}.*{ext}'):
+        if os.path.abspath(old) not in keep:
+            os.remove(old)
+    return report
+
+
+def read_meta(meta_path=META_PATH):
+    if not os.path.exists(meta_path):
+        return None
+    with open(meta_path) as f:
+        return json.load(f)
+
+
+def table_file(meta, meta_path=META_PATH, table_path=TABLE_PATH):
+    # File meta cũ (trước khi có phiên bản) không có khóa 'table'
+    if 'table' not in meta:
+        return table_path
+    return os.path.join(os.path.dirname(os.path.abspath(meta_path)), meta['table'])
+
+
+def load_table(table_path=TABLE_PATH, meta_path=META_PATH, model_path=None):
+    # Trả về None nếu chưa biên dịch hoặc bảng đã cũ so với model.joblib.
+    # Bảng được mmap chỉ đọc: các tiến trình cùng nạp một file dùng chung trang nhớ qua page cache của hệ điều hành.
+    meta = read_meta(meta_path)
+    if meta is None:
+        return None
+    path = table_file(meta, meta_path, table_path)
+    if not os.path.exists(path) or meta['feature_ranges'] != [list(r) for r in FEATURE_RANGES]:
+        return None
+    if model_path is not None and os.path.exists(model_path) and file_sha256(model_path) != meta['model_sha256']:
+        return None
+    table = np.load(path, mmap_mode='r').reshape(GRID_SHAPE)
+    return table, meta
+
+
+def lookup_many(table, X):
+    # X: mảng số nguyên (n, 8); trả về (lớp, xác suất)
+    idx = np.asarray(X, dtype=np.int64) - GRID_MIN
+    if np.any(idx < 0) or np.any(idx >= GRID_SHAPE):
+        raise ValueError("Giá trị đặc trưng nằm ngoài miền của bảng tra cứu")
+    rows = table[tuple(idx.T)]
+    return rows['cls'], rows['proba'].astype(np.float32)
+
+
+def table_predictor(table):
+    # Cùng giao diện với scoring.cached_predictor: features -> (lớp, xác suất)
+    def predict_one(features):
+        idx = tuple(int(v) - lo for v, lo in zip(features, GRID_MIN))
+        # Chỉ số âm sẽ lặng lẽ lấy ô ở đầu kia của bảng: kiểm tra miền như lookup_many
+        if len(idx) != len(GRID_SHAPE) or any(i < 0 or i >= n for i, n in zip(idx, GRID_SHAPE)):
+            raise ValueError("Giá trị đặc trưng nằm ngoài miền của bảng tra cứu")
+        row = table[idx]
+        return int(row['cls']), tuple(float(p) for p in row['proba'])
+
+    return predict_one
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Biên dịch model.joblib thành bảng tra cứu trên toàn bộ miền đầu vào")
+    parser.add_argument('--model', default=None)
+    parser.add_argument('--out', default=TABLE_PATH)
+    parser.add_argument('--meta', default=META_PATH)
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    args = parser.parse_args()
+
+    report = build_table(args.model, args.out, args.meta, args.batch_size)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
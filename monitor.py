@@ -0,0 +1,38 @@
+import time
+import streamlit as st
+from drift import GROUPS, PSI_THRESHOLDS, distribution, drift_report
+from resources import get_monitor, get_reference
+
+WINDOW_LABELS = {'1h': "1 giờ qua", '24h': "24 giờ qua", '30d': "30 ngày qua", 'all': "Toàn bộ log"}
+
+def monitor_page():
+    st.header("Giám sát độ lệch dữ liệu đầu vào")
+    st.markdown("So sánh các sinh viên được dự đoán trên trang Predict với dữ liệu huấn luyện `data.csv`: "
+                f"PSI dưới {PSI_THRESHOLDS[0]} là ổn định, trên {PSI_THRESHOLDS[1]} là lệch lớn.")
+
+    window = st.sidebar.selectbox("Cửa sổ thời gian", list(WINDOW_LABELS), format_func=WINDOW_LABELS.get)
+
+    start = time.perf_counter()
+    monitor = get_monitor()
+    # Chỉ đọc phần log ghi thêm từ lần xem trước
+    new_rows = monitor.refresh()
+    reference = get_reference()
+    counts = monitor.counts(window)
+    report = drift_report(counts, reference['counts'])
+    elapsed = time.perf_counter() - start
+
+    n = int(report['n'].iloc[0])
+    cols = st.columns(3)
+    cols[0].metric("Dự đoán trong cửa sổ", f"{n:,}")
+    cols[1].metric("Tổng số dòng log", f"{monitor.rows:,}", f"+{new_rows:,}" if new_rows else None)
+    cols[2].metric("Đặc trưng lệch lớn", int((report['status'] == 'lệch lớn').sum()))
+    st.caption(f"Tham chiếu: {reference['rows']:,} sinh viên của data.csv · cập nhật trong {elapsed * 1000:.0f} ms")
+    if n == 0:
+        st.info("Chưa có dự đoán nào trong cửa sổ này. Mỗi lần bấm \"Dự đoán\" trên trang Predict được ghi vào log.")
+        return
+
+    st.dataframe(report.rename(columns={'n': 'Số dòng', 'psi': 'PSI', 'ks': 'KS', 'ks_p': 'p (KS)',
+                                        'chi2_p': 'p (chi-square)', 'status': 'Trạng thái'}))
+
+    group = st.selectbox("Phân phối của", GROUPS, index=GROUPS.index(report['psi'].idxmax()))
+    st.bar_chart(distribution(counts, reference['counts'], group))
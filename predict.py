@@ -1,14 +1,25 @@
 import streamlit as st
-import numpy as np
-import pandas as pd
-import joblib
+import instrumentation
+from drift import log_prediction
+from recommendation import RECOMMENDATIONS, recommend_code
+from resources import get_calibration, get_explainer, get_model, get_predictor
 
-# Load model 1 lần khi import
-model = joblib.load('model.joblib')
+# Cách hiển thị theo lớp dự đoán: 0 Dropout, 1 Enrolled, 2 Graduate
+OUTCOMES = {
+    0: ('error', "🚨 Có nguy cơ bỏ học 🥲"),
+    1: ('warning', "📚 Dự kiến vẫn đang theo học (chưa tốt nghiệp đúng hạn)"),
+    2: ('success', "🎓 Dự kiến tốt nghiệp 😘"),
+}
+CLASS_LABELS = {0: "Bỏ học", 1: "Đang học", 2: "Tốt nghiệp"}
 
 def predict_page():
     st.header("Dự đoán Sinh viên Bỏ học")
 
+    mode = st.sidebar.radio("Chế độ dự đoán", ["Từng sinh viên", "Theo lô (CSV/Parquet)"])
+    if mode != "Từng sinh viên":
+        batch_page()
+        return
+
     st.sidebar.markdown("### Chọn thông số sinh viên")
 
     if 'reset_counter' not in st.session_state:
@@ -23,67 +34,109 @@ def predict_page():
     Curricularunits1stsemgrade = st.sidebar.slider("Điểm học kỳ 1", 0, 20, 5)
     Curricularunits2ndsemgrade = st.sidebar.slider("Điểm học kỳ 2", 0, 20, 5)
 
-    row = np.array([
+    features = (
         DaytimeEveningAttendance, Displaced, Tuitionfeesuptodate,
         Gender, Scholarshipholder, Ageatenrollment,
         Curricularunits1stsemgrade, Curricularunits2ndsemgrade
-    ])
-
-    columns = ['Attendance', 'Displaced', 'Tuition fees up to date', 'Gender', 'Scholarship holder',
-            'Age at enrollment', 'Grade semester 1', 'Grade semester 2']
+    )
 
-    X = pd.DataFrame([row], columns=columns)
-    prediction = model.predict(X)[0]
+    explain = st.sidebar.checkbox("Giải thích kết quả (đóng góp của từng đặc trưng)")
 
+    # Chỉ chạy mô hình khi bấm nút, không chạy lại mỗi lần kéo slider
+    predict_one, compiled = get_predictor()
+    calibration = get_calibration()
     if st.sidebar.button("Dự đoán"):
+        instrumentation.inc('predict_requests_total', source='table' if compiled else 'model')
+        with instrumentation.timer('predict_request_seconds'):
+            prediction, proba = predict_one(tuple(int(v) for v in features))
+        if calibration is not None:
+            from calibration import calibrate
+
+            calibrated = calibrate(calibration, [proba])[0]
+            prediction = calibration['classes'][int(calibrated.argmax())]
+            proba = tuple(float(p) for p in calibrated)
+        try:
+            log_prediction(features, prediction)
+        except OSError:
+            # Không ghi được log giám sát (hết chỗ, không có quyền) thì vẫn trả kết quả
+            instrumentation.inc('prediction_log_errors_total')
+
         st.subheader("Kết quả dự đoán")
-        if prediction == 1:
-            st.error("🚨 Có nguy cơ bỏ học 🥲")
+        kind, message = OUTCOMES[prediction]
+        getattr(st, kind)(message)
+        if prediction == 0:
             st.snow()
-        else:
-            st.success("🎓 Dự kiến tốt nghiệp 😘")
+        elif prediction == 2:
             st.balloons()
 
+        cols = st.columns(len(proba))
+        for col, (cls, p) in zip(cols, enumerate(proba)):
+            col.metric(f"P({CLASS_LABELS.get(cls, cls)})", f"{p:.1%}")
+        st.caption("Xác suất đã hiệu chỉnh" if calibration is not None else "Xác suất gốc của mô hình (chưa hiệu chỉnh)")
+
+        if explain:
+            explain_student(features)
+
         st.subheader("Khuyến nghị hỗ trợ")
         recommend(prediction, Tuitionfeesuptodate, Curricularunits1stsemgrade, Curricularunits2ndsemgrade)
 
+    if compiled:
+        st.sidebar.caption("Dự đoán từ bảng tra cứu đã biên dịch")
+    else:
+        info = predict_one.cache_info()
+        st.sidebar.caption(f"Cache dự đoán: {info.hits} hit / {info.misses} miss ({info.currsize}/{info.maxsize})")
+
     # Nút Reset
     if st.sidebar.button("Reset"):
         st.session_state.reset_counter += 1
         st.experimental_rerun()
 
+def batch_page():
+    st.subheader("Dự đoán theo lô")
+    st.markdown("Tải lên file CSV/Parquet có cấu trúc cột giống `data.csv` hoặc 8 cột đặc trưng của mô hình.")
+
+    uploaded = st.file_uploader("Chọn file sinh viên", type=["csv", "parquet"])
+    if uploaded is None:
+        return
+    top = st.number_input("Số sinh viên nguy cơ cao nhất cần liệt kê", 1, 10_000, 50)
+    explain = st.checkbox("Kèm giải thích SHAP cho từng sinh viên (cột SHAP_*, Top_factors)")
+
+    if st.button("Chấm điểm"):
+        import pandas as pd
+        from scoring import score_file
+
+        try:
+            out, stats = score_file(get_model(), uploaded, name=uploaded.name, calibration=get_calibration(),
+                                    top=int(top), explainer=get_explainer() if explain else None)
+        except ValueError as e:
+            st.error(str(e))
+            return
+
+        st.success(f"Đã dự đoán {stats['rows']} sinh viên trong {stats['seconds']:.2f}s "
+                   f"({stats['rows_per_sec']:,.0f} dòng/giây)")
+        if explain:
+            st.caption(f"Giải thích: {stats['explain_seconds']:.2f}s ({stats['explain_rows_per_sec']:,.0f} dòng/giây)")
+        st.markdown("**Số sinh viên theo mã khuyến nghị** (cột `Recommendation` trong file kết quả)")
+        st.dataframe(pd.Series(stats['recommendations'], name="Số sinh viên"))
+        st.markdown(f"**{len(stats['top_risk'])} sinh viên có xác suất bỏ học cao nhất** "
+                    "(`Row`: vị trí trong file tải lên)")
+        st.dataframe(stats['top_risk'])
+        st.download_button("Tải kết quả", out.getvalue(), file_name="predictions.csv", mime="text/csv")
+
+def explain_student(features):
+    st.subheader("Vì sao?")
+    try:
+        contributions, base = get_explainer().explain_one(tuple(int(v) for v in features))
+    except ValueError as e:
+        st.info(str(e))
+        return
+    st.bar_chart(contributions.rename("Đóng góp (log-odds)"))
+    st.caption(f"Giá trị dương đẩy dự đoán về phía bỏ học; giá trị nền {base:+.2f} (log-odds, chưa hiệu chỉnh)")
+
 def recommend(prediction, tuition_up_to_date, grade_sem1, grade_sem2):
-    if prediction != 1:
-        st.markdown("Không có cảnh báo. Hãy giữ vững tinh thần học tập nhé!")
-    else:
-        if tuition_up_to_date == 0 and grade_sem2 < 4:
-            st.markdown("""
-            **Hỗ trợ tài chính:**
-            [Chính sách hỗ trợ học phí - HUIT](https://huit.edu.vn/thong-bao/tai-chinh.html)
-
-            **Tư vấn học tập:**
-            [Phòng Công tác Sinh viên - HUIT](https://www.facebook.com/ctsv.huit/?locale=vi_VN)
-
-            **Hỗ trợ học tập:**
-            [Hỗ trợ học tập - HUIT](https://thuvien.huit.edu.vn/)
-            """)
-            with st.expander("Ghi chú"):
-                st.markdown("""
-                - Chính sách hỗ trợ học phí dành cho sinh viên có hoàn cảnh khó khăn.
-                - Phòng CTSV hỗ trợ tư vấn học tập và xây dựng kế hoạch cá nhân
-                - Hệ thống thư viện HUIT cung cấp tài liệu học tập và ôn thi.
-                """)
-        elif tuition_up_to_date == 0:
-            st.markdown("**Hỗ trợ tài chính:** Xem chính sách tại [HUIT - Học bổng & Hỗ trợ](https://huit.edu.vn/thong-bao/tai-chinh.html)")
-        elif grade_sem1 > 5 and grade_sem2 < 4:
-            st.markdown("""
-            **Tư vấn học tập:**
-            [Phòng Công tác Sinh viên - HUIT](https://www.facebook.com/ctsv.huit/?locale=vi_VN)
-
-            **Hỗ trợ học tập:**
-            [Hỗ trợ học tập - HUIT](https://thuvien.huit.edu.vn/)
-            """)
-        elif grade_sem2 < 4:
-            st.markdown("**Tư vấn học tập:** Đăng ký tư vấn tại [Phòng Công tác Sinh viên - HUIT](https://www.facebook.com/ctsv.huit/?locale=vi_VN)")
-        else:
-            st.markdown("Không xác định nguyên nhân rõ ràng. Liên hệ [Phòng Công tác Sinh viên - HUIT](https://www.facebook.com/ctsv.huit/?locale=vi_VN) để được hỗ trợ.")
+    code = recommend_code(prediction, tuition_up_to_date, grade_sem1, grade_sem2)
+    rec = RECOMMENDATIONS[code]
+    st.markdown(rec['markdown'])
+    if rec['notes']:
+        with st.expander("Ghi chú"):
+            st.markdown("\n".join(f"- {note}" for note in rec['notes']))
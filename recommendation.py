@@ -0,0 +1,137 @@
+# Khuyến nghị hỗ trợ dưới dạng dữ liệu, dùng chung cho trang Predict và dịch vụ chấm điểm
+import operator
+
+import numpy as np
+import pandas as pd
+
+CTSV_URL = "https://www.facebook.com/ctsv.huit/?locale=vi_VN"
+FINANCE_URL = "https://huit.edu.vn/thong-bao/tai-chinh.html"
+LIBRARY_URL = "https://thuvien.huit.edu.vn/"
+
+RECOMMENDATIONS = {
+    'none': {
+        'actions': [],
+        'markdown': "Không có cảnh báo. Hãy giữ vững tinh thần học tập nhé!",
+        'notes': [],
+    },
+    'finance_and_study': {
+        'actions': [
+            {'category': "Hỗ trợ tài chính", 'label': "Chính sách hỗ trợ học phí - HUIT", 'url': FINANCE_URL},
+            {'category': "Tư vấn học tập", 'label': "Phòng Công tác Sinh viên - HUIT", 'url': CTSV_URL},
+            {'category': "Hỗ trợ học tập", 'label': "Hỗ trợ học tập - HUIT", 'url': LIBRARY_URL},
+        ],
+        'markdown': f"""
+            **Hỗ trợ tài chính:**
+            [Chính sách hỗ trợ học phí - HUIT]({FINANCE_URL})
+
+            **Tư vấn học tập:**
+            [Phòng Công tác Sinh viên - HUIT]({CTSV_URL})
+
+            **Hỗ trợ học tập:**
+            [Hỗ trợ học tập - HUIT]({LIBRARY_URL})
+            """,
+        'notes': [
+            "Chính sách hỗ trợ học phí dành cho sinh viên có hoàn cảnh khó khăn.",
+            "Phòng CTSV hỗ trợ tư vấn học tập và xây dựng kế hoạch cá nhân",
+            "Hệ thống thư viện HUIT cung cấp tài liệu học tập và ôn thi.",
+        ],
+    },
+    'finance': {
+        'actions': [
+            {'category': "Hỗ trợ tài chính", 'label': "HUIT - Học bổng & Hỗ trợ", 'url': FINANCE_URL},
+        ],
+        'markdown': f"**Hỗ trợ tài chính:** Xem chính sách tại [HUIT - Học bổng & Hỗ trợ]({FINANCE_URL})",
+        'notes': [],
+    },
+    'study_decline': {
+        'actions': [
+            {'category': "Tư vấn học tập", 'label': "Phòng Công tác Sinh viên - HUIT", 'url': CTSV_URL},
+            {'category': "Hỗ trợ học tập", 'label': "Hỗ trợ học tập - HUIT", 'url': LIBRARY_URL},
+        ],
+        'markdown': f"""
+            **Tư vấn học tập:**
+            [Phòng Công tác Sinh viên - HUIT]({CTSV_URL})
+
+            **Hỗ trợ học tập:**
+            [Hỗ trợ học tập - HUIT]({LIBRARY_URL})
+            """,
+        'notes': [],
+    },
+    'study': {
+        'actions': [
+            {'category': "Tư vấn học tập", 'label': "Phòng Công tác Sinh viên - HUIT", 'url': CTSV_URL},
+        ],
+        'markdown': f"**Tư vấn học tập:** Đăng ký tư vấn tại [Phòng Công tác Sinh viên - HUIT]({CTSV_URL})",
+        'notes': [],
+    },
+    'contact': {
+        'actions': [
+            {'category': "Liên hệ", 'label': "Phòng Công tác Sinh viên - HUIT", 'url': CTSV_URL},
+        ],
+        'markdown': f"Không xác định nguyên nhân rõ ràng. Liên hệ [Phòng Công tác Sinh viên - HUIT]({CTSV_URL}) để được hỗ trợ.",
+        'notes': [],
+    },
+}
+
+
+# Bảng luật theo thứ tự ưu tiên: luật đầu tiên thỏa mọi điều kiện (cột, phép so sánh, ngưỡng) quyết định mã
+RISK_CLASS = 0  # Dropout (0 Dropout, 1 Enrolled, 2 Graduate)
+RULES = [
+    ('none', [('Prediction', '!=', RISK_CLASS)]),
+    ('finance_and_study', [('Tuition fees up to date', '==', 0), ('Grade semester 2', '<', 4)]),
+    ('finance', [('Tuition fees up to date', '==', 0)]),
+    ('study_decline', [('Grade semester 1', '>', 5), ('Grade semester 2', '<', 4)]),
+    ('study', [('Grade semester 2', '<', 4)]),
+]
+DEFAULT_CODE = 'contact'
+CODES = list(RECOMMENDATIONS)
+
+OPERATORS = {
+    '==': operator.eq,
+    '!=': operator.ne,
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+}
+
+
+def rule_masks(columns, rules=RULES):
+    # Mỗi điều kiện chỉ được tính một lần trên toàn bộ cột dù xuất hiện trong nhiều luật
+    conditions = {}
+    masks = []
+    for _, rule in rules:
+        mask = None
+        for condition in rule:
+            if condition not in conditions:
+                col, op, threshold = condition
+                conditions[condition] = OPERATORS[op](np.asarray(columns[col]), threshold)
+            mask = conditions[condition] if mask is None else mask & conditions[condition]
+        masks.append(mask)
+    return masks
+
+
+def recommend_codes(scored, rules=RULES, default=DEFAULT_CODE):
+    # Gán mã khuyến nghị cho mọi dòng trong một lượt (np.select giữ thứ tự ưu tiên của bảng luật)
+    index = {code: i for i, code in enumerate(CODES)}
+    choices = [index[code] for code, _ in rules]
+    codes = np.select(rule_masks(scored, rules), choices, default=index[default])
+    return pd.Categorical.from_codes(codes.astype(np.int8), categories=CODES)
+
+
+def recommend_code(prediction, tuition_up_to_date, grade_sem1, grade_sem2):
+    values = {
+        'Prediction': prediction,
+        'Tuition fees up to date': tuition_up_to_date,
+        'Grade semester 1': grade_sem1,
+        'Grade semester 2': grade_sem2,
+    }
+    for code, rule in RULES:
+        if all(OPERATORS[op](values[col], threshold) for col, op, threshold in rule):
+            return code
+    return DEFAULT_CODE
+
+
+def recommendation_for(code):
+    rec = RECOMMENDATIONS[code]
+    return {'code': code, 'actions': rec['actions'], 'notes': rec['notes']}
@@ -0,0 +1,92 @@
+import streamlit as st
+
+# Tài nguyên nặng dùng chung cho mọi phiên, chỉ nạp ở lần dùng đầu tiên.
+# Mỗi tài nguyên được bọc trong scoring.Reloadable: khi train.py/lookup.py/calibration.py xuất bản file mới
+# (ghi file tạm rồi os.replace), lần gọi kế tiếp tự nạp lại mà không cần khởi động lại worker.
+
+
+@st.cache_resource
+def _model_handle():
+    from scoring import MODEL_PATH, Reloadable, load_model
+
+    return Reloadable([MODEL_PATH], load_model)
+
+
+def get_model():
+    return _model_handle().get()
+
+
+def _load_predictor():
+    # Ưu tiên bảng tra cứu đã biên dịch (python lookup.py) nếu còn khớp với mô hình:
+    # khi đó không cần unpickle mô hình, bảng được mmap và dùng chung giữa các worker.
+    # Nếu không thì dùng cache LRU quanh mô hình.
+    from lookup import load_table, table_predictor
+    from scoring import MODEL_PATH, cached_predictor
+
+    compiled = load_table(model_path=MODEL_PATH)
+    if compiled is not None:
+        return table_predictor(compiled[0]), True
+    return cached_predictor(_model_handle().get(force=True)), False
+
+
+@st.cache_resource
+def _predictor_handle():
+    from lookup import META_PATH
+    from scoring import MODEL_PATH, Reloadable
+
+    return Reloadable([MODEL_PATH, META_PATH], _load_predictor)
+
+
+def get_predictor():
+    return _predictor_handle().get()
+
+
+@st.cache_resource
+def _calibration_handle():
+    # Hiệu chỉnh xác suất (python calibration.py) nếu có và còn khớp với mô hình, nếu không thì None
+    from calibration import CALIBRATION_PATH, load_calibration
+    from scoring import MODEL_PATH, Reloadable
+
+    return Reloadable([MODEL_PATH, CALIBRATION_PATH],
+                      lambda: load_calibration(CALIBRATION_PATH, model_path=MODEL_PATH))
+
+
+def get_calibration():
+    return _calibration_handle().get()
+
+
+@st.cache_resource
+def _explainer_handle():
+    # Giải thích SHAP cần mô hình thật (bảng tra cứu chỉ lưu lớp và xác suất); cache theo bộ đặc trưng
+    # được tạo lại khi mô hình đổi
+    from explanations import Explainer
+    from scoring import MODEL_PATH, Reloadable
+
+    return Reloadable([MODEL_PATH], lambda: Explainer(_model_handle().get(force=True)))
+
+
+def get_explainer():
+    return _explainer_handle().get()
+
+
+@st.cache_resource
+def get_monitor():
+    # Tóm tắt cộng dồn của log dự đoán, dùng chung cho mọi phiên trong worker; mỗi lần xem trang chỉ đọc phần log mới
+    from drift import Monitor
+
+    return Monitor()
+
+
+@st.cache_resource
+def _reference_handle():
+    # Hồ sơ tham chiếu của data.csv, build lại khi dữ liệu, mô hình hoặc file hiệu chỉnh đổi
+    from calibration import CALIBRATION_PATH
+    from dataset import DATA_PATH
+    from drift import load_reference
+    from scoring import MODEL_PATH, Reloadable
+
+    return Reloadable([DATA_PATH, MODEL_PATH, CALIBRATION_PATH], load_reference)
+
+
+def get_reference():
+    return _reference_handle().get()
@@ -0,0 +1,301 @@
+import csv
+import io
+import os
+import threading
+import time
+from functools import lru_cache
+import numpy as np
+import pandas as pd
+import joblib
+
+import instrumentation
+
+from recommendation import CODES, recommend_codes
+
+# MODEL_MMAP=r: nạp file joblib không nén với các mảng numpy được mmap từ đĩa (chỉ có ích với mô hình
+# giữ cây dưới dạng mảng numpy; CatBoost/XGBoost chép mô hình vào cấu trúc native nên không chia sẻ được)
+MODEL_MMAP = os.environ.get('MODEL_MMAP') or None
+
+# Có thể trỏ tới file định dạng gốc (.cbm của CatBoost, .ubj/.json của XGBoost) do train.py --format native xuất ra
+MODEL_PATH = os.environ.get('MODEL_PATH', 'model.joblib')
+
+# 8 đặc trưng mô hình được huấn luyện (đúng thứ tự)
+FEATURE_COLUMNS = ['Attendance', 'Displaced', 'Tuition fees up to date', 'Gender', 'Scholarship holder',
+                   'Age at enrollment', 'Grade semester 1', 'Grade semester 2']
+
+# Tên cột trong data.csv -> tên đặc trưng của mô hình
+SOURCE_COLUMNS = {
+    'Daytime/evening attendance': 'Attendance',
+    'Displaced': 'Displaced',
+    'Tuition fees up to date': 'Tuition fees up to date',
+    'Gender': 'Gender',
+    'Scholarship holder': 'Scholarship holder',
+    'Age at enrollment': 'Age at enrollment',
+    'Curricular units 1st sem (grade)': 'Grade semester 1',
+    'Curricular units 2nd sem (grade)': 'Grade semester 2',
+}
+
+CLASS_NAMES = {0: 'Dropout', 1: 'Enrolled', 2: 'Graduate'}
+DROPOUT_CLASS = 0
+RISK_COLUMN = f'Proba_{CLASS_NAMES[DROPOUT_CLASS]}'
+TOP_K = 50
+
+CHUNK_SIZE = 50_000
+
+# Không gian đầu vào ~1 triệu điểm, người dùng chủ yếu lặp lại một phần nhỏ
+PREDICTION_CACHE_SIZE = 4096
+
+
+@instrumentation.timed('model_load_seconds')
+def load_model(path=MODEL_PATH, mmap_mode=MODEL_MMAP):
+    ext = os.path.splitext(path)[1].lower()
+    if ext == '.cbm':
+        from catboost import CatBoostClassifier
+        return CatBoostClassifier().load_model(path)
+    if ext in ('.ubj', '.json'):
+        from xgboost import XGBClassifier
+        model = XGBClassifier()
+        model.load_model(path)
+        return model
+    return joblib.load(path, mmap_mode=mmap_mode)
+
+
+class Reloadable:
+    # Giữ một artifact đã nạp và nạp lại khi một trong các file nguồn được thay (os.replace tạo inode mới).
+    # Mỗi lần get() tốn tối đa một lượt stat mỗi `interval` giây; luồng đang dùng bản cũ vẫn giữ tham chiếu cũ.
+    def __init__(self, paths, load, interval=1.0):
+        self.paths = list(paths)
+        self.load = load
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.signature = self._signature()
+        self.value = load()
+        self.checked = time.monotonic()
+        self.reloads = 0
+
+    def _signature(self):
+        signature = []
+        for path in self.paths:
+            try:
+                st = os.stat(path)
+                signature.append((st.st_ino, st.st_mtime_ns, st.st_size))
+            except FileNotFoundError:
+                signature.append(None)
+        return tuple(signature)
+
+    def get(self, force=False):
+        # force: kiểm tra file ngay, bỏ qua khoảng `interval` (vd. khi artifact phụ thuộc vừa được nạp lại)
+        now = time.monotonic()
+        if not force and now - self.checked < self.interval:
+            return self.value
+        with self.lock:
+            if force or now - self.checked >= self.interval:
+                self.checked = now
+                signature = self._signature()
+                if signature != self.signature:
+                    try:
+                        self.value = self.load()
+                        self.signature = signature
+                        self.reloads += 1
+                        instrumentation.inc('model_reloads_total')
+                    except Exception:
+                        # File mới chưa đọc được (đang ghi dở/bị xóa): giữ bản cũ, thử lại ở lần sau
+                        instrumentation.inc('model_reload_errors_total')
+        return self.value
+
+
+def _normalize(name):
+    # Bỏ '_', khoảng trắng/tab thừa và phân biệt hoa thường
+    return ' '.join(str(name).replace('_', ' ').split()).lower()
+
+
+def resolve_columns(columns):
+    lookup = {_normalize(src): feature for src, feature in SOURCE_COLUMNS.items()}
+    lookup.update({_normalize(feature): feature for feature in FEATURE_COLUMNS})
+
+    mapping = {}
+    for col in columns:
+        feature = lookup.get(_normalize(col))
+        if feature is not None and feature not in mapping.values():
+            mapping[col] = feature
+
+    missing = [f for f in FEATURE_COLUMNS if f not in mapping.values()]
+    if missing:
+        raise ValueError(f"Thiếu cột đặc trưng: {missing}")
+    return mapping
+
+
+def to_features(chunk, mapping):
+    X = chunk[list(mapping)].rename(columns=mapping)
+    return X[FEATURE_COLUMNS]
+
+
+def predict_chunk(model, X, calibration=None):
+    instrumentation.inc('predict_rows_total', len(X), mode='batch')
+    with instrumentation.timer('predict_seconds', mode='batch'):
+        proba = np.asarray(model.predict_proba(X))
+        if calibration is None:
+            # CatBoost trả về mảng (n, 1) cho bài toán nhiều lớp
+            prediction = np.asarray(model.predict(X)).ravel()
+    if calibration is not None:
+        # Lớp dự đoán lấy theo xác suất đã hiệu chỉnh để hai cột luôn nhất quán
+        from calibration import calibrate
+
+        proba = calibrate(calibration, proba)
+        prediction = np.asarray(model.classes_)[proba.argmax(axis=1)]
+    # Gán theo vị trí để không phụ thuộc vào index (có thể bị trùng)
+    result = X.copy()
+    result['Prediction'] = prediction
+    for i, cls in enumerate(model.classes_):
+        result[f'Proba_{CLASS_NAMES.get(cls, cls)}'] = proba[:, i]
+    result['Recommendation'] = recommend_codes(result)
+    return result
+
+
+def top_k(scores, k):
+    # Vị trí của k điểm lớn nhất, giảm dần (bằng điểm thì vị trí nhỏ trước):
+    # argpartition O(n) rồi chỉ sắp xếp k phần tử được chọn
+    scores = np.asarray(scores)
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    idx = np.argpartition(scores, len(scores) - k)[len(scores) - k:]
+    return idx[np.lexsort((idx, -scores[idx]))]
+
+
+class RiskQueue:
+    # Giữ k sinh viên có xác suất bỏ học cao nhất khi chấm điểm theo khối; bộ nhớ O(k + kích thước khối)
+    def __init__(self, k):
+        self.k = k
+        self.offset = 0
+        self.positions = np.empty(0, dtype=np.int64)
+        self.scores = np.empty(0)
+        self.rows = None
+
+    def update(self, scored, column=RISK_COLUMN):
+        positions = np.concatenate([self.positions, self.offset + np.arange(len(scored))])
+        scores = np.concatenate([self.scores, scored[column].to_numpy(dtype=np.float64)])
+        rows = scored if self.rows is None else pd.concat([self.rows, scored], ignore_index=True)
+        self.offset += len(scored)
+
+        keep = top_k(scores, self.k)
+        self.positions, self.scores = positions[keep], scores[keep]
+        self.rows = rows.iloc[keep].reset_index(drop=True)
+
+    def result(self):
+        if self.rows is None:
+            return pd.DataFrame()
+        # 'Row' là vị trí (bắt đầu từ 0) của sinh viên trong file đầu vào
+        return self.rows.assign(Row=self.positions).set_index('Row')
+
+
+def rank_risk(scored, k, column=RISK_COLUMN):
+    idx = top_k(scored[column].to_numpy(dtype=np.float64), k)
+    return scored.iloc[idx]
+
+
+def cached_predictor(model, maxsize=PREDICTION_CACHE_SIZE):
+    # Khóa cache là bộ 8 đặc trưng (số nguyên nhỏ); thống kê hit/miss qua .cache_info()
+    @lru_cache(maxsize=maxsize)
+    def predict_one(features):
+        X = pd.DataFrame([features], columns=FEATURE_COLUMNS)
+        with instrumentation.timer('predict_seconds', mode='single'):
+            prediction = int(np.asarray(model.predict(X)).ravel()[0])
+            proba = tuple(float(p) for p in np.asarray(model.predict_proba(X))[0])
+        return prediction, proba
+
+    return predict_one
+
+
+def score_frame(model, data, chunk_size=CHUNK_SIZE, calibration=None):
+    mapping = resolve_columns(data.columns)
+    parts = []
+    for start in range(0, len(data), chunk_size):
+        X = to_features(data.iloc[start:start + chunk_size], mapping)
+        parts.append(predict_chunk(model, X, calibration))
+    if not parts:
+        return pd.DataFrame(columns=FEATURE_COLUMNS + ['Prediction', 'Recommendation'])
+    return pd.concat(parts)
+
+
+def _is_parquet(source, name):
+    if name is not None:
+        return str(name).lower().endswith(('.parquet', '.pq'))
+    if isinstance(source, str):
+        return source.lower().endswith(('.parquet', '.pq'))
+    return False
+
+
+def _sniff_sep(source):
+    if isinstance(source, str):
+        with open(source, 'r', encoding='utf-8-sig', newline='') as f:
+            sample = f.read(4096)
+    else:
+        pos = source.tell()
+        sample = source.read(4096)
+        source.seek(pos)
+        if isinstance(sample, bytes):
+            sample = sample.decode('utf-8-sig', errors='ignore')
+    try:
+        return csv.Sniffer().sniff(sample.splitlines()[0], delimiters=';,\t|').delimiter
+    except (csv.Error, IndexError):
+        return ';'
+
+
+def iter_chunks(source, name=None, chunk_size=CHUNK_SIZE, sep=None):
+    # Đọc file theo từng khối, chỉ lấy 8 cột cần thiết để giới hạn bộ nhớ
+    if _is_parquet(source, name):
+        import pyarrow.parquet as pq
+
+        pf = pq.ParquetFile(source)
+        mapping = resolve_columns(pf.schema_arrow.names)
+        for batch in pf.iter_batches(batch_size=chunk_size, columns=list(mapping)):
+            yield mapping, batch.to_pandas()
+        return
+
+    if sep is None:
+        sep = _sniff_sep(source)
+    header = pd.read_csv(source, sep=sep, nrows=0, encoding='utf-8-sig')
+    if not isinstance(source, str):
+        source.seek(0)
+    mapping = resolve_columns(header.columns)
+    reader = pd.read_csv(source, sep=sep, usecols=list(mapping), chunksize=chunk_size, encoding='utf-8-sig')
+    for chunk in reader:
+        yield mapping, chunk
+
+
+def score_file(model, source, out=None, name=None, chunk_size=CHUNK_SIZE, sep=None, calibration=None, top=TOP_K,
+               explainer=None):
+    # Chấm điểm cả khóa, ghi kết quả CSV vào `out`, trả về (out, thống kê); thống kê kèm `top` sinh viên
+    # có xác suất bỏ học cao nhất. explainer (explanations.Explainer): ghi thêm cột SHAP cạnh kết quả
+    if out is None:
+        out = io.BytesIO()
+    rows = 0
+    recommendations = pd.Series(0, index=CODES)
+    queue = RiskQueue(top)
+    explain_seconds = 0.0
+    start = time.perf_counter()
+    for mapping, chunk in iter_chunks(source, name=name, chunk_size=chunk_size, sep=sep):
+        X = to_features(chunk, mapping)
+        scored = predict_chunk(model, X, calibration)
+        if explainer is not None:
+            explain_start = time.perf_counter()
+            scored = pd.concat([scored, explainer.frame(X)], axis=1)
+            explain_seconds += time.perf_counter() - explain_start
+        scored.to_csv(out, index=False, header=rows == 0)
+        rows += len(scored)
+        recommendations += scored['Recommendation'].value_counts(sort=False)
+        queue.update(scored)
+    elapsed = time.perf_counter() - start
+
+    stats = {
+        'rows': rows,
+        'seconds': elapsed,
+        'rows_per_sec': rows / elapsed if elapsed > 0 else 0.0,
+        'recommendations': {code: int(n) for code, n in recommendations.items()},
+        'top_risk': queue.result(),
+    }
+    if explainer is not None:
+        stats['explain_seconds'] = explain_seconds
+        stats['explain_rows_per_sec'] = rows / explain_seconds if explain_seconds > 0 else 0.0
+    return out, stats
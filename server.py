@@ -0,0 +1,247 @@
+import argparse
+import json
+import queue
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pandas as pd
+
+from calibration import CALIBRATION_PATH, load_calibration
+from lookup import FEATURE_RANGES
+from recommendation import recommendation_for
+from scoring import CLASS_NAMES, FEATURE_COLUMNS, MODEL_PATH, load_model, predict_chunk, resolve_columns, to_features
+
+
+class Metrics:
+    def __init__(self, window=10_000):
+        self.lock = threading.Lock()
+        self.started = time.perf_counter()
+        self.latencies = deque(maxlen=window)
+        self.requests = 0
+        self.rows = 0
+        self.batches = 0
+        self.errors = 0
+
+    def record_request(self, latency, rows):
+        with self.lock:
+            self.latencies.append(latency)
+            self.requests += 1
+            self.rows += rows
+
+    def record_batch(self):
+        with self.lock:
+            self.batches += 1
+
+    def record_error(self):
+        with self.lock:
+            self.errors += 1
+
+    def snapshot(self):
+        with self.lock:
+            latencies = np.array(self.latencies)
+            uptime = time.perf_counter() - self.started
+            requests, rows, batches, errors = self.requests, self.rows, self.batches, self.errors
+
+        p50, p99 = np.percentile(latencies, [50, 99]) * 1000 if len(latencies) else (0.0, 0.0)
+        return {
+            'uptime_s': uptime,
+            'requests': requests,
+            'rows': rows,
+            'batches': batches,
+            'errors': errors,
+            'avg_batch_rows': rows / batches if batches else 0.0,
+            'latency_p50_ms': float(p50),
+            'latency_p99_ms': float(p99),
+            'requests_per_sec': requests / uptime if uptime > 0 else 0.0,
+            'rows_per_sec': rows / uptime if uptime > 0 else 0.0,
+        }
+
+
+class MicroBatcher:
+    # Gom các yêu cầu đến gần nhau thành một lần gọi predict/predict_proba
+    def __init__(self, model, metrics, max_batch=256, max_wait_ms=2.0, calibration=None):
+        self.model = model
+        self.calibration = calibration
+        self.metrics = metrics
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def submit(self, X, timeout=30):
+        item = {'X': X, 'done': threading.Event(), 'result': None, 'error': None}
+        self.queue.put(item)
+        if not item['done'].wait(timeout):
+            raise TimeoutError("Hết thời gian chờ dự đoán")
+        if item['error'] is not None:
+            raise item['error']
+        return item['result']
+
+    def _collect(self):
+        items = [self.queue.get()]
+        rows = len(items[0]['X'])
+        deadline = time.perf_counter() + self.max_wait
+        while rows < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                item = self.queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            items.append(item)
+            rows += len(item['X'])
+        return items
+
+    def _predict(self, items):
+        X = pd.concat([item['X'] for item in items], ignore_index=True)
+        scored = predict_chunk(self.model, X, self.calibration)
+        self.metrics.record_batch()
+        start = 0
+        for item in items:
+            end = start + len(item['X'])
+            item['result'] = scored.iloc[start:end]
+            start = end
+
+    def _run(self):
+        while True:
+            items = self._collect()
+            try:
+                self._predict(items)
+            except Exception as e:
+                if len(items) == 1:
+                    items[0]['error'] = e
+                else:
+                    # Một yêu cầu lỗi không được kéo cả lô lỗi theo: chạy lại từng yêu cầu riêng
+                    for item in items:
+                        try:
+                            self._predict([item])
+                        except Exception as item_error:
+                            item['error'] = item_error
+            for item in items:
+                item['done'].set()
+
+
+def parse_students(payload):
+    records = payload.get('students', payload) if isinstance(payload, dict) else payload
+    if isinstance(records, dict):
+        records = [records]
+    if not isinstance(records, list) or not records:
+        raise ValueError("Cần một sinh viên hoặc danh sách 'students'")
+    data = pd.DataFrame.from_records(records)
+    X = to_features(data, resolve_columns(data.columns))
+    # Kiểm tra kiểu và miền giá trị ngay khi nhận: yêu cầu sai trả 400 và không vào lô dùng chung
+    columns = {}
+    for col, (lo, hi) in zip(FEATURE_COLUMNS, FEATURE_RANGES):
+        try:
+            values = pd.to_numeric(X[col], errors='raise')
+        except (ValueError, TypeError):
+            raise ValueError(f"Cột '{col}' phải là số") from None
+        if values.isna().any() or not values.between(lo, hi).all():
+            raise ValueError(f"Cột '{col}' phải nằm trong khoảng [{lo}, {hi}]")
+        columns[col] = values
+    return pd.DataFrame(columns, index=X.index)
+
+
+def format_results(scored):
+    proba_cols = [c for c in scored.columns if c.startswith('Proba_')]
+    results = []
+    for record in scored.to_dict('records'):
+        prediction = int(record['Prediction'])
+        results.append({
+            'prediction': prediction,
+            'label': CLASS_NAMES.get(prediction, str(prediction)),
+            'proba': {c[len('Proba_'):]: float(record[c]) for c in proba_cols},
+            'recommendation': recommendation_for(record['Recommendation']),
+        })
+    return results
+
+
+class ScoringServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # Hàng đợi kết nối mặc định (5) quá nhỏ khi nhiều client gọi cùng lúc
+    request_queue_size = 128
+
+
+def make_handler(batcher, metrics):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def _send(self, status, body):
+            data = json.dumps(body, ensure_ascii=False).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path == '/health':
+                self._send(200, {'status': 'ok', 'features': FEATURE_COLUMNS})
+            elif self.path == '/metrics':
+                self._send(200, metrics.snapshot())
+            else:
+                self._send(404, {'error': 'not found'})
+
+        def do_POST(self):
+            if self.path != '/predict':
+                self._send(404, {'error': 'not found'})
+                return
+            start = time.perf_counter()
+            try:
+                length = int(self.headers.get('Content-Length', 0))
+                X = parse_students(json.loads(self.rfile.read(length)))
+                results = format_results(batcher.submit(X))
+            except (ValueError, KeyError, TypeError) as e:
+                metrics.record_error()
+                self._send(400, {'error': str(e)})
+                return
+            except Exception as e:
+                metrics.record_error()
+                self._send(500, {'error': str(e)})
+                return
+            metrics.record_request(time.perf_counter() - start, len(results))
+            self._send(200, {'predictions': results})
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def create_server(host='127.0.0.1', port=8000, model_path=MODEL_PATH, max_batch=256, max_wait_ms=2.0,
+                  calibration_path=CALIBRATION_PATH):
+    # Load model đúng 1 lần cho cả tiến trình
+    model = load_model(model_path)
+    calibration = load_calibration(calibration_path, model_path) if calibration_path else None
+    metrics = Metrics()
+    batcher = MicroBatcher(model, metrics, max_batch=max_batch, max_wait_ms=max_wait_ms, calibration=calibration)
+    return ScoringServer((host, port), make_handler(batcher, metrics))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Dịch vụ HTTP/JSON dự đoán sinh viên bỏ học")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--model', default=MODEL_PATH)
+    parser.add_argument('--max-batch', type=int, default=256)
+    parser.add_argument('--max-wait-ms', type=float, default=2.0)
+    parser.add_argument('--calibration', default=CALIBRATION_PATH, help="File hiệu chỉnh xác suất ('' để tắt)")
+    args = parser.parse_args()
+
+    server = create_server(args.host, args.port, args.model, args.max_batch, args.max_wait_ms, args.calibration)
+    print(f"Đang phục vụ tại http://{args.host}:{args.port} (POST /predict, GET /metrics, GET /health)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
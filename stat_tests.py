@@ -0,0 +1,91 @@
+import numpy as np
+import pandas as pd
+
+
+def numeric_columns(data, exclude=('Target',)):
+    return [col for col in data.select_dtypes(include='number').columns if col not in exclude]
+
+
+def discrete_columns(data, exclude=('Target',)):
+    # Cột rời rạc: category và các cột số nguyên (cờ nhị phân, số đếm)
+    cols = data.select_dtypes(include=['category', 'integer']).columns
+    return [col for col in cols if col not in exclude]
+
+
+def anova_groups(n, means, m2, columns):
+    # F một chiều từ thống kê theo nhóm (n_g, trung bình, tổng bình phương độ lệch M2_g), mỗi cột một giá trị:
+    # SSB = Σ n_g (mean_g - mean)², SSW = Σ M2_g
+    from scipy.stats import f
+
+    n = np.asarray(n, dtype=float).reshape(-1, 1)
+    k, total = len(n), n.sum()
+    grand = (n * means).sum(axis=0) / total
+    ss_between = (n * (means - grand) ** 2).sum(axis=0)
+    ss_within = np.asarray(m2).sum(axis=0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        f_stat = (ss_between / (k - 1)) / (ss_within / (total - k))
+    return pd.DataFrame({'F': f_stat, 'p_value': f.sf(f_stat, k - 1, total - k)},
+                        index=pd.Index(columns, name='feature'))
+
+
+def anova_all(data, codes, columns=None):
+    # ANOVA cho mọi cột số cùng lúc: một lượt groupby lấy n, tổng và tổng bình phương theo nhóm.
+    # Trừ trung bình toàn cục trước để tổng bình phương không bị mất chính xác.
+    columns = numeric_columns(data) if columns is None else columns
+    X = data[columns].to_numpy(dtype=float)
+    X = X - X.mean(axis=0)
+    groups = pd.DataFrame(np.hstack([X, X ** 2])).groupby(np.asarray(codes))
+    sums = groups.sum().to_numpy()
+    n = groups.size().to_numpy()[:, None]
+    s1, s2 = sums[:, :len(columns)], sums[:, len(columns):]
+    return anova_groups(n, s1 / n, s2 - s1 ** 2 / n, columns)
+
+
+def contingency_tables(data, target, columns=None):
+    # Mọi bảng chéo đặc trưng × target trong một lần bincount: mỗi cột được mã hóa thành
+    # [offset của cột + mã giá trị] rồi ghép với mã target
+    columns = discrete_columns(data) if columns is None else columns
+    target_codes, target_levels = pd.factorize(np.asarray(target), sort=True)
+    n_target = len(target_levels)
+
+    offsets, levels, flat = [0], [], []
+    for col in columns:
+        codes, uniques = pd.factorize(data[col], sort=True)
+        # pd.factorize mã NaN thành -1: bỏ các dòng thiếu giá trị (ở cột hoặc ở target) như pd.crosstab
+        valid = (codes >= 0) & (target_codes >= 0)
+        flat.append((offsets[-1] + codes[valid]) * n_target + target_codes[valid])
+        levels.append(uniques)
+        offsets.append(offsets[-1] + len(uniques))
+    counts = np.bincount(np.concatenate(flat), minlength=offsets[-1] * n_target).reshape(-1, n_target)
+    return {col: counts[offsets[i]:offsets[i + 1]] for i, col in enumerate(columns)}, levels, target_levels
+
+
+def chi2_tables(tables, correction=True):
+    # Thống kê chi-square cho mọi bảng cùng lúc: các bảng được xếp chồng (đệm dòng 0) thành mảng 3 chiều.
+    # Tương đương chi2_contingency từng bảng, kể cả hiệu chỉnh Yates khi bậc tự do bằng 1.
+    from scipy.stats import chi2
+
+    tables = {name: np.asarray(table, dtype=float) for name, table in tables.items()}
+    shape = (len(tables), max(t.shape[0] for t in tables.values()), max(t.shape[1] for t in tables.values()))
+    observed = np.zeros(shape)
+    for i, table in enumerate(tables.values()):
+        observed[i, :table.shape[0], :table.shape[1]] = table
+
+    row, col = observed.sum(axis=2), observed.sum(axis=1)
+    expected = row[:, :, None] * col[:, None, :] / observed.sum(axis=(1, 2))[:, None, None]
+    dof = ((row > 0).sum(axis=1) - 1) * ((col > 0).sum(axis=1) - 1)
+
+    if correction:
+        diff = expected - observed
+        yates = (dof == 1)[:, None, None]
+        observed = observed + np.where(yates, np.sign(diff) * np.minimum(0.5, np.abs(diff)), 0)
+    valid = expected > 0
+    terms = np.where(valid, (observed - expected) ** 2 / np.where(valid, expected, 1), 0)
+    stat = terms.sum(axis=(1, 2))
+    p_value = np.where(dof > 0, chi2.sf(stat, np.maximum(dof, 1)), 1.0)
+    return pd.DataFrame({'chi2': stat, 'dof': dof, 'p_value': p_value}, index=pd.Index(list(tables), name='feature'))
+
+
+def chi2_all(data, target, columns=None, correction=True):
+    tables, _, _ = contingency_tables(data, target, columns)
+    return chi2_tables(tables, correction)
@@ -0,0 +1,380 @@
+import argparse
+import json
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from dataset import CONTINUOUS_COLS, DATA_PATH, TARGET_CATEGORIES, iter_chunks
+from insight_stats import FINANCIAL_VARS, IQR_COLS, SCORE_COLS, SOCIAL_VARS, TARGET_LABELS
+from stat_tests import anova_groups, chi2_tables, contingency_tables, discrete_columns, numeric_columns
+
+CHUNK_SIZE = 100_000
+SKETCH_SIZE = 4096
+MAX_DUPLICATE_ROWS = 1000
+
+# Sai số cho phép so với đường tính trong bộ nhớ (insight_stats.compute).
+# Khi mỗi cột có không quá SKETCH_SIZE giá trị, sketch giữ toàn bộ dữ liệu nên tứ phân vị là chính xác
+# và mọi thống kê phải khớp tới sai số làm tròn. Khi sketch đã nén, tứ phân vị là xấp xỉ: chỉ kiểm tra
+# tỷ lệ dòng bị giữ/loại khác đi do biên IQR, các thống kê phía sau chỉ được báo cáo.
+TOLERANCES = {
+    'moments_rel': 1e-9,
+    'p_value_rel': 1e-6,
+    'keep_mismatch_rate': 0.005,
+}
+
+
+class Moments:
+    # Số lượng, trung bình và đồng mô-men bậc hai có thể gộp giữa các khối (Chan et al.)
+    def __init__(self, n_cols):
+        self.n = 0
+        self.mean = np.zeros(n_cols)
+        self.comoment = np.zeros((n_cols, n_cols))
+        self.min = np.full(n_cols, np.inf)
+        self.max = np.full(n_cols, -np.inf)
+
+    def update(self, values):
+        if len(values) == 0:
+            return
+        other = Moments(values.shape[1])
+        other.n = len(values)
+        other.mean = values.mean(axis=0)
+        centered = values - other.mean
+        other.comoment = centered.T @ centered
+        other.min = values.min(axis=0)
+        other.max = values.max(axis=0)
+        self.merge(other)
+
+    def merge(self, other):
+        if other.n == 0:
+            return
+        n = self.n + other.n
+        delta = other.mean - self.mean
+        self.comoment = self.comoment + other.comoment + np.outer(delta, delta) * self.n * other.n / n
+        self.mean = self.mean + delta * other.n / n
+        self.n = n
+        self.min = np.minimum(self.min, other.min)
+        self.max = np.maximum(self.max, other.max)
+
+    def var(self):
+        return np.diag(self.comoment) / (self.n - 1)
+
+    def corr(self):
+        scale = np.sqrt(np.diag(self.comoment))
+        return self.comoment / np.outer(scale, scale)
+
+
+class QuantileSketch:
+    # Sketch nén theo tầng (kiểu KLL): mỗi tầng giữ tối đa k giá trị, khi đầy thì sắp xếp,
+    # giữ một nửa xen kẽ (lệch ngẫu nhiên) và đẩy lên tầng trên với trọng số gấp đôi.
+    # Bộ nhớ O(k log(n/k)); chưa nén lần nào thì quantile trùng với pandas (nội suy tuyến tính).
+    def __init__(self, k=SKETCH_SIZE, seed=0):
+        self.k = k
+        self.levels = [np.empty(0)]
+        self.n = 0
+        self.rng = np.random.default_rng(seed)
+
+    @property
+    def exact(self):
+        return len(self.levels) == 1
+
+    def update(self, values):
+        values = np.asarray(values, dtype=float)
+        self.n += len(values)
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self._compress()
+
+    def merge(self, other):
+        self.n += other.n
+        for level, values in enumerate(other.levels):
+            if level == len(self.levels):
+                self.levels.append(np.empty(0))
+            self.levels[level] = np.concatenate([self.levels[level], values])
+        self._compress()
+
+    def _compress(self):
+        level = 0
+        while level < len(self.levels):
+            while len(self.levels[level]) > self.k:
+                if level + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                values = np.sort(self.levels[level])
+                cut = len(values) - len(values) % 2
+                self.levels[level + 1] = np.concatenate(
+                    [self.levels[level + 1], values[self.rng.integers(2):cut:2]])
+                self.levels[level] = values[cut:]
+            level += 1
+
+    def quantile(self, q):
+        if self.exact:
+            return float(np.quantile(self.levels[0], q))
+        values = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(v), 2.0 ** i) for i, v in enumerate(self.levels)])
+        order = np.argsort(values)
+        cumulative = np.cumsum(weights[order])
+        rank = q * cumulative[-1]
+        return float(values[order][min(np.searchsorted(cumulative, rank), len(values) - 1)])
+
+
+class DuplicateTracker:
+    # Phát hiện dòng trùng bằng hash 64-bit của từng dòng; xác suất đụng hash không đáng kể
+    # Hash đã gặp được giữ theo từng khối (rời nhau) để artifact lưu mỗi khối thành một phần riêng
+    def __init__(self, max_rows=MAX_DUPLICATE_ROWS):
+        self.seen_parts = []
+        self.count = 0
+        self.max_rows = max_rows
+        self.rows = []
+
+    def __getstate__(self):
+        # Các phần hash được insight_stats lưu riêng từng file, không nằm trong state.pkl
+        return {**self.__dict__, 'seen_parts': []}
+
+    def update(self, chunk):
+        hashes = pd.util.hash_pandas_object(chunk, index=False).to_numpy()
+        duplicated = pd.Series(hashes).duplicated().to_numpy()
+        for seen in self.seen_parts:
+            duplicated |= np.isin(hashes, seen)
+        self.seen_parts.append(np.unique(hashes[~duplicated]))
+        self.count += int(duplicated.sum())
+        stored = sum(len(rows) for rows in self.rows)
+        if duplicated.any() and stored < self.max_rows:
+            self.rows.append(chunk[duplicated].head(self.max_rows - stored))
+
+    def table(self, columns):
+        return pd.concat(self.rows) if self.rows else pd.DataFrame(columns=columns)
+
+
+def add_counts(total, chunk_counts):
+    return chunk_counts if total is None else total.add(chunk_counts, fill_value=0)
+
+
+def target_codes(target):
+    # Mã cố định theo TARGET_CATEGORIES để các khối được mã hóa giống nhau
+    return pd.Categorical(target, categories=TARGET_CATEGORIES).codes
+
+
+def iqr_bounds(path, chunksize, sketch_size, k=3):
+    # Lọc IQR tuần tự như insight_stats.iqr_filter: mỗi cột cần một lượt đọc (chỉ các cột điểm)
+    # để tính tứ phân vị trên các dòng đã qua biên của những cột trước đó.
+    steps = []
+    exact = True
+    for col in IQR_COLS:
+        sketch = QuantileSketch(sketch_size)
+        for chunk in iter_chunks(path, chunksize, IQR_COLS):
+            sketch.update(chunk[col].to_numpy()[passes(chunk, steps)])
+        exact &= sketch.exact
+        q1, q3 = sketch.quantile(0.25), sketch.quantile(0.75)
+        iqr = q3 - q1
+        steps.append({'column': col, 'lower': float(q1 - k * iqr), 'upper': float(q3 + k * iqr)})
+    return steps, exact
+
+
+def passes(chunk, steps):
+    mask = np.ones(len(chunk), dtype=bool)
+    for step in steps:
+        values = chunk[step['column']].to_numpy()
+        mask &= (values >= step['lower']) & (values <= step['upper'])
+    return mask
+
+
+def crosstab_counts(clean, binary, columns):
+    # Bảng chéo của khối hiện tại cho mọi cột rời rạc, dạng DataFrame để cộng dồn theo nhãn giữa các khối
+    tables, levels, target_levels = contingency_tables(clean, binary, columns)
+    return {col: pd.DataFrame(tables[col], index=levels[i], columns=target_levels) for i, col in enumerate(columns)}
+
+
+class InsightAggregates:
+    # Toàn bộ trạng thái cộng dồn của thống kê Insight với biên IQR cố định.
+    # update() chỉ tốn thời gian theo số dòng mới nên dùng được cho cả lượt đọc đầy đủ và dữ liệu bổ sung.
+    policy_index = ['Tuition_fees_up_to_date', 'Scholarship_holder', 'Debtor']
+
+    def __init__(self, steps, sketch_size=SKETCH_SIZE, exact_bounds=True):
+        self.steps = steps
+        self.sketch_size = sketch_size
+        self.exact_bounds = exact_bounds
+        self.n_rows = 0
+        self.built_rows = None
+        self.columns = None
+        self.dtypes = None
+        self.nulls = None
+        self.target_counts = None
+        self.step_counts = np.zeros(len(steps) + 1, dtype=np.int64)
+        self.duplicates = DuplicateTracker()
+        self.keep_parts = []
+        self.moments = Moments(len(CONTINUOUS_COLS))
+        self.groups = None
+        self.crosstabs = None
+        self.describe_sketches = {col: QuantileSketch(sketch_size) for col in IQR_COLS}
+        self.policy_counts = None
+
+    def __getstate__(self):
+        # Mặt nạ IQR theo từng khối cũng được lưu thành phần riêng; state.pkl chỉ giữ phần có kích thước cố định
+        return {**self.__dict__, 'keep_parts': []}
+
+    @property
+    def parts(self):
+        return list(zip(self.keep_parts, self.duplicates.seen_parts))
+
+    def update(self, chunk):
+        if self.columns is None:
+            self.columns, self.dtypes = list(chunk.columns), chunk.dtypes
+            self.anova_cols, self.chi2_cols = numeric_columns(chunk), discrete_columns(chunk)
+            self.groups = [Moments(len(self.anova_cols)) for _ in TARGET_CATEGORIES]
+            self.crosstabs = {col: None for col in self.chi2_cols}
+        # Đánh chỉ số theo vị trí toàn cục để bảng dòng trùng khớp với DataFrame đầy đủ
+        chunk = chunk.set_axis(pd.RangeIndex(self.n_rows, self.n_rows + len(chunk)))
+        self.n_rows += len(chunk)
+        self.nulls = add_counts(self.nulls, chunk.isnull().sum())
+        self.target_counts = add_counts(self.target_counts, chunk['Target'].value_counts())
+        self.duplicates.update(chunk)
+
+        keep = np.ones(len(chunk), dtype=bool)
+        self.step_counts[0] += len(chunk)
+        for i, step in enumerate(self.steps):
+            values = chunk[step['column']].to_numpy()
+            keep &= (values >= step['lower']) & (values <= step['upper'])
+            self.step_counts[i + 1] += int(keep.sum())
+        self.keep_parts.append(keep)
+        clean = chunk[keep]
+        codes = target_codes(clean['Target'])
+        binary = (codes == 0).astype(int)
+
+        self.moments.update(clean[CONTINUOUS_COLS].to_numpy())
+        values = clean[self.anova_cols].to_numpy(dtype=float)
+        for code, group in enumerate(self.groups):
+            group.update(values[codes == code])
+        for col in IQR_COLS:
+            self.describe_sketches[col].update(clean[col].to_numpy())
+        for col, counts in crosstab_counts(clean, binary, self.chi2_cols).items():
+            self.crosstabs[col] = add_counts(self.crosstabs[col], counts)
+        policy = clean[self.policy_index].assign(Target=codes).value_counts()
+        self.policy_counts = add_counts(self.policy_counts, policy)
+
+    def result(self):
+        moments, groups = self.moments, self.groups
+        keep = np.concatenate(self.keep_parts)
+        exact = self.exact_bounds and all(s.exact for s in self.describe_sketches.values())
+
+        stats = {'shape': [self.n_rows, len(self.columns)]}
+        tables = {}
+        tables['nulls'] = self.nulls.reindex(self.columns).astype(int).rename('count').to_frame()
+        tables['duplicates'] = self.duplicates.table(self.columns)
+        tables['dtypes'] = self.dtypes.astype(str).rename('dtype').to_frame()
+        stats['target_counts'] = {label: int(self.target_counts.get(label, 0)) for label in TARGET_LABELS}
+        stats['iqr_steps'] = [dict(step, before=int(self.step_counts[i]), after=int(self.step_counts[i + 1]))
+                              for i, step in enumerate(self.steps)]
+
+        iqr_idx = [CONTINUOUS_COLS.index(col) for col in IQR_COLS]
+        sketches = self.describe_sketches
+        tables['iqr_describe'] = pd.DataFrame({
+            col: [moments.n, moments.mean[i], np.sqrt(moments.var()[i]), moments.min[i],
+                  sketches[col].quantile(0.25), sketches[col].quantile(0.5),
+                  sketches[col].quantile(0.75), moments.max[i]]
+            for col, i in zip(IQR_COLS, iqr_idx)
+        }, index=['count', 'mean', 'std', 'min', '25%', '50%', '75%', 'max'])
+        tables['correlation'] = pd.DataFrame(moments.corr(), index=CONTINUOUS_COLS, columns=CONTINUOUS_COLS)
+
+        tables['anova_all'] = anova_groups([g.n for g in groups], np.array([g.mean for g in groups]),
+                                           np.array([np.diag(g.comoment) for g in groups]), self.anova_cols)
+        tables['chi2_all'] = chi2_tables({col: t.fillna(0).to_numpy() for col, t in self.crosstabs.items()})
+        stats['anova_p'] = tables['anova_all']['p_value'][SCORE_COLS].astype(float).to_dict()
+        tables['score_means'] = pd.DataFrame([g.mean for g in groups], columns=self.anova_cols,
+                                             index=pd.Index(range(len(groups)), name='Target'))[SCORE_COLS]
+        stats['financial_p'] = tables['chi2_all']['p_value'][FINANCIAL_VARS].astype(float).to_dict()
+        stats['social_p'] = tables['chi2_all']['p_value'][SOCIAL_VARS].astype(float).to_dict()
+
+        policy = self.policy_counts.unstack('Target', fill_value=0).sort_index()
+        dropout_rates = (policy[0] / policy.sum(axis=1)).sort_values(ascending=False) * 100
+        dropout_df = pd.DataFrame(dropout_rates).reset_index()
+        dropout_df.columns = ['Đóng học phí', 'Học bổng', 'Nợ', 'Tỷ lệ bỏ học']
+        tables['dropout_rates'] = dropout_df
+
+        by_pair = policy.groupby(level=['Tuition_fees_up_to_date', 'Scholarship_holder']).sum()
+        tables['dropout_heatmap'] = (by_pair[0] / by_pair.sum(axis=1)).unstack('Scholarship_holder')
+
+        stats['streaming'] = {'sketch_size': self.sketch_size, 'exact_quantiles': bool(exact),
+                              'duplicate_count': self.duplicates.count,
+                              'built_rows': self.built_rows, 'rows_since_build': self.n_rows - self.built_rows}
+        return {'stats': stats, 'tables': tables, 'keep': keep}
+
+
+def aggregate(path=DATA_PATH, chunksize=CHUNK_SIZE, sketch_size=SKETCH_SIZE):
+    steps, exact = iqr_bounds(path, chunksize, sketch_size)
+    aggregates = InsightAggregates(steps, sketch_size, exact)
+    for chunk in iter_chunks(path, chunksize):
+        aggregates.update(chunk)
+    aggregates.built_rows = aggregates.n_rows
+    return aggregates
+
+
+def compute_streaming(path=DATA_PATH, chunksize=CHUNK_SIZE, sketch_size=SKETCH_SIZE):
+    return aggregate(path, chunksize, sketch_size).result()
+
+
+def max_rel_diff(a, b):
+    a, b = np.asarray(a, dtype=float), np.asarray(b, dtype=float)
+    scale = np.maximum(np.abs(a), np.abs(b))
+    diff = np.where(scale > 0, np.abs(a - b) / np.where(scale > 0, scale, 1), 0)
+    return float(np.nanmax(diff)) if diff.size else 0.0
+
+
+def compare(streamed, memory):
+    # Độ lệch lớn nhất giữa hai đường tính và danh sách các mục vượt TOLERANCES
+    s, m = streamed['stats'], memory['stats']
+    report = {
+        'exact_quantiles': s['streaming']['exact_quantiles'],
+        'keep_mismatch_rate': float(np.mean(streamed['keep'] != memory['keep'])),
+        'counts_equal': (s['shape'] == m['shape'] and s['target_counts'] == m['target_counts']
+                         and s['streaming']['duplicate_count'] == len(memory['tables']['duplicates'])
+                         and streamed['tables']['nulls'].equals(memory['tables']['nulls'])),
+        'iqr_bounds_rel': max_rel_diff([[x['lower'], x['upper']] for x in s['iqr_steps']],
+                                       [[x['lower'], x['upper']] for x in m['iqr_steps']]),
+    }
+    for name in ('correlation', 'score_means', 'iqr_describe', 'dropout_heatmap', 'anova_all', 'chi2_all'):
+        report[f'{name}_rel'] = max_rel_diff(streamed['tables'][name], memory['tables'][name])
+    report['dropout_rates_rel'] = max_rel_diff(streamed['tables']['dropout_rates'].iloc[:, -1].sort_values(),
+                                               memory['tables']['dropout_rates'].iloc[:, -1].sort_values())
+    for name in ('anova_p', 'financial_p', 'social_p'):
+        report[f'{name}_rel'] = max_rel_diff(list(s[name].values()), [m[name][k] for k in s[name]])
+
+    failures = []
+    if not report['counts_equal']:
+        failures.append('counts_equal')
+    if report['keep_mismatch_rate'] > TOLERANCES['keep_mismatch_rate']:
+        failures.append('keep_mismatch_rate')
+    if report['exact_quantiles']:
+        for key, value in report.items():
+            if key.endswith('_rel'):
+                limit = TOLERANCES['p_value_rel'] if key.endswith('_p_rel') else TOLERANCES['moments_rel']
+                if value > limit:
+                    failures.append(key)
+    return report, failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tính thống kê Insight theo từng khối cho dữ liệu lớn hơn RAM")
+    parser.add_argument('--data', default=DATA_PATH)
+    parser.add_argument('--chunksize', type=int, default=CHUNK_SIZE)
+    parser.add_argument('--sketch-size', type=int, default=SKETCH_SIZE)
+    parser.add_argument('--check', action='store_true',
+                        help="So sánh với đường tính trong bộ nhớ (chỉ dùng khi dữ liệu vừa RAM)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    result = compute_streaming(args.data, args.chunksize, args.sketch_size)
+    print(f"{result['stats']['shape'][0]} dòng, {int(result['keep'].sum())} dòng giữ lại sau IQR, "
+          f"{time.perf_counter() - start:.2f}s")
+
+    if args.check:
+        from insight_stats import compute, read_data
+
+        report, failures = compare(result, compute(read_data(args.data)))
+        print(json.dumps(report, indent=2))
+        if failures:
+            print(f"Vượt sai số cho phép: {', '.join(failures)}", file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
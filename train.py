@@ -0,0 +1,312 @@
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from insight_stats import DATA_PATH, encode_target, iqr_filter, read_data
+from scoring import MODEL_PATH, resolve_columns, to_features
+
+MODELS_DIR = 'models'
+RANDOM_STATE = 23
+TEST_SIZE = 0.2
+SMOTE_RANDOM_STATE = 23
+
+CANDIDATES = ['NaiveBayes', 'DecisionTree', 'RandomForest', 'XGBoost', 'LightGBM', 'CatBoost']
+
+# Chi phí phục vụ (càng nhỏ càng tốt) dùng cho mặt Pareto
+COST_METRICS = ['predict_latency_ms', 'batch_ms_per_1k', 'rss_mb', 'size_bytes']
+
+EXPORT_FORMATS = ['joblib', 'compressed', 'native']
+NATIVE_EXTENSIONS = {'CatBoost': '.cbm', 'XGBoost': '.ubj'}
+# joblib nhận ra nén lzma theo đuôi .xz khi ghi và theo nội dung file khi nạp
+FORMAT_EXTENSIONS = {'joblib': '.joblib', 'compressed': '.xz'}
+
+# Nạp mô hình trong một tiến trình mới để đo đúng thời gian nạp và RSS của một worker phục vụ.
+# rss_mb là phần RSS tăng thêm khi nạp mô hình (kể cả thư viện của booster), không tính trình thông dịch,
+# pandas và scoring vốn giống nhau ở mọi ứng viên; rss_total_mb là RSS của cả tiến trình.
+LOAD_SCRIPT = """
+import json, os, sys, time
+from scoring import load_model
+
+def rss():
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2**20
+
+base = rss()
+start = time.perf_counter()
+load_model(sys.argv[1])
+seconds = time.perf_counter() - start
+total = rss()
+print(json.dumps({'load_s': seconds, 'rss_mb': total - base, 'rss_total_mb': total}))
+"""
+
+
+def make_model(name, threads=1, params=None):
+    # Mỗi mô hình chạy trong một tiến trình riêng nên giới hạn số luồng bên trong để tránh tranh chấp CPU.
+    # params: siêu tham số ghi đè cấu hình mặc định (vd. cấu hình tốt nhất do tune.py tìm được)
+    model = _default_model(name, threads)
+    if params:
+        model.set_params(**params)
+    return model
+
+
+def _default_model(name, threads):
+    if name == 'NaiveBayes':
+        from sklearn.naive_bayes import GaussianNB
+        return GaussianNB()
+    if name == 'DecisionTree':
+        from sklearn.tree import DecisionTreeClassifier
+        return DecisionTreeClassifier(random_state=RANDOM_STATE)
+    if name == 'RandomForest':
+        from sklearn.ensemble import RandomForestClassifier
+        return RandomForestClassifier(random_state=RANDOM_STATE, n_jobs=threads)
+    if name == 'XGBoost':
+        from xgboost import XGBClassifier
+        return XGBClassifier(random_state=RANDOM_STATE, n_jobs=threads)
+    if name == 'LightGBM':
+        from lightgbm import LGBMClassifier
+        return LGBMClassifier(random_state=RANDOM_STATE, n_jobs=threads)
+    if name == 'CatBoost':
+        from catboost import CatBoostClassifier
+        return CatBoostClassifier(random_seed=350, iterations=500, thread_count=threads,
+                                  verbose=False, allow_writing_files=False)
+    raise ValueError(f"Mô hình không hỗ trợ: {name}")
+
+
+def prepare(data_path=DATA_PATH):
+    # Tiền xử lý giống notebook: đổi tên cột, lọc ngoại lai IQR, mã hóa Target, chia 80/20 với random_state=23.
+    # Đặc trưng là 8 cột mà trang Predict sử dụng.
+    from sklearn.model_selection import train_test_split
+
+    data = read_data(data_path)
+    keep, _ = iqr_filter(data)
+    data = data[keep]
+    X = to_features(data, resolve_columns(data.columns)).reset_index(drop=True)
+    y = encode_target(data['Target'])
+    return train_test_split(X, y, test_size=TEST_SIZE, random_state=RANDOM_STATE)
+
+
+def resample(X, y):
+    # Cân bằng lớp bằng SMOTE như notebook, chỉ áp dụng cho tập train. tune.py dùng cùng bước này cho các fold CV
+    from imblearn.over_sampling import SMOTE
+
+    return SMOTE(random_state=SMOTE_RANDOM_STATE).fit_resample(X, y)
+
+
+def predict_latency(model, X, n=200):
+    rows = [X.iloc[[i % len(X)]] for i in range(n)]
+    times = []
+    for row in rows:
+        start = time.perf_counter()
+        model.predict(row)
+        times.append(time.perf_counter() - start)
+    return float(np.median(times))
+
+
+def batch_throughput(model, X, min_rows=20_000):
+    batch = pd.concat([X] * max(1, -(-min_rows // len(X))), ignore_index=True)
+    start = time.perf_counter()
+    model.predict_proba(batch)
+    return len(batch) / (time.perf_counter() - start)
+
+
+def evaluate(model, X_test, y_test):
+    from sklearn.metrics import accuracy_score, f1_score
+
+    y_pred = np.asarray(model.predict(X_test)).ravel()
+    return {
+        'accuracy': float(accuracy_score(y_test, y_pred)),
+        'f1_macro': float(f1_score(y_test, y_pred, average='macro')),
+        'f1_per_class': [float(f) for f in f1_score(y_test, y_pred, average=None)],
+    }
+
+
+def tuned_params(path=None):
+    # Cấu hình tốt nhất theo từng mô hình do tune.py ghi lại; không có file thì dùng mặc định
+    from tune import BEST_PATH
+
+    path = path or BEST_PATH
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)['params_by_model']
+
+
+def fit_candidate(name, split, out_dir, threads=1, params=None):
+    X_train, X_test, y_train, y_test = split
+    model = make_model(name, threads, params)
+
+    start = time.perf_counter()
+    model.fit(X_train, y_train)
+    fit_s = time.perf_counter() - start
+
+    result = {'model': name, 'fit_s': fit_s, 'params': params or {}}
+    result.update(evaluate(model, X_test, y_test))
+    result['predict_latency_ms'] = predict_latency(model, X_test) * 1000
+    result['batch_rows_per_sec'] = batch_throughput(model, X_test)
+    result['batch_ms_per_1k'] = 1e6 / result['batch_rows_per_sec']
+
+    path = os.path.join(out_dir, f'{name}.joblib')
+    joblib.dump(model, path)
+    result['path'] = path
+    return result
+
+
+def save_model(model, name, path, fmt='joblib'):
+    # Trả về đường dẫn thực tế (định dạng gốc đổi phần mở rộng)
+    if fmt == 'native' and name in NATIVE_EXTENSIONS:
+        path = os.path.splitext(path)[0] + NATIVE_EXTENSIONS[name]
+        model.save_model(path)
+    elif fmt == 'compressed':
+        joblib.dump(model, path, compress=('lzma', 3))
+    else:
+        joblib.dump(model, path)
+    return path
+
+
+def measure_load(path):
+    if not os.path.exists('/proc/self/statm'):
+        return {'load_s': None, 'rss_mb': None, 'rss_total_mb': None}
+    out = subprocess.run([sys.executable, '-c', LOAD_SCRIPT, path], capture_output=True, text=True, check=True,
+                         cwd=os.path.dirname(os.path.abspath(__file__)))
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def measure_formats(name, path, out_dir):
+    model = joblib.load(path)
+    formats = {}
+    for fmt in EXPORT_FORMATS:
+        if fmt == 'native' and name not in NATIVE_EXTENSIONS:
+            continue
+        ext = NATIVE_EXTENSIONS[name] if fmt == 'native' else FORMAT_EXTENSIONS[fmt]
+        fmt_path = os.path.join(out_dir, name + ext)
+        # Bản joblib chính là file của ứng viên, không cần ghi lại
+        if fmt_path != path:
+            save_model(model, name, fmt_path, fmt)
+        formats[fmt] = {'path': fmt_path, 'size_bytes': os.path.getsize(fmt_path)}
+        formats[fmt].update(measure_load(os.path.abspath(fmt_path)))
+    return formats
+
+
+def pareto_front(results, metric, costs=COST_METRICS):
+    # Mô hình bị loại nếu có mô hình khác không tệ hơn ở mọi tiêu chí và tốt hơn ở ít nhất một tiêu chí.
+    # Bỏ qua tiêu chí không đo được (RSS ngoài Linux).
+    costs = [c for c in costs if all(r.get(c) is not None for r in results)]
+
+    def dominates(a, b):
+        no_worse = a[metric] >= b[metric] and all(a[c] <= b[c] for c in costs)
+        better = a[metric] > b[metric] or any(a[c] < b[c] for c in costs)
+        return no_worse and better
+
+    return [r for r in results if not any(dominates(o, r) for o in results if o is not r)]
+
+
+def select_model(results, metric, tolerance=0.005, cost='predict_latency_ms'):
+    # Trên mặt Pareto, chọn mô hình rẻ nhất có chất lượng cách mô hình tốt nhất không quá `tolerance`
+    front = pareto_front(results, metric)
+    best = max(r[metric] for r in front)
+    eligible = [r for r in front if r[metric] >= best - tolerance]
+    return min(eligible, key=lambda r: r[cost]), front
+
+
+def train_all(candidates=CANDIDATES, data_path=DATA_PATH, out_dir=MODELS_DIR, workers=None, threads=1, params=None):
+    os.makedirs(out_dir, exist_ok=True)
+    split = prepare(data_path)
+    params = tuned_params() if params is None else params
+    smote = bool(params)
+    if smote:
+        # Cấu hình của tune.py được chọn trên fold đã SMOTE: huấn luyện trên tập train đã SMOTE giống vậy để
+        # tham số còn đúng. Mọi ứng viên dùng chung tập train này để so sánh công bằng; tập test giữ nguyên.
+        X_train, X_test, y_train, y_test = split
+        X_train, y_train = resample(X_train, y_train)
+        split = X_train, X_test, y_train, y_test
+    results = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(fit_candidate, name, split, out_dir, threads, params.get(name)): name
+                   for name in candidates}
+        for future in as_completed(futures):
+            result = future.result()
+            result['smote'] = smote
+            print(f"{result['model']:<13} acc={result['accuracy']:.4f} f1={result['f1_macro']:.4f} "
+                  f"fit={result['fit_s']:.2f}s")
+            results.append(result)
+
+    for result in results:
+        result['size_bytes'] = os.path.getsize(result['path'])
+        result.update(measure_load(os.path.abspath(result['path'])))
+    return sorted(results, key=lambda r: candidates.index(r['model']))
+
+
+def export_model(path, target=MODEL_PATH):
+    # Ghi qua file tạm rồi đổi tên để tiến trình đang phục vụ không đọc phải file dở dang
+    os.makedirs(os.path.dirname(target) or '.', exist_ok=True)
+    tmp = f'{target}.tmp'
+    shutil.copyfile(path, tmp)
+    os.replace(tmp, target)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Huấn luyện song song và so sánh các mô hình dự đoán bỏ học")
+    parser.add_argument('--data', default=DATA_PATH)
+    parser.add_argument('--models', nargs='+', default=CANDIDATES, choices=CANDIDATES)
+    parser.add_argument('--out-dir', default=MODELS_DIR)
+    parser.add_argument('--workers', type=int, default=None, help="Số tiến trình (mặc định: số lõi CPU)")
+    parser.add_argument('--threads', type=int, default=1, help="Số luồng cho mỗi mô hình")
+    parser.add_argument('--metric', default='accuracy', choices=['accuracy', 'f1_macro'])
+    parser.add_argument('--tolerance', type=float, default=0.005,
+                        help="Chấp nhận kém mô hình tốt nhất bao nhiêu để đổi lấy chi phí phục vụ thấp hơn")
+    parser.add_argument('--format', default='joblib', choices=EXPORT_FORMATS,
+                        help="Định dạng xuất: joblib, joblib nén lzma, hoặc định dạng gốc của booster")
+    parser.add_argument('--export', default=MODEL_PATH, help="Nơi ghi mô hình được chọn")
+    parser.add_argument('--no-export', action='store_true')
+    parser.add_argument('--default-params', action='store_true',
+                        help="Bỏ qua cấu hình tốt nhất của tune.py, dùng siêu tham số mặc định")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    results = train_all(args.models, args.data, args.out_dir, args.workers, args.threads,
+                        params={} if args.default_params else None)
+    winner, front = select_model(results, args.metric, args.tolerance)
+    formats = measure_formats(winner['model'], winner['path'], args.out_dir)
+
+    report = {
+        'data': args.data,
+        'metric': args.metric,
+        'tolerance': args.tolerance,
+        'pareto_front': [r['model'] for r in front],
+        'winner': winner['model'],
+        'winner_formats': formats,
+        'wall_s': time.perf_counter() - start,
+        'results': results,
+    }
+    with open(os.path.join(args.out_dir, 'report.json'), 'w') as f:
+        json.dump(report, f, indent=2)
+
+    table = pd.DataFrame(results).set_index('model')
+    print(table[['accuracy', 'f1_macro', 'fit_s', 'predict_latency_ms', 'batch_rows_per_sec',
+                 'size_bytes', 'load_s', 'rss_mb']].to_string())
+    print(f"Mặt Pareto ({args.metric} / chi phí): {', '.join(report['pareto_front'])}")
+    print(f"Mô hình được chọn: {winner['model']}")
+    print(pd.DataFrame(formats).T[['size_bytes', 'load_s', 'rss_mb']].to_string())
+
+    if not args.no_export:
+        fmt = args.format if args.format in formats else 'joblib'
+        target = args.export
+        if fmt == 'native':
+            target = os.path.splitext(target)[0] + NATIVE_EXTENSIONS[winner['model']]
+        export_model(formats[fmt]['path'], target)
+        print(f"Đã xuất {winner['model']} ({fmt}) -> {target}")
+        if target != MODEL_PATH:
+            print(f"Đặt biến môi trường MODEL_PATH={target} để ứng dụng dùng file này")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,312 @@
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+from scoring import FEATURE_COLUMNS, MODEL_PATH
+from train import (CANDIDATES, DATA_PATH, MODELS_DIR, RANDOM_STATE, SMOTE_RANDOM_STATE, evaluate, export_model,
+                   make_model, prepare, resample)
+
+TUNING_DIR = 'tuning'
+FOLDS_DIR = os.path.join(TUNING_DIR, 'folds')
+TRIALS_PATH = os.path.join(TUNING_DIR, 'trials.jsonl')
+BEST_PATH = os.path.join(TUNING_DIR, 'best.json')
+
+# Tăng khi đổi cách chia fold/SMOTE để không dùng lại fold cũ trên đĩa
+FOLD_VERSION = 1
+N_SPLITS = 3
+
+# Tài nguyên của successive halving: số cây/vòng boosting; cấu hình tốt được huấn luyện dài hơn ở rung sau
+RESOURCE_PARAM = {
+    'RandomForest': 'n_estimators',
+    'XGBoost': 'n_estimators',
+    'LightGBM': 'n_estimators',
+    'CatBoost': 'iterations',
+}
+TUNABLE = list(RESOURCE_PARAM)
+
+SEARCH_SPACES = {
+    'RandomForest': {
+        'max_depth': ('choice', [None, 8, 12, 16]),
+        'min_samples_leaf': ('choice', [1, 2, 4, 8]),
+        'max_features': ('choice', ['sqrt', 0.5, 1.0]),
+    },
+    'XGBoost': {
+        'max_depth': ('int', 3, 8),
+        'learning_rate': ('loguniform', 0.02, 0.3),
+        'subsample': ('uniform', 0.6, 1.0),
+        'colsample_bytree': ('uniform', 0.6, 1.0),
+        'min_child_weight': ('loguniform', 1.0, 10.0),
+    },
+    'LightGBM': {
+        'num_leaves': ('int', 8, 64),
+        'learning_rate': ('loguniform', 0.02, 0.3),
+        'min_child_samples': ('int', 5, 50),
+        'subsample': ('uniform', 0.6, 1.0),
+        'subsample_freq': ('choice', [1]),
+        'colsample_bytree': ('uniform', 0.6, 1.0),
+    },
+    'CatBoost': {
+        'depth': ('int', 4, 8),
+        'learning_rate': ('loguniform', 0.02, 0.3),
+        'l2_leaf_reg': ('loguniform', 1.0, 10.0),
+    },
+}
+
+
+def short_hash(obj):
+    return hashlib.sha256(json.dumps(obj, sort_keys=True, default=str).encode('utf-8')).hexdigest()[:16]
+
+
+def sample_value(rng, spec):
+    kind = spec[0]
+    if kind == 'choice':
+        return spec[1][int(rng.integers(len(spec[1])))]
+    if kind == 'int':
+        return int(rng.integers(spec[1], spec[2] + 1))
+    if kind == 'uniform':
+        return float(rng.uniform(spec[1], spec[2]))
+    if kind == 'loguniform':
+        return float(np.exp(rng.uniform(np.log(spec[1]), np.log(spec[2]))))
+    raise ValueError(f"Kiểu không gian tìm kiếm không hỗ trợ: {kind}")
+
+
+def sample_configs(name, n, seed):
+    # Cố định theo (seed, mô hình) để lần chạy tiếp tục sinh đúng các cấu hình cũ
+    rng = np.random.default_rng([seed, CANDIDATES.index(name)])
+    space = SEARCH_SPACES[name]
+    return [{param: sample_value(rng, spec) for param, spec in space.items()} for _ in range(n)]
+
+
+def resource_levels(min_resource, max_resource, eta):
+    levels = [min_resource]
+    while levels[-1] * eta <= max_resource:
+        levels.append(levels[-1] * eta)
+    return levels
+
+
+def build_folds(data_path=DATA_PATH, n_splits=N_SPLITS, directory=FOLDS_DIR):
+    # Chia StratifiedKFold trên tập train của train.prepare và SMOTE phần train của từng fold (không đụng fold
+    # kiểm định), kèm bản SMOTE của toàn bộ tập train để huấn luyện lại cấu hình tốt nhất. Lưu .npy theo khóa
+    # (hash dữ liệu, cách chia, SMOTE): các trial ở mọi tiến trình và mọi lần chạy đọc lại thay vì tính lại.
+    from sklearn.model_selection import StratifiedKFold
+
+    from lookup import file_sha256
+
+    key = short_hash({'data': file_sha256(data_path), 'n_splits': n_splits, 'random_state': RANDOM_STATE,
+                      'smote': SMOTE_RANDOM_STATE, 'features': FEATURE_COLUMNS, 'version': FOLD_VERSION})
+    path = os.path.join(directory, key)
+    if os.path.exists(os.path.join(path, 'meta.json')):
+        return path
+
+    X_train, _, y_train, _ = prepare(data_path)
+    X, y = X_train.to_numpy(), np.asarray(y_train)
+    tmp = f'{path}.tmp-{os.getpid()}'
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+
+    def save(prefix, X_fit, y_fit, X_val=None, y_val=None):
+        X_res, y_res = resample(X_fit, y_fit)
+        arrays = {'X_train': X_res, 'y_train': y_res}
+        if X_val is not None:
+            arrays.update({'X_val': X_val, 'y_val': y_val})
+        for name, array in arrays.items():
+            np.save(os.path.join(tmp, f'{prefix}.{name}.npy'), np.ascontiguousarray(array))
+        return len(y_res)
+
+    splitter = StratifiedKFold(n_splits=n_splits, shuffle=True, random_state=RANDOM_STATE)
+    rows = [save(f'fold{i}', X[fit], y[fit], X[val], y[val]) for i, (fit, val) in enumerate(splitter.split(X, y))]
+    rows.append(save('full', X, y))
+    with open(os.path.join(tmp, 'meta.json'), 'w') as f:
+        json.dump({'key': key, 'n_splits': n_splits, 'resampled_rows': rows, 'dtype': str(X.dtype)}, f, indent=2)
+
+    os.makedirs(directory, exist_ok=True)
+    try:
+        os.rename(tmp, path)
+    except OSError:
+        # Tiến trình khác vừa tạo xong cùng khóa
+        shutil.rmtree(tmp, ignore_errors=True)
+    return path
+
+
+def load_fold(path, prefix):
+    arrays = {}
+    for name in ('X_train', 'y_train', 'X_val', 'y_val'):
+        file = os.path.join(path, f'{prefix}.{name}.npy')
+        if os.path.exists(file):
+            array = np.load(file, mmap_mode='r')
+            arrays[name] = pd.DataFrame(array, columns=FEATURE_COLUMNS) if name.startswith('X') else np.asarray(array)
+    return arrays
+
+
+def score(y_true, y_pred, metric):
+    from sklearn.metrics import accuracy_score, f1_score
+
+    if metric == 'accuracy':
+        return float(accuracy_score(y_true, y_pred))
+    return float(f1_score(y_true, y_pred, average='macro'))
+
+
+def run_trial(folds_path, name, params, resource, fold, metric):
+    arrays = load_fold(folds_path, f'fold{fold}')
+    model = make_model(name, threads=1, params={**params, RESOURCE_PARAM[name]: resource})
+    start = time.perf_counter()
+    model.fit(arrays['X_train'], arrays['y_train'])
+    fit_s = time.perf_counter() - start
+    y_pred = np.asarray(model.predict(arrays['X_val'])).ravel()
+    return {'score': score(arrays['y_val'], y_pred, metric), 'fit_s': fit_s}
+
+
+def read_trials(path=TRIALS_PATH):
+    done = {}
+    if not os.path.exists(path):
+        return done
+    with open(path) as f:
+        for line in f:
+            try:
+                trial = json.loads(line)
+            except json.JSONDecodeError:
+                # Dòng cuối bị cắt khi tiến trình bị dừng giữa chừng
+                continue
+            done[(trial['search'], trial['config'], trial['rung'], trial['fold'])] = trial
+    return done
+
+
+def search(models=TUNABLE, data_path=DATA_PATH, n_configs=27, eta=3, min_resource=30, max_resource=810,
+           n_splits=N_SPLITS, metric='f1_macro', seed=RANDOM_STATE, workers=None, trials_path=TRIALS_PATH):
+    folds_path = build_folds(data_path, n_splits)
+    levels = resource_levels(min_resource, max_resource, eta)
+    configs = {name: sample_configs(name, n_configs, seed) for name in models}
+    # Khóa tìm kiếm: trial cũ chỉ được dùng lại khi cùng fold, cùng không gian và cùng lịch halving
+    keys = {name: short_hash({'folds': os.path.basename(folds_path), 'model': name, 'space': SEARCH_SPACES[name],
+                              'configs': n_configs, 'seed': seed, 'eta': eta, 'levels': levels, 'metric': metric})
+            for name in models}
+    done = read_trials(trials_path)
+    resumed = sum(1 for trial in done if trial[0] in keys.values())
+
+    os.makedirs(os.path.dirname(trials_path) or '.', exist_ok=True)
+    survivors = {name: list(range(n_configs)) for name in models}
+    history = []
+    pool = ProcessPoolExecutor(max_workers=workers)
+    try:
+        with open(trials_path, 'a') as log:
+            for rung, resource in enumerate(levels):
+                tasks = [(name, c, fold) for name in models for c in survivors[name] for fold in range(n_splits)]
+                futures = {pool.submit(run_trial, folds_path, name, configs[name][c], resource, fold, metric):
+                           (name, c, fold) for name, c, fold in tasks if (keys[name], c, rung, fold) not in done}
+                for future in as_completed(futures):
+                    name, c, fold = futures[future]
+                    trial = {'search': keys[name], 'model': name, 'config': c, 'rung': rung, 'resource': resource,
+                             'fold': fold, 'params': configs[name][c], **future.result()}
+                    log.write(json.dumps(trial) + '\n')
+                    log.flush()
+                    done[(keys[name], c, rung, fold)] = trial
+
+                for name in models:
+                    scores = {c: float(np.mean([done[(keys[name], c, rung, fold)]['score'] for fold in range(n_splits)]))
+                              for c in survivors[name]}
+                    ranked = sorted(scores, key=scores.get, reverse=True)
+                    history.append({'model': name, 'rung': rung, 'resource': resource, 'configs': len(ranked),
+                                    'best_config': ranked[0], 'best_score': scores[ranked[0]]})
+                    print(f"{name:<13} rung {rung} ({RESOURCE_PARAM[name]}={resource}): {len(ranked)} cấu hình, "
+                          f"tốt nhất #{ranked[0]} {metric}={scores[ranked[0]]:.4f}")
+                    if rung < len(levels) - 1:
+                        survivors[name] = ranked[:max(1, len(ranked) // eta)]
+                    else:
+                        survivors[name] = ranked[:1]
+    except BaseException:
+        # Ctrl-C/lỗi: bỏ các trial chưa chạy để thoát ngay; trial đã ghi vào trials.jsonl được dùng lại lần sau
+        pool.shutdown(wait=False, cancel_futures=True)
+        raise
+    pool.shutdown()
+
+    best = {}
+    for name in models:
+        c = survivors[name][0]
+        final = [h for h in history if h['model'] == name][-1]
+        best[name] = {'config': c, 'cv_score': final['best_score'],
+                      'params': {**configs[name][c], RESOURCE_PARAM[name]: levels[-1]}}
+    return {'folds': folds_path, 'levels': levels, 'history': history, 'best': best, 'resumed_trials': resumed,
+            'trials': len(done)}
+
+
+def refit_best(result, data_path=DATA_PATH, metric='f1_macro', out_dir=MODELS_DIR, threads=1):
+    # Huấn luyện lại cấu hình tốt nhất trên toàn bộ tập train đã SMOTE (lấy từ cache) và đánh giá trên tập test
+    # giữ lại của train.prepare
+    winner = max(result['best'], key=lambda name: result['best'][name]['cv_score'])
+    params = result['best'][winner]['params']
+    full = load_fold(result['folds'], 'full')
+    _, X_test, _, y_test = prepare(data_path)
+
+    model = make_model(winner, threads, params)
+    start = time.perf_counter()
+    model.fit(full['X_train'], full['y_train'])
+    fit_s = time.perf_counter() - start
+
+    import joblib
+
+    os.makedirs(out_dir, exist_ok=True)
+    path = os.path.join(out_dir, f'{winner}.tuned.joblib')
+    joblib.dump(model, path)
+    return {'model': winner, 'params': params, 'cv_score': result['best'][winner]['cv_score'], 'metric': metric,
+            'fit_s': fit_s, 'path': path, 'test': evaluate(model, X_test, y_test)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tìm siêu tham số bằng successive halving song song, "
+                                                 "với fold CV đã SMOTE được cache trên đĩa")
+    parser.add_argument('--data', default=DATA_PATH)
+    parser.add_argument('--models', nargs='+', default=TUNABLE, choices=TUNABLE)
+    parser.add_argument('--configs', type=int, default=27, help="Số cấu hình ngẫu nhiên mỗi mô hình ở rung đầu")
+    parser.add_argument('--eta', type=int, default=3, help="Giữ 1/eta cấu hình và nhân tài nguyên với eta mỗi rung")
+    parser.add_argument('--min-resource', type=int, default=30, help="Số cây/vòng boosting ở rung đầu")
+    parser.add_argument('--max-resource', type=int, default=810)
+    parser.add_argument('--folds', type=int, default=N_SPLITS)
+    parser.add_argument('--metric', default='f1_macro', choices=['accuracy', 'f1_macro'])
+    parser.add_argument('--seed', type=int, default=RANDOM_STATE)
+    parser.add_argument('--workers', type=int, default=None, help="Số tiến trình (mặc định: số lõi CPU)")
+    parser.add_argument('--export', default=None, help="Nơi ghi mô hình tốt nhất (mặc định: MODEL_PATH)")
+    parser.add_argument('--no-export', action='store_true')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    result = search(args.models, args.data, args.configs, args.eta, args.min_resource, args.max_resource,
+                    args.folds, args.metric, args.seed, args.workers)
+    search_s = time.perf_counter() - start
+    final = refit_best(result, args.data, args.metric)
+
+    report = {
+        **final,
+        'search_s': search_s,
+        'workers': args.workers or os.cpu_count(),
+        'levels': result['levels'],
+        'trials': result['trials'],
+        'resumed_trials': result['resumed_trials'],
+        'history': result['history'],
+        # train.py đọc khóa này để dùng cấu hình tốt nhất cho từng mô hình
+        'params_by_model': {name: best['params'] for name, best in result['best'].items()},
+    }
+    tmp = f'{BEST_PATH}.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(report, f, indent=2)
+    os.replace(tmp, BEST_PATH)
+
+    print(f"Tìm kiếm xong sau {search_s:.1f}s với {report['workers']} tiến trình "
+          f"({result['trials']} trial, {result['resumed_trials']} trial dùng lại từ lần chạy trước)")
+    print(f"Tốt nhất: {final['model']} {final['params']} CV {args.metric}={final['cv_score']:.4f}, "
+          f"test accuracy={final['test']['accuracy']:.4f} f1_macro={final['test']['f1_macro']:.4f}")
+
+    if not args.no_export:
+        target = args.export or MODEL_PATH
+        export_model(final['path'], target)
+        print(f"Đã xuất {final['model']} -> {target} (chạy lại lookup.py/calibration.py cho mô hình mới)")
+
+
+if __name__ == '__main__':
+    main()